@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { API_ENDPOINTS, IMAGE_TYPES } from '../../constants/api';
+import { IMAGE_TYPES, findGalleryImage } from '../../constants/api';
 
 interface LogoProps {
   defaultLogo: string;
@@ -23,17 +23,8 @@ export default function Logo({
     const fetchLogo = async () => {
       try {
         setIsLoading(true);
-        const response = await fetch(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.GET_ALL_IMAGES}`);
-        
-        if (response.ok) {
-          const data = await response.json();
-          if (Array.isArray(data) && data.length > 0) {
-            const logo = data.find((item: { image: string }) =>
-              item.image.toLowerCase().includes(IMAGE_TYPES.LOGO)
-            ) || data[0];
-            setLogoUrl(logo.image);
-          }
-        }
+        const logo = await findGalleryImage(IMAGE_TYPES.LOGO);
+        if (logo) setLogoUrl(logo);
       } catch (error) {
         console.error('Failed to fetch logo:', error);
       } finally {
@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react';
+import { IMAGE_TYPES, findGalleryImage } from '../../../constants/api';
 
 interface HeroSectionProps {
   defaultBackground: string;
@@ -13,28 +14,13 @@ const HeroSection = ({ defaultBackground, onImageError }: HeroSectionProps) => {
     const fetchBackgroundImage = async () => {
       try {
         setIsLoading(true);
-        const response = await fetch('http://127.0.0.1:8000/get-all-images/');
+        const image = await findGalleryImage(IMAGE_TYPES.HOMEPAGE);
 
-        if (response.ok) {
-          const data = await response.json();
-
-          if (Array.isArray(data) && data.length > 0) {
-            const bgImage = data.find(item =>
-              item.image.toLowerCase().includes('homepage')
-            );
-
-            if (bgImage) {
-              console.log('Found background image:', bgImage.image);
-              setBackgroundImage(bgImage.image);
-            } else {
-              console.log('No matching image found, using first image');
-              setBackgroundImage(data[0].image);
-            }
-          } else {
-            console.log('Empty response array, using default image');
-          }
+        if (image) {
+          console.log('Using background image:', image);
+          setBackgroundImage(image);
         } else {
-          console.log('API request failed with status:', response.status);
+          console.log('No gallery images, using default image');
         }
       } catch (error) {
         console.error('Failed to fetch background image:', error);
@@ -20,10 +20,12 @@ const About = () => {
   useEffect(() => {
     const load = async () => {
       try {
-        const res = await fetch(ABOUT_VIDEOS_URL);
+        // Newest first; only the latest video is shown
+        const res = await fetch(`${ABOUT_VIDEOS_URL}?page_size=1`);
         const data = await res.json();
-        if (Array.isArray(data) && data.length > 0) {
-          setVideo(data[0]); // latest first due to ordering
+        const videos = Array.isArray(data) ? data : (data?.results || []);
+        if (videos.length > 0) {
+          setVideo(videos[0]); // latest first due to ordering
         } else {
           setVideo(null);
         }
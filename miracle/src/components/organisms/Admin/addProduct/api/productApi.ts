@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { fetchAllPages } from '../../../../../constants/api';
 import type { Category, Product, ProductFormData, ProductFormFields } from '../types/product';
 
 
@@ -16,8 +17,7 @@ export const fetchCategories = async (): Promise<Category[]> => {
 
 export const fetchProducts = async (): Promise<Product[]> => {
   try {
-    const response = await axios.get(`${API_BASE_URL}/products/`);
-    return response.data;
+    return await fetchAllPages<Product>(`${API_BASE_URL}/products/`);
   } catch (error) {
     console.error('Error fetching products:', error);
     throw error;
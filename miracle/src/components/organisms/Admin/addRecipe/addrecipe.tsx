@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from 'react';
-import { API_ENDPOINTS } from '../../../../constants/api';
+import { API_ENDPOINTS, fetchAllPages } from '../../../../constants/api';
 import Sidebar from '../sidebar/sidebar';
 import { FormHeader, FormStatus, SubmitButton, ImageUploadField } from '../../../molecules/admin';
 
@@ -50,10 +50,9 @@ const AddRecipePage: React.FC = () => {
 
   const fetchRecipes = async () => {
     try {
-      const res = await fetch(RECIPES_URL);
-      const data = await res.json();
+      const data = await fetchAllPages(RECIPES_URL);
       const now = Date.now();
-      const mapped: Recipe[] = (data || []).map((r: any) => ({
+      const mapped: Recipe[] = data.map((r: any) => ({
         id: r.id,
         title: r.title,
         image: r.image
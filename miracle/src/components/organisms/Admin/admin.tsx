@@ -15,12 +15,6 @@ type UserStats = {
   active_users: number;
 };
 
-type Product = {
-  id: number;
-  name: string;
-  is_active: boolean;
-};
-
 type ApiError = {
   response?: {
     status?: number;
@@ -51,20 +45,18 @@ export default function AdminLayout() {
         setLoading(true);
         setError(null);
         
-        const [usersResponse, productsResponse] = await Promise.all([
+        // Both counts are kept on the server; no product list is fetched
+        const [usersResponse, facetsResponse] = await Promise.all([
           api.get('user-count/'),
-          api.get('products/')
+          api.get('catalog-facets/')
         ]);
         
-        if (!usersResponse.data || !productsResponse.data) {
+        if (!usersResponse.data || !facetsResponse.data) {
           throw new Error('Invalid data received from server');
         }
 
         setUserStats(usersResponse.data);
-        const activeCount = Array.isArray(productsResponse.data) 
-          ? productsResponse.data.filter((product: Product) => product.is_active).length
-          : 0;
-        setActiveProducts(activeCount);
+        setActiveProducts(facetsResponse.data.product_count ?? 0);
       } catch (err: unknown) {
         console.error('Fetch error:', err);
         const error = err as ApiError;
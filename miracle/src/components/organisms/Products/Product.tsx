@@ -5,7 +5,7 @@ import ErrorDisplay from '../../molecules/common/ErrorDisplay';
 import ProductsHeader from '../../molecules/product/ProductsHeader';
 import ProductCard from '../../molecules/product/ProductCard';
 import EmptyProductsMessage from '../../molecules/product/EmptyProductsMessage';
-import { API_ENDPOINTS } from '../../../constants/api';
+import { API_ENDPOINTS, fetchPage } from '../../../constants/api';
 import {
     addToCart as addToCartApi,
     addToCartSession,
@@ -39,10 +39,25 @@ function normalizeImageUrl(image: string | undefined | null): string {
     return `${API_ENDPOINTS.BASE_URL}${path}`;
 }
 
+function toUIProduct(p: any): UIProduct {
+    return {
+        id: String(p.id),
+        name: p.name ?? 'Unnamed',
+        description: p.description ?? '',
+        price: Number(p.price) || 0,
+        image: normalizeImageUrl(p.image),
+        rating: Number(p.rating) || 4.5,
+        reviewCount: Number(p.review_count) || 0,
+    };
+}
+
 const Product: React.FC = () => {
     const [products, setProducts] = useState<UIProduct[]>([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
+    // Cursor of the next page; null once the last page is shown
+    const [nextUrl, setNextUrl] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [cartIds, setCartIds] = useState<Record<string, number>>({});
     const { isAuthenticated } = useAuth();
 
@@ -51,19 +66,9 @@ const Product: React.FC = () => {
             try {
                 setLoading(true);
                 setError(null);
-                const res = await fetch(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.PRODUCTS}`);
-                if (!res.ok) throw new Error(`Failed to fetch products (${res.status})`);
-                const data = await res.json();
-                const mapped: UIProduct[] = (Array.isArray(data) ? data : []).map((p: any) => ({
-                    id: String(p.id),
-                    name: p.name ?? 'Unnamed',
-                    description: p.description ?? '',
-                    price: Number(p.price) || 0,
-                    image: normalizeImageUrl(p.image),
-                    rating: Number(p.rating) || 4.5,
-                    reviewCount: Number(p.review_count) || 0,
-                }));
-                setProducts(mapped);
+                const page = await fetchPage(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.PRODUCTS}`);
+                setProducts(page.results.map(toUIProduct));
+                setNextUrl(page.next);
             } catch (e) {
                 setError('Failed to load products');
             } finally {
@@ -73,6 +78,20 @@ const Product: React.FC = () => {
         load();
     }, []);
 
+    const loadMore = async () => {
+        if (!nextUrl || loadingMore) return;
+        try {
+            setLoadingMore(true);
+            const page = await fetchPage(nextUrl);
+            setProducts(prev => [...prev, ...page.results.map(toUIProduct)]);
+            setNextUrl(page.next);
+        } catch (e) {
+            setError('Failed to load products');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     // Local per-product quantity (for dynamic controls on cards)
     const [productQty, setProductQty] = useState<Record<string, number>>({});
     // Prevent rapid double-clicks on Add causing duplicate POSTs
@@ -247,6 +266,17 @@ const Product: React.FC = () => {
                             })}
                         </div>
                     )}
+                    {nextUrl && (
+                        <div className="flex justify-center mt-10">
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="px-6 py-3 rounded-lg bg-emerald-600 text-white font-medium hover:bg-emerald-700 disabled:opacity-60"
+                            >
+                                {loadingMore ? 'Loading...' : 'Load more products'}
+                            </button>
+                        </div>
+                    )}
                 </main>
             </div>
         </> 
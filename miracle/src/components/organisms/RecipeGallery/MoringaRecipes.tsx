@@ -1,9 +1,9 @@
 import React from 'react';
-import { Box, Container } from '@mui/material';
+import { Box, Button, Container } from '@mui/material';
 import Navbar from '../Navbar/navbar';
 import RecipesPageHeader from '../../molecules/recipe/RecipesPageHeader';
 import RecipeCard from '../../molecules/recipe/RecipeCard';
-import { API_ENDPOINTS } from '../../../constants/api';
+import { API_ENDPOINTS, fetchPage } from '../../../constants/api';
 
 interface Recipe {
   id: number;
@@ -15,29 +15,32 @@ interface Recipe {
   benefits: string;
 }
 
+const toRecipe = (r: any): Recipe => ({
+  id: r.id,
+  title: r.title,
+  image: r.image ? (r.image.startsWith('http') ? r.image : `${API_ENDPOINTS.BASE_URL}${r.image}`) : '',
+  onClick: () => {},
+  ingredients: r.ingredients || [],
+  instructions: r.instructions || [],
+  benefits: r.benefits || ''
+});
+
 const MoringaRecipes = () => {
   const [recipes, setRecipes] = React.useState<Recipe[]>([]);
   const [loading, setLoading] = React.useState(true);
   const [error, setError] = React.useState<string | null>(null);
+  // Cursor of the next page; null once the last page is shown
+  const [nextUrl, setNextUrl] = React.useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = React.useState(false);
 
   React.useEffect(() => {
     const load = async () => {
       try {
         setLoading(true);
         setError(null);
-        const res = await fetch(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.RECIPES}`);
-        if (!res.ok) throw new Error('Failed to fetch recipes');
-        const data = await res.json();
-        const mapped: Recipe[] = (data || []).map((r: any) => ({
-          id: r.id,
-          title: r.title,
-          image: r.image ? (r.image.startsWith('http') ? r.image : `${API_ENDPOINTS.BASE_URL}${r.image}`) : '',
-          onClick: () => {},
-          ingredients: r.ingredients || [],
-          instructions: r.instructions || [],
-          benefits: r.benefits || ''
-        }));
-        setRecipes(mapped);
+        const page = await fetchPage(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.RECIPES}`);
+        setRecipes(page.results.map(toRecipe));
+        setNextUrl(page.next);
       } catch (e) {
         setError(e instanceof Error ? e.message : 'Error loading recipes');
         setRecipes([]);
@@ -48,6 +51,20 @@ const MoringaRecipes = () => {
     load();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextUrl || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(nextUrl);
+      setRecipes(prev => [...prev, ...page.results.map(toRecipe)]);
+      setNextUrl(page.next);
+    } catch (e) {
+      setError(e instanceof Error ? e.message : 'Error loading recipes');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <>
       <Navbar />
@@ -88,6 +105,13 @@ const MoringaRecipes = () => {
               ))
             )}
           </Box>
+          {!loading && !error && nextUrl && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', mt: 5 }}>
+              <Button variant="contained" color="success" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more recipes'}
+              </Button>
+            </Box>
+          )}
         </Container>
       </Box>
     </>
@@ -14,3 +14,54 @@ export const IMAGE_TYPES = {
   HOMEPAGE: 'homepage',
   PRODUCT: 'product',
 } as const;
+
+// Largest page the catalog endpoints serve (CATALOG_MAX_PAGE_SIZE)
+export const MAX_PAGE_SIZE = 100;
+
+export type Page<T> = { results: T[]; next: string | null };
+
+/**
+ * One page of a cursor-paginated list endpoint ({next, results}); pass
+ * `next` back in to load the following page. Plain array responses come
+ * back as a single page.
+ */
+export const fetchPage = async <T = any>(url: string, init?: RequestInit): Promise<Page<T>> => {
+  const res = await fetch(url, init);
+  if (!res.ok) throw new Error(`Failed to fetch ${url} (${res.status})`);
+  const data = await res.json();
+  if (Array.isArray(data)) return { results: data, next: null };
+  return { results: data?.results || [], next: data?.next || null };
+};
+
+/**
+ * Every item of a cursor-paginated list endpoint, following `next` until
+ * the last page. Only for admin screens that need the whole table; list
+ * pages load one page at a time with fetchPage().
+ */
+export const fetchAllPages = async <T = any>(url: string, init?: RequestInit): Promise<T[]> => {
+  const items: T[] = [];
+  const first = new URL(url, API_ENDPOINTS.BASE_URL);
+  if (!first.searchParams.has('page_size')) first.searchParams.set('page_size', String(MAX_PAGE_SIZE));
+  let next: string | null = first.toString();
+  while (next) {
+    const page: Page<T> = await fetchPage<T>(next, init);
+    items.push(...page.results);
+    next = page.next;
+  }
+  return items;
+};
+
+/**
+ * URL of the newest gallery image whose file name contains `name`
+ * (server-side `?name=` filter), falling back to the newest image overall;
+ * null when the gallery is empty.
+ */
+export const findGalleryImage = async (name: string): Promise<string | null> => {
+  for (const query of [`?name=${encodeURIComponent(name)}&page_size=1`, '?page_size=1']) {
+    const res = await fetch(`${API_ENDPOINTS.BASE_URL}${API_ENDPOINTS.GET_ALL_IMAGES}${query}`);
+    if (!res.ok) throw new Error(`Failed to fetch gallery images (${res.status})`);
+    const image = (await res.json())?.results?.[0];
+    if (image) return image.image;
+  }
+  return null;
+};
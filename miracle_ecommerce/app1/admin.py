@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, EmailOTP, Cart, CartItem, Recipe, AboutVideo
+from .models import Category, Product, EmailOTP, OutboxEmail, Cart, CartItem, Recipe, AboutVideo, Order, OrderItem
 
 # Inline CartItems in Cart admin
 class CartItemInline(admin.TabularInline):
@@ -7,6 +7,9 @@ class CartItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['subtotal']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_subtotals().select_related('product')
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'description']
@@ -29,11 +32,23 @@ class EmailOTPAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['to_email', 'subject', 'status', 'attempts', 'available_at', 'sent_at', 'created_at']
+    list_filter = ['status']
+    search_fields = ['to_email']
+    readonly_fields = ['body', 'claim', 'claimed_at', 'sent_at', 'last_error', 'created_at']
+
+
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'created_at', 'total_items', 'total_price']
     inlines = [CartItemInline]
     readonly_fields = ['created_at', 'total_items', 'total_price']
+    list_select_related = ['user']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
 
 
 @admin.register(CartItem)
@@ -41,7 +56,27 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'subtotal']
     list_filter = ['cart']
     search_fields = ['product__name']
+    list_select_related = ['cart', 'product']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_subtotals()
+
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    readonly_fields = ['product', 'quantity', 'unit_price']
+    can_delete = False
+
 
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'total_price', 'reserved_until', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['user']
+    inlines = [OrderItemInline]
+    readonly_fields = ['user', 'total_price', 'reserved_until', 'created_at']
 
 
 from .models import ImageUpload
@@ -57,5 +92,7 @@ class RecipeAdmin(admin.ModelAdmin):
 # AboutVideo admin
 @admin.register(AboutVideo)
 class AboutVideoAdmin(admin.ModelAdmin):
-    list_display = ['title', 'youtube_id', 'created_at', 'updated_at']
-    search_fields = ['title', 'description', 'youtube_id']
\ No newline at end of file
+    list_display = ['title', 'youtube_id', 'hls_status', 'created_at', 'updated_at']
+    list_filter = ['hls_status']
+    search_fields = ['title', 'description', 'youtube_id']
+    readonly_fields = ['hls_status', 'hls_manifest', 'hls_source', 'hls_error']
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Stateless JWT authentication.
+
+Tokens carry the user's id, username, email, name and staff flags as
+claims, so JWTStatelessUserAuthentication authenticates a request from the
+signature alone and ``request.user`` is a ClaimsUser instead of a User row
+fetched per request. Views that need the model itself (to save it or
+follow its relations) use ``request.user.instance``, loaded on first
+access; views that only need the id filter on ``user_id=request.user.pk``.
+
+Claims are re-read from the database whenever a refresh token is
+exchanged, so an account change (a revoked is_staff, a new email) reaches
+new access tokens within ACCESS_TOKEN_LIFETIME. Refresh tokens cache their
+blacklist lookups (see ClaimsRefreshToken.check_blacklist).
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BLACKLIST_KEY = 'jwt:blacklisted:{}'
+
+
+def user_claims(user):
+    return {
+        'username': user.get_username(),
+        'email': user.email,
+        'name': user.get_full_name(),
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+    }
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user built from token claims. Tokens issued before the claims
+    existed fall back to the database for the missing ones.
+    """
+
+    @cached_property
+    def id(self):
+        # Tokens store the id as a string; filters and FK assignments want the pk type
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def instance(self):
+        """The User row, fetched on first use."""
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    def claim(self, name, fallback):
+        if name in self.token:
+            return self.token[name]
+        return fallback(self.instance)
+
+    @cached_property
+    def username(self):
+        return self.claim('username', lambda user: user.get_username())
+
+    @cached_property
+    def email(self):
+        return self.claim('email', lambda user: user.email)
+
+    @cached_property
+    def is_staff(self):
+        return self.claim('is_staff', lambda user: user.is_staff)
+
+    @cached_property
+    def is_superuser(self):
+        return self.claim('is_superuser', lambda user: user.is_superuser)
+
+    def get_full_name(self):
+        return self.claim('name', lambda user: user.get_full_name())
+
+    def get_short_name(self):
+        return self.get_full_name() or self.username
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """RefreshToken carrying user_claims() (copied into its access tokens)."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user):
+        self.payload.update(user_claims(user))
+
+    def blacklist_cache_timeout(self, listed):
+        if listed:
+            # A blacklisted token stays blacklisted until it expires
+            return max(int(self.payload['exp'] - time.time()), 1)
+        return getattr(settings, 'JWT_BLACKLIST_CACHE_TIMEOUT', 30)
+
+    def check_blacklist(self):
+        """
+        BlacklistMixin.check_blacklist behind the cache. Tokens blacklisted
+        through this class are cached as such at once; a "not blacklisted"
+        answer is reused for JWT_BLACKLIST_CACHE_TIMEOUT seconds.
+        """
+        key = BLACKLIST_KEY.format(self.payload[api_settings.JTI_CLAIM])
+        listed = cache.get(key)
+        if listed is None:
+            try:
+                super().check_blacklist()
+                listed = False
+            except TokenError:
+                listed = True
+            cache.set(key, listed, self.blacklist_cache_timeout(listed))
+        if listed:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        key = BLACKLIST_KEY.format(self.payload[api_settings.JTI_CLAIM])
+        cache.set(key, True, self.blacklist_cache_timeout(True))
+        return blacklisted
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that re-issues the claims from the User row."""
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        refresh.set_user_claims(user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
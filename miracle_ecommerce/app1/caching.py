@@ -0,0 +1,88 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import use_primary
+
+VERSION_KEY = 'catalog:version:{}'
+
+
+def model_versions(*models):
+    """Current version counter of each model label, seeding missing ones."""
+    keys = [VERSION_KEY.format(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted counter never restarts at a
+            # value that older cached responses were stored under.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    key = VERSION_KEY.format(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def response_cache_key(request, models):
+    params = sorted(request.query_params.lists())
+    versions = model_versions(*models)
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = '|'.join([
+        request.build_absolute_uri(request.path),
+        repr(params),
+        getattr(renderer, 'format', ''),
+        repr(versions),
+    ])
+    return 'catalog:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_response(request, models, build):
+    """
+    Serve a read-only catalog response from the cache.
+
+    The key covers the URL, every query parameter (category, search,
+    ordering, cursor, ...) and the version counters of ``models``, which the
+    signal handlers bump on every save/delete, so an admin edit is visible on
+    the next request. The key doubles as the ETag: a matching If-None-Match
+    gets a bodiless 304 without touching the database.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return build()
+
+    key = response_cache_key(request, models)
+    etag = f'"{key.rsplit(":", 1)[1]}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    data = cache.get(key)
+    if data is not None:
+        return Response(data, headers={'ETag': etag})
+
+    # Built from the primary: a lagging replica could otherwise store
+    # pre-edit rows under the version the edit just bumped to
+    with use_primary():
+        response = build()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600))
+        response['ETag'] = etag
+    return response
+
+
+class CachedListMixin:
+    """Cache ``list`` responses of a viewset, invalidated by ``cache_models``."""
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_models, lambda: super(CachedListMixin, self).list(request, *args, **kwargs)
+        )
@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+CART_COOKIE_SALT = 'app1.cart'
+
+
+def normalize_cart(raw):
+    """{product_id: quantity} from stored data; also reads the older
+    {product_id: {'quantity': n, 'product_name': ..., 'price': ...}} session format."""
+    cart = {}
+    if not isinstance(raw, dict):
+        return cart
+    for product_id, entry in raw.items():
+        if isinstance(entry, dict):
+            entry = entry.get('quantity')
+        try:
+            cart[str(int(product_id))] = int(entry)
+        except (TypeError, ValueError):
+            continue
+    return cart
+
+
+class CookieCartStorage:
+    """
+    Anonymous cart kept client-side in a signed cookie holding only
+    {product_id: quantity}. Reads and writes never touch the database, and
+    the cookie is only re-issued when the cart changes.
+    """
+    cookie_name = 'anon_cart'
+
+    def load(self, request):
+        value = request.get_signed_cookie(
+            self.cookie_name, default=None, salt=CART_COOKIE_SALT, max_age=settings.SESSION_COOKIE_AGE
+        )
+        if not value:
+            return {}
+        try:
+            return normalize_cart(json.loads(value))
+        except ValueError:
+            return {}
+
+    def save(self, request, response, cart):
+        if not cart:
+            response.delete_cookie(self.cookie_name, samesite=settings.SESSION_COOKIE_SAMESITE)
+            return
+        response.set_signed_cookie(
+            self.cookie_name,
+            json.dumps(cart, separators=(',', ':')),
+            salt=CART_COOKIE_SALT,
+            max_age=settings.SESSION_COOKIE_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=settings.SESSION_COOKIE_HTTPONLY,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
+
+
+class SessionCartStorage:
+    """
+    Anonymous cart stored in ``request.session['cart']``. The session is
+    only marked modified on a change, so with SESSION_SAVE_EVERY_REQUEST off
+    reads cause no session writes; pair it with a cache SESSION_ENGINE to
+    keep cart writes off the database entirely.
+    """
+
+    def load(self, request):
+        return normalize_cart(request.session.get('cart', {}))
+
+    def save(self, request, response, cart):
+        request.session['cart'] = cart
+
+
+def get_cart_storage():
+    return import_string(settings.ANONYMOUS_CART_STORAGE)()
@@ -0,0 +1,295 @@
+"""
+Streaming catalog import/export (``manage.py catalog_data``).
+
+Rows are read and written one at a time as CSV or JSON Lines, so memory
+stays flat however large the file is. Imports work in batches: each batch
+looks up the rows that already exist by natural key in one query, then
+bulk_updates those and bulk_creates the rest in its own transaction.
+
+Natural keys: categories by name, products by (category name, name) and
+recipes by title. A product's category column names the category and is
+created, in the same batch transaction, if it doesn't exist yet.
+
+Bulk writes skip model signals. The product search index is kept by
+database triggers, and run_import() bumps the catalog cache versions and
+recounts the facets itself. Image variants for imported image paths are
+generated by ``manage.py generate_image_variants``.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, reset_queries, router, transaction
+
+from . import facets
+from .caching import bump_version
+from .models import Category, Product, Recipe
+
+FORMATS = ('csv', 'jsonl')
+# Spellings of booleans accepted in CSV columns
+BOOLEANS = {'true': True, 't': True, 'yes': True, '1': True, 'false': False, 'f': False, 'no': False, '0': False}
+
+
+class RowError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+class Table:
+    """
+    How one model maps to import/export rows. ``columns`` are the row
+    fields, ``key`` the model fields that identify an existing row.
+    """
+
+    def __init__(self, model, key, columns, cache_models=()):
+        self.model = model
+        self.key = key
+        self.columns = columns
+        self.cache_models = cache_models
+
+    def export_rows(self, chunk_size):
+        return self.model.objects.order_by('pk').values_list(*self.columns).iterator(chunk_size=chunk_size)
+
+    def clean(self, line, row, text):
+        """Model values for one input row; ``text`` rows (CSV) hold strings only."""
+        missing = [column for column in self.key if row.get(column) in (None, '')]
+        if missing:
+            raise RowError(line, f'missing {", ".join(missing)}')
+        values = {}
+        for column in self.columns:
+            if column in row:
+                values[column] = self.clean_value(line, column, row[column], text)
+        return values
+
+    def clean_value(self, line, column, value, text):
+        field = self.model._meta.get_field(column)
+        try:
+            if text and field.get_internal_type() == 'JSONField':
+                value = json.loads(value) if value else field.get_default()
+            elif text and field.get_internal_type() == 'BooleanField':
+                value = BOOLEANS.get(value.strip().lower(), value)
+            elif text and value == '' and field.has_default():
+                value = field.get_default()
+            value = field.to_python(value)
+            if value is None and not field.null:
+                raise ValidationError('This field cannot be null.')
+            field.run_validators(value)
+        except ValidationError as exc:
+            raise RowError(line, f'{column}: {" ".join(exc.messages)}')
+        except ValueError as exc:
+            raise RowError(line, f'{column}: {exc}')
+        return value
+
+    def prepare(self, batch):
+        """Hook for tables that resolve references for a whole batch."""
+        return batch
+
+    def new(self, line, values):
+        """An unsaved row for ``values``; every NOT NULL column must have a value."""
+        obj = self.model(**values)
+        missing = [
+            field.name for field in self.model._meta.concrete_fields
+            if not field.null and not field.primary_key
+            and not getattr(field, 'auto_now', False) and not getattr(field, 'auto_now_add', False)
+            and getattr(obj, field.attname) is None
+        ]
+        if missing:
+            raise RowError(line, f'missing {", ".join(missing)} (required for new rows)')
+        return obj
+
+    def key_of(self, values):
+        return tuple(values[column] for column in self.key)
+
+    def existing(self, keys):
+        """Existing rows for ``keys``, by key (the oldest where a key is duplicated)."""
+        lookup = {f'{column}__in': {key[i] for key in keys} for i, column in enumerate(self.key)}
+        found = {}
+        for obj in self.model.objects.filter(**lookup).order_by('-pk'):
+            key = self.key_of({column: getattr(obj, column) for column in self.key})
+            if key in keys:
+                found[key] = obj
+        return found
+
+
+class ProductTable(Table):
+    """Products keyed by (category, name); the category column holds its name."""
+
+    def __init__(self):
+        super().__init__(
+            Product, ('category_id', 'name'),
+            ('category', 'name', 'description', 'price', 'stock', 'is_active', 'image'),
+            # Categories named by new rows are created on the way
+            cache_models=('product', 'category'),
+        )
+        # Category ids by name; categories are few next to products
+        self.category_ids = {}
+
+    def export_rows(self, chunk_size):
+        columns = ['category__name', *self.columns[1:]]
+        return Product.objects.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+    def clean(self, line, row, text):
+        row = dict(row)
+        category = row.pop('category', None)
+        if category in (None, ''):
+            raise RowError(line, 'missing category')
+        if not row.get('name'):
+            raise RowError(line, 'missing name')
+        values = {
+            column: self.clean_value(line, column, row[column], text)
+            for column in self.columns[1:] if column in row
+        }
+        values['category'] = str(category)
+        return values
+
+    def prepare(self, batch):
+        names = {values['category'] for _, values in batch} - set(self.category_ids)
+        if names:
+            Category.objects.bulk_create([Category(name=name) for name in names], ignore_conflicts=True)
+            self.category_ids.update(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        for _, values in batch:
+            values['category_id'] = self.category_ids[values.pop('category')]
+        return batch
+
+
+TABLES = {
+    'categories': lambda: Table(Category, ('name',), ('name', 'description'), cache_models=('category',)),
+    'products': ProductTable,
+    'recipes': lambda: Table(Recipe, ('title',), ('title', 'image', 'ingredients', 'instructions', 'benefits')),
+}
+
+
+def guess_format(path):
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """(line number, row) pairs from a CSV (with header) or JSON Lines stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, 1):
+        if text.strip():
+            try:
+                row = json.loads(text)
+            except ValueError as exc:
+                raise RowError(line, f'invalid JSON: {exc}')
+            if not isinstance(row, dict):
+                raise RowError(line, 'expected a JSON object')
+            yield line, row
+
+
+def write_rows(stream, fmt, columns, rows):
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([json.dumps(value) if isinstance(value, (list, dict)) else value for value in row])
+            yield
+    else:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(columns, row)), default=str) + '\n')
+            yield
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def update(model, objs, fields):
+    """
+    Write ``fields`` of existing ``objs`` as one INSERT ... ON CONFLICT (id)
+    DO UPDATE where supported; bulk_update's per-row CASE expressions make
+    its cost grow with the square of the batch size.
+    """
+    connection = connections[router.db_for_write(model)]
+    if not connection.features.supports_update_conflicts_with_target:
+        model.objects.bulk_update(objs, fields)
+        return
+    model.objects.bulk_create(
+        objs, update_conflicts=True, unique_fields=[model._meta.pk.name], update_fields=fields,
+    )
+
+
+def import_batch(table, batch):
+    """Upsert one batch of cleaned rows; returns (created, updated)."""
+    try:
+        with transaction.atomic():
+            # Rows prepare() inserts (a product's new category) roll back with the batch
+            batch = table.prepare(batch)
+            # Later rows win over earlier ones with the same key
+            rows = {table.key_of(values): (line, values) for line, values in batch}
+            existing = table.existing(rows.keys())
+            updated, update_fields = [], set()
+            for key, obj in existing.items():
+                for column, value in rows[key][1].items():
+                    setattr(obj, column, value)
+                    update_fields.add(column)
+                updated.append(obj)
+            created = [table.new(line, values) for key, (line, values) in rows.items() if key not in existing]
+            fields = sorted(update_fields - set(table.key))
+            if updated and fields:
+                update(table.model, updated, fields)
+            table.model.objects.bulk_create(created)
+    except IntegrityError as exc:
+        raise RowError(batch[0][0], f'the batch starting here was rejected by the database: {exc}')
+    return len(created), len(updated)
+
+
+def run_import(name, stream, fmt, batch_size=1000, progress=None):
+    """
+    Import ``stream`` into table ``name``; ``progress(stats)`` is called
+    after each batch. Returns the final stats. A RowError stops the import;
+    batches before it stay committed.
+    """
+    table = TABLES[name]()
+    text = fmt == 'csv'
+    stats = {'batch': 0, 'rows': 0, 'created': 0, 'updated': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    rows = ((line, table.clean(line, row, text)) for line, row in read_rows(stream, fmt))
+    try:
+        for batch in batches(rows, batch_size):
+            created, updated = import_batch(table, batch)
+            # With DEBUG on every (large) bulk statement is logged; keep memory flat
+            reset_queries()
+            stats.update(
+                batch=stats['batch'] + 1,
+                rows=stats['rows'] + len(batch),
+                created=stats['created'] + created,
+                updated=stats['updated'] + updated,
+                seconds=time.perf_counter() - start,
+            )
+            if progress:
+                progress(stats)
+    finally:
+        if stats['rows']:
+            finish_import(table)
+    return stats
+
+
+def finish_import(table):
+    for model in table.cache_models:
+        bump_version(model)
+    if table.model is Product:
+        facets.rebuild()
+
+
+def run_export(name, stream, fmt, batch_size=1000, progress=None):
+    """Write table ``name`` to ``stream``; ``progress(stats)`` every ``batch_size`` rows."""
+    table = TABLES[name]()
+    stats = {'rows': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    for _ in write_rows(stream, fmt, table.columns, table.export_rows(batch_size)):
+        stats['rows'] += 1
+        if progress and stats['rows'] % batch_size == 0:
+            stats['seconds'] = time.perf_counter() - start
+            progress(stats)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,76 @@
+"""
+Running totals in the Counter summary table, so statistics endpoints read
+a couple of rows instead of counting large tables.
+
+User signals adjust ``users.total`` / ``users.active`` right after the
+user row is written. User.save() opens no transaction of its own, so the
+two only commit together where the caller wraps the save in one, as
+registration does; in autocommit (admin, shell, createsuperuser) a failed
+adjustment leaves the counter out of step with the users table, as do
+writes that bypass signals (queryset.update(), bulk_create, raw SQL).
+``manage.py reconcile_counters`` recounts from cron, and a missing counter
+row is recounted on first use. Reads go through a short-TTL cache entry
+that is dropped whenever a counter changes.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Counter
+
+USERS_TOTAL = 'users.total'
+USERS_ACTIVE = 'users.active'
+USER_COUNTS_KEY = 'counters:users'
+
+
+def user_queries():
+    User = get_user_model()
+    return {
+        USERS_TOTAL: User.objects.all(),
+        USERS_ACTIVE: User.objects.filter(is_active=True),
+    }
+
+
+def reconcile(names=None):
+    """
+    Recount ``names`` (every known counter by default) and store the
+    results; returns ``{name: (old, new)}``. Runs in one write
+    transaction, so no signal adjustment lands between count and store.
+    """
+    queries = user_queries()
+    changes = {}
+    with transaction.atomic():
+        for name in names or queries:
+            value = queries[name].count()
+            old = Counter.objects.filter(name=name).values_list('value', flat=True).first()
+            if old is None:
+                Counter.objects.create(name=name, value=value)
+            elif old != value:
+                Counter.objects.filter(name=name).update(value=value, updated_at=timezone.now())
+            changes[name] = (old, value)
+        transaction.on_commit(lambda: cache.delete(USER_COUNTS_KEY))
+    return changes
+
+
+def adjust(name, delta):
+    if not delta:
+        return
+    if not Counter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now()):
+        # Never counted (or deleted): the recount already includes this change
+        reconcile([name])
+    transaction.on_commit(lambda: cache.delete(USER_COUNTS_KEY))
+
+
+def user_counts():
+    counts = cache.get(USER_COUNTS_KEY)
+    if counts is None:
+        values = dict(Counter.objects.filter(name__in=[USERS_TOTAL, USERS_ACTIVE]).values_list('name', 'value'))
+        if len(values) < 2:
+            reconcile([USERS_TOTAL, USERS_ACTIVE])
+            values = dict(Counter.objects.filter(name__in=[USERS_TOTAL, USERS_ACTIVE]).values_list('name', 'value'))
+        counts = {'total_users': values[USERS_TOTAL], 'active_users': values[USERS_ACTIVE]}
+        cache.set(USER_COUNTS_KEY, counts, getattr(settings, 'USER_COUNT_CACHE_TIMEOUT', 30))
+    return counts
@@ -0,0 +1,138 @@
+"""
+Catalog facets: active product counts per category and price range, kept
+in the CategoryFacet summary table so the storefront sidebar is one
+indexed read instead of a COUNT per category.
+
+Product signals move a product between (category, price bucket) rows
+inside the saving transaction (Product.save() opens one). Writes that
+bypass signals (bulk_create, queryset.update() of price/is_active/category,
+raw SQL) leave the table stale until ``manage.py rebuild_catalog_facets``
+recounts it.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Value, When
+
+from .models import Category, CategoryFacet, Product
+
+DEFAULT_PRICE_EDGES = [10, 25, 50, 100, 250]
+# The fields a product's facet depends on
+FIELDS = ('category_id', 'price', 'is_active')
+# Stored on a Product loaded without one of FIELDS
+UNKNOWN = object()
+
+
+def price_edges():
+    return [Decimal(str(edge)) for edge in getattr(settings, 'CATALOG_FACET_PRICE_EDGES', DEFAULT_PRICE_EDGES)]
+
+
+def price_bucket(price):
+    """Index of the range ``price`` falls in: bucket i is [edges[i-1], edges[i])."""
+    return bisect_right(price_edges(), Decimal(str(price)))
+
+
+def bucket_expression():
+    """price_bucket() as SQL, for recounting in the database."""
+    edges = price_edges()
+    return Case(
+        *[When(price__lt=edge, then=Value(i)) for i, edge in enumerate(edges)],
+        default=Value(len(edges)),
+    )
+
+
+def facet_key(product):
+    """(category_id, bucket) a product is counted under, None if inactive."""
+    fields = product.__dict__
+    if any(name not in fields for name in FIELDS):
+        return UNKNOWN
+    return key_of(fields)
+
+
+def stored_key(product_id):
+    """facet_key() of the row as stored, for products loaded without FIELDS."""
+    fields = Product.objects.filter(pk=product_id).values(*FIELDS).first()
+    return key_of(fields) if fields else None
+
+
+def key_of(fields):
+    if not fields['is_active'] or fields['price'] is None:
+        return None
+    return fields['category_id'], price_bucket(fields['price'])
+
+
+def adjust(key, delta):
+    category_id, bucket = key
+    facets = CategoryFacet.objects.filter(category_id=category_id, bucket=bucket)
+    if facets.update(product_count=F('product_count') + delta) or delta < 0:
+        # A missing row on a decrement was never counted (or its category
+        # is being deleted); the next rebuild settles it
+        return
+    try:
+        with transaction.atomic():
+            CategoryFacet.objects.create(category_id=category_id, bucket=bucket, product_count=delta)
+    except IntegrityError:
+        facets.update(product_count=F('product_count') + delta)
+
+
+def move(old, new):
+    """Count a product under ``new`` instead of ``old`` (either may be None)."""
+    if old != new:
+        if old is not None:
+            adjust(old, -1)
+        if new is not None:
+            adjust(new, 1)
+
+
+def rebuild():
+    """Recount every facet from Product; returns the number of active products counted."""
+    rows = (
+        Product.objects.filter(is_active=True)
+        .annotate(bucket=bucket_expression())
+        .values('category_id', 'bucket')
+        .annotate(product_count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        CategoryFacet.objects.all().delete()
+        facets = CategoryFacet.objects.bulk_create([CategoryFacet(**row) for row in rows], batch_size=500)
+    return sum(facet.product_count for facet in facets)
+
+
+def price_ranges(counts):
+    edges = [None, *price_edges(), None]
+    return [
+        {
+            'min': str(edges[i]) if edges[i] is not None else None,
+            'max': str(edges[i + 1]) if edges[i + 1] is not None else None,
+            'count': count,
+        }
+        for i, count in enumerate(counts)
+    ]
+
+
+def catalog_facets():
+    """
+    Every category (by name) with its active product count and price
+    histogram, plus the totals over all categories. One query.
+    """
+    buckets = len(price_edges()) + 1
+    categories, totals = {}, [0] * buckets
+    rows = Category.objects.order_by('name', 'id', 'facets__bucket').values_list(
+        'id', 'name', 'facets__bucket', 'facets__product_count',
+    )
+    for category_id, name, bucket, count in rows:
+        counts = categories.setdefault(category_id, (name, [0] * buckets))[1]
+        if bucket is not None and bucket < buckets:
+            counts[bucket] += count
+            totals[bucket] += count
+    return {
+        'product_count': sum(totals),
+        'price_ranges': price_ranges(totals),
+        'categories': [
+            {'id': category_id, 'name': name, 'product_count': sum(counts), 'price_ranges': price_ranges(counts)}
+            for category_id, (name, counts) in categories.items()
+        ],
+    }
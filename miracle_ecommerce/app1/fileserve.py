@@ -0,0 +1,126 @@
+"""
+Static and media file serving from Django itself, for deployments with
+no web server in front (replaces ``django.conf.urls.static``, which only
+works under DEBUG).
+
+Files whose name carries a content hash never change: manifest static
+files (``index.3f5a9c0d12ab.js``, see app1.storage), hashed uploads,
+image variants and HLS packages. They are sent with a year-long
+``immutable`` Cache-Control. Other files get a short lifetime and are then
+revalidated against their ETag (304). A precompressed ``.br`` / ``.gz``
+sibling is sent instead of the file when the client accepts it. Range and
+conditional handling come from app1.streaming.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .streaming import serve_file
+
+IMMUTABLE_NAME = re.compile(
+    r'(?:^|/)[^/]+\.[0-9a-f]{12}\.[^/.]+$'  # name.<hash>.ext
+    r'|^variants/'                           # app1.images
+    r'|^hls/\d+/[0-9a-f]{12}/'               # app1.hls versions
+)
+
+# Preference order of precompressed siblings
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def cache_control(name):
+    if IMMUTABLE_NAME.search(name):
+        max_age = getattr(settings, 'FILE_SERVE_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60)
+        return f'public, max-age={max_age}, immutable'
+    return f"public, max-age={getattr(settings, 'FILE_SERVE_MAX_AGE', 60)}"
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        quality = params.strip().lower()
+        if quality.startswith('q=') and quality[2:].strip('0.') == '':
+            continue  # q=0: explicitly refused
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def precompressed(request, path):
+    """
+    ``(path_to_send, content_encoding, has_siblings)`` for ``path``: the
+    first sibling the client accepts, else the file itself.
+    """
+    accepted = None
+    has_siblings = False
+    for coding, suffix in ENCODINGS:
+        if os.path.isfile(path + suffix):
+            has_siblings = True
+            if accepted is None:
+                accepted = accepted_encodings(request)
+            if coding in accepted:
+                return path + suffix, coding, True
+    return path, None, has_siblings
+
+
+def resolve(root, name):
+    """Absolute path of file ``name`` under ``root``, or None."""
+    if not root or any(part.startswith('.') for part in name.split('/')):
+        return None
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def serve_path(request, path, name, offload=False):
+    content_type, _ = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+    sent, encoding, has_siblings = precompressed(request, path)
+    response = serve_file(request, sent, content_type, offload=offload and encoding is None)
+    if encoding and response.status_code in (200, 206):
+        response['Content-Encoding'] = encoding
+        if 'Content-Disposition' in response:
+            # FileResponse names the sibling (tea.js.gz) here
+            del response['Content-Disposition']
+    if has_siblings:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    response['Cache-Control'] = cache_control(name)
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    full_path = resolve(settings.STATIC_ROOT, path)
+    if full_path is None and not any(part.startswith('.') for part in path.split('/')):
+        # Not collected yet (development): look in STATICFILES_DIRS/apps
+        full_path = finders.find(path)
+    if not full_path or not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return serve_path(request, full_path, path)
+
+
+@require_safe
+def serve_media(request, path):
+    full_path = resolve(settings.MEDIA_ROOT, path)
+    if full_path is None:
+        raise Http404('File not found')
+    return serve_path(request, full_path, path, offload=True)
+
+
+def file_urlpatterns():
+    """URL patterns for STATIC_URL and MEDIA_URL (skipped when either is on another host)."""
+    patterns = []
+    for prefix, view in ((settings.STATIC_URL, serve_static), (settings.MEDIA_URL, serve_media)):
+        if prefix and '://' not in prefix and not prefix.startswith('//'):
+            patterns.append(re_path(r'^%s(?P<path>.+)$' % re.escape(prefix.lstrip('/')), view))
+    return patterns
@@ -0,0 +1,186 @@
+"""
+Offline HLS packaging for AboutVideo uploads.
+
+Saving an AboutVideo with a new file marks it ``pending`` and, once the
+transaction commits, hands it to a small in-process worker pool. Each
+rendition in HLS_RENDITIONS is encoded with ffmpeg into 6-second segments
+under ``MEDIA_ROOT/hls/<pk>/<version>/``, a master playlist is written next
+to them, and the row is flipped to ``ready``. Pending rows double as the
+queue: ``manage.py package_about_videos`` picks up anything a restart left
+behind and backfills older uploads.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import AboutVideo
+from .workers import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+HLS_DIR = 'hls'
+MASTER_PLAYLIST = 'master.m3u8'
+
+
+class PackagingError(Exception):
+    pass
+
+
+def renditions():
+    return getattr(settings, 'HLS_RENDITIONS', [])
+
+
+def video_dir(pk):
+    return os.path.join(settings.MEDIA_ROOT, HLS_DIR, str(pk))
+
+
+def source_version(path, name):
+    """Short token for an upload; changes whenever the file does."""
+    stat = os.stat(path)
+    raw = f'{name}:{stat.st_size}:{stat.st_mtime_ns}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def ffmpeg_command(source, output_dir, rendition):
+    segment_seconds = getattr(settings, 'HLS_SEGMENT_SECONDS', 6)
+    video_kbps = rendition['video_kbps']
+    return [
+        getattr(settings, 'HLS_FFMPEG_BINARY', 'ffmpeg'),
+        '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        # Never upscale a small source
+        '-vf', f"scale=-2:'min(ih,{rendition['height']})'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+        '-b:v', f'{video_kbps}k', '-maxrate', f'{int(video_kbps * 1.07)}k', '-bufsize', f'{video_kbps * 3 // 2}k',
+        # Keyframes on segment boundaries in every rendition so players can switch
+        '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})', '-sc_threshold', '0',
+        '-c:a', 'aac', '-b:a', f"{rendition['audio_kbps']}k", '-ac', '2',
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, 'seg_%04d.ts'),
+        os.path.join(output_dir, 'index.m3u8'),
+    ]
+
+
+def master_playlist(rendition_list):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for rendition in rendition_list:
+        bandwidth = (int(rendition['video_kbps'] * 1.07) + rendition['audio_kbps']) * 1000
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}')
+        lines.append(f"{rendition['name']}/index.m3u8")
+    return '\n'.join(lines) + '\n'
+
+
+def encode(source, output_dir):
+    """Write every rendition plus the master playlist into ``output_dir``."""
+    rendition_list = sorted(renditions(), key=lambda r: r['video_kbps'])
+    timeout = getattr(settings, 'HLS_ENCODE_TIMEOUT', 60 * 60)
+    for rendition in rendition_list:
+        rendition_dir = os.path.join(output_dir, rendition['name'])
+        os.makedirs(rendition_dir)
+        try:
+            subprocess.run(
+                ffmpeg_command(source, rendition_dir, rendition),
+                check=True, capture_output=True, timeout=timeout,
+            )
+        except FileNotFoundError:
+            raise PackagingError(f"encoder not found: {getattr(settings, 'HLS_FFMPEG_BINARY', 'ffmpeg')}")
+        except subprocess.TimeoutExpired:
+            raise PackagingError(f"{rendition['name']}: encoder timed out after {timeout}s")
+        except subprocess.CalledProcessError as exc:
+            stderr = exc.stderr.decode(errors='replace').strip()[-2000:]
+            raise PackagingError(f"{rendition['name']}: encoder exited {exc.returncode}: {stderr}")
+    with open(os.path.join(output_dir, MASTER_PLAYLIST), 'w') as f:
+        f.write(master_playlist(rendition_list))
+
+
+def package_video(pk):
+    """
+    Package one pending video. Returns the new status, or None if the row
+    was not pending (already claimed by another worker, or nothing to do).
+    """
+    if not AboutVideo.objects.filter(pk=pk, hls_status=AboutVideo.HLSStatus.PENDING).update(
+        hls_status=AboutVideo.HLSStatus.PROCESSING
+    ):
+        return None
+    video = AboutVideo.objects.get(pk=pk)
+    name = video.video.name
+    # Only record the result if the upload did not change underneath us; a
+    # new upload has already re-queued the row as pending.
+    current = AboutVideo.objects.filter(pk=pk, hls_source=name, hls_status=AboutVideo.HLSStatus.PROCESSING)
+
+    try:
+        if not name:
+            raise PackagingError('no video file')
+        source = video.video.path
+        version = source_version(source, name)
+        parent = video_dir(pk)
+        os.makedirs(parent, exist_ok=True)
+        # Encode into a scratch directory and rename it into place, so a
+        # playlist is never visible half-written.
+        scratch = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+        try:
+            encode(source, scratch)
+            target = os.path.join(parent, version)
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(scratch, target)
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+    except (PackagingError, OSError) as exc:
+        logger.warning('HLS packaging failed for AboutVideo %s: %s', pk, exc)
+        current.update(hls_status=AboutVideo.HLSStatus.FAILED, hls_error=str(exc))
+        return AboutVideo.HLSStatus.FAILED
+
+    manifest = '/'.join([HLS_DIR, str(pk), version, MASTER_PLAYLIST])
+    if not current.update(hls_status=AboutVideo.HLSStatus.READY, hls_manifest=manifest, hls_error=''):
+        return None
+    remove_versions(pk, keep=version)
+    return AboutVideo.HLSStatus.READY
+
+
+def remove_versions(pk, keep=None):
+    """Delete packaged versions of ``pk`` other than ``keep`` (all of them if None)."""
+    parent = video_dir(pk)
+    if keep is None:
+        shutil.rmtree(parent, ignore_errors=True)
+        return
+    if not os.path.isdir(parent):
+        return
+    for entry in os.listdir(parent):
+        if entry != keep and not entry.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def enqueue(pk):
+    """Package ``pk`` on the HLS worker pool after commit (inline with HLS_WORKERS = 0)."""
+    run_after_commit('hls', getattr(settings, 'HLS_WORKERS', 1), package_video, pk)
+
+
+def mark_pending(video):
+    """
+    Queue ``video`` for packaging if its upload is not already packaged,
+    queued or being packaged. Returns True when a job should be enqueued.
+    """
+    Status = AboutVideo.HLSStatus
+    name = video.video.name if video.video else ''
+    if not name:
+        if video.hls_status == Status.NONE:
+            return False
+        fields = dict(hls_status=Status.NONE, hls_manifest='', hls_source='', hls_error='')
+        transaction.on_commit(lambda: remove_versions(video.pk))
+    elif name == video.hls_source and video.hls_status != Status.NONE:
+        # Same upload: ready, in flight, or failed (retried by the backfill command)
+        return False
+    else:
+        fields = dict(hls_status=Status.PENDING, hls_source=name, hls_error='')
+    AboutVideo.objects.filter(pk=video.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(video, field, value)
+    return bool(name)
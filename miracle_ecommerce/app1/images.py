@@ -0,0 +1,210 @@
+"""
+Responsive variants of uploaded images (Product, Recipe and ImageUpload).
+
+After an upload is committed, a worker pool decodes the image once and
+writes a copy per width in IMAGE_VARIANT_WIDTHS (never wider than the
+original) in each format in IMAGE_VARIANT_FORMATS. Files are named after a
+hash of the source bytes, ``variants/ab/<hash>-<width>w.<ext>``, so they
+can be served with a far-future cache lifetime, identical uploads share
+files, and a file that already exists on disk is not encoded again.
+
+The generated names are stored on the row in ``image_variants``, so the
+serializers build ``srcset`` strings without touching the filesystem.
+Images uploaded before this existed get URLs to the ``image_variant`` view,
+which generates the variants on first request and redirects to the file.
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+from .caching import bump_version
+from .models import ImageUpload, Product, Recipe
+from .workers import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'variants'
+
+# Models with an ``image`` + ``image_variants`` pair, keyed by model_name
+IMAGE_MODELS = {model._meta.model_name: model for model in (Product, Recipe, ImageUpload)}
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'optimize': True, 'progressive': True}),
+    'avif': ('AVIF', 'avif', {'speed': 6}),
+}
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 1024]))
+
+
+def variant_formats():
+    return getattr(settings, 'IMAGE_VARIANT_FORMATS', ['webp', 'jpeg'])
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def variant_name(digest, width, fmt):
+    return f'{VARIANT_DIR}/{digest[:2]}/{digest}-{width}w.{FORMATS[fmt][1]}'
+
+
+def prepare(image, fmt):
+    """Convert to a mode the encoder accepts; JPEG loses alpha onto white."""
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'jpeg':
+        if has_alpha:
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if has_alpha:
+        return image.convert('RGBA') if image.mode != 'RGBA' else image
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def save_atomic(image, name, fmt):
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pil_format, _, options = FORMATS[fmt]
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', {}).get(fmt, 80)
+    scratch = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        image.save(scratch, pil_format, quality=quality, **options)
+        os.replace(scratch, path)
+    except BaseException:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+
+
+def generate_variants(name):
+    """
+    Write the variants of media file ``name`` (skipping ones already on
+    disk) and return the ``image_variants`` value describing them.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    digest = file_digest(path)
+    formats = [fmt for fmt in variant_formats() if fmt in FORMATS]
+    with Image.open(path) as image:
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            width, height = height, width
+        widths = sorted({min(w, width) for w in variant_widths()})
+        names = {fmt: {str(w): variant_name(digest, w, fmt) for w in widths} for fmt in formats}
+
+        missing = {
+            (w, fmt) for fmt in formats for w in widths
+            if not os.path.exists(os.path.join(settings.MEDIA_ROOT, names[fmt][str(w)]))
+        }
+        if missing:
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale directly; ask for no
+            # less than the largest target in either orientation.
+            largest = max(w for w, _ in missing)
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            for w in sorted({w for w, _ in missing}, reverse=True):
+                h = max(1, round(height * w / width))
+                resized = image if image.size == (w, h) else image.resize((w, h), Image.LANCZOS, reducing_gap=3.0)
+                for fmt in formats:
+                    if (w, fmt) in missing:
+                        save_atomic(prepare(resized, fmt), names[fmt][str(w)], fmt)
+
+    return {'source': name, 'hash': digest, 'width': width, 'height': height, 'formats': names}
+
+
+def is_current(name, variants):
+    return bool(variants) and variants.get('source') == name
+
+
+def refresh_variants(model_name, pk):
+    """
+    Generate variants for one row if its image changed since the last run.
+    The result is stored with a conditional update, so a newer upload that
+    landed meanwhile is never overwritten with stale names.
+    """
+    model = IMAGE_MODELS[model_name]
+    row = model.objects.filter(pk=pk).values('image', 'image_variants').first()
+    if not row or not row['image'] or is_current(row['image'], row['image_variants']):
+        return row and row['image_variants']
+    name = row['image']
+    try:
+        variants = generate_variants(name)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning('Image variants failed for %s %s (%s): %s', model_name, pk, name, exc)
+        variants = {'source': name, 'formats': {}}
+    if model.objects.filter(pk=pk, image=name).update(image_variants=variants):
+        # Cached catalog responses embed the srcset
+        bump_version(model_name)
+    return variants
+
+
+def enqueue(instance):
+    """Queue variant generation for a saved instance whose image changed."""
+    image = instance.image
+    if not image or is_current(image.name, instance.image_variants):
+        return
+    run_after_commit(
+        'images', getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+        refresh_variants, instance._meta.model_name, instance.pk,
+    )
+
+
+def pick_variant(variants, fmt, width):
+    """Name of the narrowest ``fmt`` variant at least ``width`` wide (else the widest)."""
+    names = (variants or {}).get('formats', {}).get(fmt)
+    if not names:
+        return None
+    widths = sorted(int(w) for w in names)
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return names[str(chosen)]
+
+
+def media_base_url(request=None):
+    """
+    URL prefix of files in MEDIA_ROOT (absolute when ``request`` is given).
+    List serializers resolve it once and append names per row instead of a
+    storage.url() + build_absolute_uri() round per image.
+    """
+    base = default_storage.url('')
+    return request.build_absolute_uri(base) if request is not None else base
+
+
+def media_url(base, name):
+    return base + filepath_to_uri(name) if name else None
+
+
+def image_srcset(model_name, pk, name, variants, request=None, media_base=None):
+    """
+    ``{format: srcset}`` for an image, e.g. ``{'webp': '<url> 320w, <url> 640w'}``.
+    Rows without current variants point at the lazy ``image_variant`` view.
+    """
+    if not name:
+        return None
+    if is_current(name, variants):
+        base = media_base if media_base is not None else media_base_url(request)
+        return {
+            fmt: ', '.join(f'{base}{names[w]} {w}w' for w in sorted(names, key=int))
+            for fmt, names in variants['formats'].items()
+        } or None
+
+    # One reverse per image; the width/format tail is filled in per variant
+    formats, widths = variant_formats(), variant_widths()
+    url = reverse('image_variant', kwargs={'model': model_name, 'pk': pk, 'width': widths[0], 'fmt': formats[0]})
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    prefix = url.rsplit('/', 1)[0]
+    return {fmt: ', '.join(f'{prefix}/{width}.{fmt} {width}w' for width in widths) for fmt in formats}
@@ -0,0 +1,163 @@
+"""
+Outgoing mail through a persistent outbox.
+
+queue_email() only inserts an OutboxEmail row, so a request never waits
+on SMTP. Once the transaction commits, a pool of MAIL_WORKERS threads
+claims pending rows in batches with a conditional update and sends them
+over an SMTP connection that each thread keeps open between batches.
+Failures are retried with exponential backoff up to MAIL_MAX_ATTEMPTS.
+A row claimed by a worker that died is retried after MAIL_SENDING_TIMEOUT,
+and ``manage.py send_queued_mail`` drains whatever a restart left behind.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+from .workers import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+Status = OutboxEmail.Status
+
+_local = threading.local()
+_lock = threading.Lock()
+_active = 0
+_rerun = False
+
+
+def mail_workers():
+    return getattr(settings, 'MAIL_WORKERS', 2)
+
+
+def smtp_connection():
+    """This thread's open mail connection, reopened when idle too long."""
+    connection = getattr(_local, 'connection', None)
+    idle = time.monotonic() - getattr(_local, 'used', 0)
+    if connection is not None and idle > getattr(settings, 'MAIL_CONNECTION_IDLE_TIMEOUT', 60):
+        # Servers drop idle sessions; do not wait for the failure
+        close_connection()
+        connection = None
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _local.connection = connection
+    _local.used = time.monotonic()
+    return connection
+
+
+def close_connection():
+    connection = getattr(_local, 'connection', None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def claim_batch(size):
+    """Claim up to ``size`` due rows for this worker; returns them."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'MAIL_SENDING_TIMEOUT', 300))
+    due = (
+        Q(status=Status.PENDING, available_at__lte=now)
+        | Q(status=Status.SENDING, claimed_at__lt=stale)
+    )
+    ids = list(OutboxEmail.objects.filter(due).order_by('available_at', 'id').values_list('id', flat=True)[:size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-check the condition: another worker may have claimed some of them
+    OutboxEmail.objects.filter(due, id__in=ids).update(
+        status=Status.SENDING, claim=token, claimed_at=now, attempts=F('attempts') + 1,
+    )
+    return list(OutboxEmail.objects.filter(claim=token, status=Status.SENDING))
+
+
+def record_failure(row, exc):
+    max_attempts = getattr(settings, 'MAIL_MAX_ATTEMPTS', 5)
+    owned = OutboxEmail.objects.filter(pk=row.pk, claim=row.claim, status=Status.SENDING)
+    if row.attempts >= max_attempts:
+        logger.error('Giving up on mail %s to %s after %s attempts: %s', row.pk, row.to_email, row.attempts, exc)
+        owned.update(status=Status.FAILED, last_error=str(exc))
+        return
+    delay = getattr(settings, 'MAIL_RETRY_DELAY', 30) * 2 ** (row.attempts - 1)
+    logger.warning('Mail %s to %s failed (attempt %s), retrying in %ss: %s', row.pk, row.to_email, row.attempts, delay, exc)
+    owned.update(
+        status=Status.PENDING, last_error=str(exc),
+        available_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def send_batch(rows):
+    sent = 0
+    for row in rows:
+        message = EmailMessage(
+            row.subject, row.body, row.from_email or None, [row.to_email],
+        )
+        try:
+            message.connection = smtp_connection()
+            message.send()
+        except Exception as exc:
+            # The session may be unusable after an error
+            close_connection()
+            record_failure(row, exc)
+            continue
+        OutboxEmail.objects.filter(pk=row.pk, claim=row.claim).update(
+            status=Status.SENT, sent_at=timezone.now(), body='', last_error='',
+        )
+        sent += 1
+    return sent
+
+
+def drain():
+    """Send due mail until none is left; returns the number sent."""
+    size = getattr(settings, 'MAIL_BATCH_SIZE', 20)
+    sent = 0
+    while True:
+        rows = claim_batch(size)
+        if not rows:
+            return sent
+        sent += send_batch(rows)
+
+
+def drain_coalesced():
+    """
+    Worker job queued per email. A burst of signups queues many jobs, but at
+    most MAIL_WORKERS drains run at once; the rest ask a running drain to
+    make another pass instead of each scanning the table.
+    """
+    global _active, _rerun
+    with _lock:
+        if _active >= max(mail_workers(), 1):
+            _rerun = True
+            return
+        _active += 1
+    try:
+        while True:
+            with _lock:
+                _rerun = False
+            drain()
+            with _lock:
+                if not _rerun:
+                    _active -= 1
+                    return
+    except BaseException:
+        with _lock:
+            _active -= 1
+        raise
+
+
+def queue_email(to_email, subject, body, from_email=''):
+    """Add a message to the outbox; it is sent after the transaction commits."""
+    row = OutboxEmail.objects.create(to_email=to_email, subject=subject, body=body, from_email=from_email)
+    run_after_commit('mail', mail_workers(), drain_coalesced)
+    return row
@@ -0,0 +1,75 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app1.models import Category, Product
+from app1.search import search_products
+
+WORDS = (
+    'moringa leaf powder tea capsule organic oil seed soap honey green herbal '
+    'tonic blend extract dried fresh superfood vitamin iron calcium protein'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the FTS5 product search against the icontains LIKE scan on '
+        'synthetic catalogs. Rows are inserted inside a transaction that is '
+        'rolled back, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', nargs='+', default=['moringa', 'herb', 'green tea', 'batch7777'])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        for size in options['sizes']:
+            with transaction.atomic():
+                self.populate(size, rng)
+                for query in options['queries']:
+                    like = self.time(lambda: self.like_search(query), options['repeat'])
+                    fts = self.time(lambda: search_products(self.base(), query).order_by('search_rank')[:20], options['repeat'])
+                    self.stdout.write(
+                        f'{size:>9} rows  {query!r:<16} LIKE {like * 1000:8.2f} ms   '
+                        f'FTS {fts * 1000:8.2f} ms   x{like / fts if fts else 0:.1f}'
+                    )
+                transaction.set_rollback(True)
+
+    def base(self):
+        return Product.objects.filter(is_active=True).values('id', 'name', 'price')
+
+    def like_search(self, query):
+        products = self.base()
+        for term in query.split():
+            products = products.filter(name__icontains=term) | products.filter(description__icontains=term)
+        return products.order_by('-created_at')[:20]
+
+    def time(self, build, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(build())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def populate(self, size, rng):
+        category = Category.objects.create(name=f'benchmark-{size}-{rng.random()}')
+        batch = []
+        for i in range(size):
+            batch.append(Product(
+                category=category,
+                name=' '.join(rng.sample(WORDS, 3)) + f' batch{i}',
+                description=' '.join(rng.choices(WORDS, k=30)),
+                price=Decimal(rng.randint(100, 10_000)) / 100,
+                stock=rng.randint(0, 500),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
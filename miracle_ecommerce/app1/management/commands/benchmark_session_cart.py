@@ -0,0 +1,64 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app1.models import Category, Product
+from app1.views import session_cart_data
+
+
+def per_item_lookup(cart):
+    """The previous anonymous cart read: one Product.objects.get per entry."""
+    items, total_items, total_price = [], 0, 0
+    for product_id, entry in cart.items():
+        try:
+            product = Product.objects.get(id=int(product_id))
+        except Product.DoesNotExist:
+            continue
+        items.append({
+            'id': product_id,
+            'product_name': product.name,
+            'quantity': entry,
+            'price': str(product.price),
+            'image': product.image.url if product.image else '',
+        })
+        total_items += entry
+        total_price += float(product.price) * entry
+    return {'items': items, 'total_items': total_items, 'total_price': total_price}
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the anonymous session-cart read for carts of several sizes, '
+        'per-item lookups vs the batched read. Runs in a rolled-back transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            category = Category.objects.create(name=f'benchmark-cart-{time.time()}')
+            products = Product.objects.bulk_create([
+                Product(category=category, name=f'Item {i}', description='', price=Decimal('9.99'), stock=10)
+                for i in range(max(options['sizes']))
+            ])
+            for size in options['sizes']:
+                cart = {str(p.pk): 2 for p in products[:size]}
+                for label, read in (('per-item', per_item_lookup), ('batched', session_cart_data)):
+                    with CaptureQueriesContext(connection) as queries:
+                        read(cart)
+                    elapsed = self.time(read, cart, options['repeat'])
+                    self.stdout.write(
+                        f'{size:>4} items  {label:<9} {len(queries):>4} queries  {elapsed * 1000:8.3f} ms'
+                    )
+            transaction.set_rollback(True)
+
+    def time(self, read, cart, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            read(cart)
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from miracle_ecommerce.database import BUSY_TIMEOUT, PRAGMAS, init_command
+
+SCHEMA = """
+CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, stock INTEGER);
+CREATE TABLE cart_item (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER);
+"""
+
+
+class Mode:
+    """How a worker gets its connection: the old defaults or the tuned settings."""
+
+    def __init__(self, label, pragmas, persistent, timeout):
+        self.label = label
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connect(self, path):
+        conn = sqlite3.connect(path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        if self.pragmas:
+            conn.executescript(init_command(self.pragmas))
+        return conn
+
+    def connection(self, path):
+        if not self.persistent:
+            return self.connect(path)
+        if getattr(self.local, 'conn', None) is None:
+            self.local.conn = self.connect(path)
+        return self.local.conn
+
+    def release(self, conn):
+        if not self.persistent:
+            conn.close()
+
+
+MODES = {
+    # Django's sqlite3 defaults before: rollback journal, FULL syncs, 5 s
+    # timeout, a new connection per request
+    'legacy': lambda: Mode('legacy', {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, False, 5),
+    'tuned': lambda: Mode('tuned', PRAGMAS, True, BUSY_TIMEOUT),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent catalog readers and cart writers against a scratch '
+        'SQLite file with the old connection settings and with '
+        'miracle_ecommerce.database, and report throughput, p95 latency and '
+        '"database is locked" errors. Never touches the configured databases.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['legacy', 'tuned'])
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--products', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for name in options['modes']:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['products'])
+                self.run(MODES[name](), path, options)
+
+    def seed(self, path, products):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO product (id, name, stock) VALUES (?, ?, ?)',
+            [(i, f'Item {i}', 100) for i in range(1, products + 1)],
+        )
+        conn.commit()
+        conn.close()
+
+    def run(self, mode, path, options):
+        products = options['products']
+        deadline = time.perf_counter() + options['seconds']
+        results = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+
+        def read(conn, i):
+            start = i % products
+            conn.execute(
+                'SELECT id, name, stock FROM product WHERE id > ? ORDER BY id LIMIT 50', [start]
+            ).fetchall()
+            conn.execute('SELECT COUNT(*), SUM(stock) FROM product').fetchone()
+
+        def write(conn, i):
+            product_id = i % products + 1
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('INSERT INTO cart_item (product_id, quantity) VALUES (?, 1)', [product_id])
+                conn.execute('UPDATE product SET stock = stock - 1 WHERE id = ?', [product_id])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+        def worker(kind, operation, seed):
+            timings, failed, i = [], 0, seed
+            while time.perf_counter() < deadline:
+                i += 7919
+                start = time.perf_counter()
+                try:
+                    conn = mode.connection(path)
+                    try:
+                        operation(conn, i)
+                    finally:
+                        mode.release(conn)
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    failed += 1
+                    continue
+                timings.append(time.perf_counter() - start)
+            conn = getattr(mode.local, 'conn', None)
+            if conn is not None:
+                conn.close()
+            with lock:
+                results[kind].extend(timings)
+                errors[kind] += failed
+
+        threads = [
+            threading.Thread(target=worker, args=('read', read, n)) for n in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=('write', write, n)) for n in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for kind in ('read', 'write'):
+            timings = sorted(results[kind])
+            p95 = timings[int(len(timings) * 0.95)] * 1000 if timings else 0
+            p50 = statistics.median(timings) * 1000 if timings else 0
+            self.stdout.write(
+                f'{mode.label:<7} {kind:<5} {len(timings) / options["seconds"]:9.0f} ops/s  '
+                f'p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  {errors[kind]:>5} locked'
+            )
@@ -0,0 +1,134 @@
+import http.client
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from django.urls import path
+
+from app1.streaming import serve_file
+
+VIDEO_PATH = None
+
+
+def legacy_view(request):
+    """The previous stream_about_video range branch: 8 KB generator reads."""
+    file_size = os.path.getsize(VIDEO_PATH)
+    start_str, end_str = request.headers['Range'].split('=')[1].split('-')
+    start = int(start_str) if start_str else 0
+    end = min(int(end_str) if end_str else file_size - 1, file_size - 1)
+    length = end - start + 1
+
+    def file_iterator(offset, remaining, chunk_size=8192):
+        with open(VIDEO_PATH, 'rb') as f:
+            f.seek(offset)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    resp = StreamingHttpResponse(file_iterator(start, length), status=206, content_type='video/mp4')
+    resp['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+    resp['Content-Length'] = str(length)
+    return resp
+
+
+def engine_view(request):
+    return serve_file(request, VIDEO_PATH, content_type='video/mp4')
+
+
+urlpatterns = [
+    path('legacy/', legacy_view),
+    path('engine/', engine_view),
+]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a scratch video file through the previous 8 KB generator and '
+        'through app1.streaming on a threaded WSGI server, and measure '
+        'throughput with concurrent range readers. Needs no database rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=64)
+        parser.add_argument('--readers', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=10, help='range requests per reader')
+        parser.add_argument('--range-kb', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        global VIDEO_PATH
+        size = options['size_mb'] * 1024 * 1024
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as video:
+            video.write(os.urandom(size))
+            VIDEO_PATH = video.name
+        try:
+            with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['*'], DEBUG=False):
+                server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+                server.daemon_threads = True
+                server.set_app(WSGIHandler())
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                try:
+                    for name in ('legacy', 'engine'):
+                        self.run(name, server.server_port, size, options)
+                finally:
+                    server.shutdown()
+                    server.server_close()
+        finally:
+            os.unlink(VIDEO_PATH)
+
+    def run(self, name, port, size, options):
+        span = options['range_kb'] * 1024
+        stats = {'bytes': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def reader(seed):
+            rng = random.Random(seed)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            received = errors = 0
+            for _ in range(options['requests']):
+                start = rng.randrange(0, size - span)
+                try:
+                    conn.request('GET', f'/{name}/', headers={'Range': f'bytes={start}-{start + span - 1}'})
+                    response = conn.getresponse()
+                    body = response.read()
+                    if response.status != 206 or len(body) != span:
+                        errors += 1
+                    received += len(body)
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            conn.close()
+            with lock:
+                stats['bytes'] += received
+                stats['errors'] += errors
+
+        workers = [threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])]
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+
+        total = options['readers'] * options['requests']
+        self.stdout.write(
+            f'{name:<7} {total / elapsed:8.1f} req/s  {stats["bytes"] / elapsed / 2 ** 20:8.1f} MiB/s  '
+            f'cpu {cpu:6.2f}s  {stats["errors"]:>3} errors'
+        )
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app1 import catalog_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Import or export categories, products or recipes as streaming CSV or '
+        'JSON Lines. Imports upsert by natural key (category name, product '
+        'category + name, recipe title) in batches of bulk_create/bulk_update; '
+        'progress goes to stderr. Use "-" for stdin/stdout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['import', 'export'])
+        parser.add_argument('table', choices=sorted(catalog_io.TABLES))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=catalog_io.FORMATS, help='default: from the file extension, else csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or catalog_io.guess_format(options['path'])
+        path, batch_size = options['path'], max(options['batch_size'], 1)
+        if options['action'] == 'import':
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+            try:
+                stats = catalog_io.run_import(options['table'], stream, fmt, batch_size, self.import_progress)
+            except catalog_io.RowError as exc:
+                raise CommandError(f'{path}, {exc} (the batches before it were imported)')
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+            self.stderr.write(self.style.SUCCESS(
+                f'Imported {stats["rows"]} rows ({stats["created"]} created, {stats["updated"]} updated) '
+                f'in {stats["seconds"]:.1f}s.'
+            ))
+        else:
+            stream = self.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+            try:
+                stats = catalog_io.run_export(options['table'], stream, fmt, batch_size, self.export_progress)
+            finally:
+                if path != '-':
+                    stream.close()
+            self.stderr.write(self.style.SUCCESS(f'Exported {stats["rows"]} rows in {stats["seconds"]:.1f}s.'))
+
+    def import_progress(self, stats):
+        self.stderr.write(
+            f'batch {stats["batch"]}: {stats["rows"]} rows, {stats["created"]} created, '
+            f'{stats["updated"]} updated, {stats["rows"] / max(stats["seconds"], 1e-9):.0f} rows/s'
+        )
+
+    def export_progress(self, stats):
+        self.stderr.write(f'{stats["rows"]} rows, {stats["rows"] / max(stats["seconds"], 1e-9):.0f} rows/s')
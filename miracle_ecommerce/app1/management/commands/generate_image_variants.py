@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app1 import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate responsive variants for every Product, Recipe and ImageUpload '
+        'image that has none (or whose image changed). Legacy images are also '
+        'generated lazily on first request; this warms them ahead of time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(getattr(settings, 'IMAGE_VARIANT_WORKERS', 2), 1))
+        parser.add_argument('--all', action='store_true', help='regenerate rows that already have variants')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model_name, model in images.IMAGE_MODELS.items():
+            rows = model.objects.exclude(image='').exclude(image__isnull=True)
+            if options['all']:
+                rows.update(image_variants=None)
+            for pk, name, variants in rows.values_list('pk', 'image', 'image_variants'):
+                if not images.is_current(name, variants):
+                    jobs.append((model_name, pk))
+
+        start = time.perf_counter()
+        if options['workers'] <= 1:
+            for job in jobs:
+                images.refresh_variants(*job)
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(lambda job: self.refresh(*job), jobs))
+        self.stdout.write(f'Generated variants for {len(jobs)} image(s) in {time.perf_counter() - start:.1f}s.')
+
+    def refresh(self, model_name, pk):
+        try:
+            images.refresh_variants(model_name, pk)
+        finally:
+            close_old_connections()
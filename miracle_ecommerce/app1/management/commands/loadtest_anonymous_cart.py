@@ -0,0 +1,107 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from app1.models import Category, Product
+
+MODES = {
+    # What the app did before: every request rewrote the django_session row.
+    'db-every-request': {
+        'ANONYMOUS_CART_STORAGE': 'app1.cart_storage.SessionCartStorage',
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+    },
+    'db-on-change': {
+        'ANONYMOUS_CART_STORAGE': 'app1.cart_storage.SessionCartStorage',
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    },
+    'cache-session': {
+        'ANONYMOUS_CART_STORAGE': 'app1.cart_storage.SessionCartStorage',
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cache',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    },
+    'cookie': {
+        'ANONYMOUS_CART_STORAGE': 'app1.cart_storage.CookieCartStorage',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer the anonymous cart with concurrent shoppers (in-process test '
+        'clients) under each storage mode and report throughput, session-table '
+        'writes and lock errors. Creates and removes its own products and '
+        'sessions; point it at a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+        parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(name=f'loadtest-cart-{time.time()}')
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Item {i}', description='', price=Decimal('4.50'), stock=100)
+            for i in range(20)
+        ])
+        try:
+            for mode in options['modes']:
+                with override_settings(ALLOWED_HOSTS=['testserver'], **MODES[mode]):
+                    self.run_mode(mode, [p.pk for p in products], options['threads'], options['requests'])
+        finally:
+            category.delete()
+
+    def run_mode(self, mode, product_ids, threads, requests):
+        stats = {'session_writes': 0, 'errors': 0, 'requests': 0}
+        session_keys = []
+        lock = threading.Lock()
+
+        def count_writes(execute, sql, params, many, context):
+            if 'django_session' in sql and not sql.lstrip().upper().startswith('SELECT'):
+                with lock:
+                    stats['session_writes'] += 1
+            return execute(sql, params, many, context)
+
+        def shopper(offset):
+            client = Client()
+            with connection.execute_wrapper(count_writes):
+                for i in range(requests):
+                    # Browsing-heavy mix: one add for every three cart views
+                    try:
+                        if i % 4 == 0:
+                            product_id = product_ids[(offset + i) % len(product_ids)]
+                            response = client.post('/cart/', {'product': product_id}, content_type='application/json')
+                        else:
+                            response = client.get('/cart/')
+                        failed = response.status_code >= 400
+                    except Exception:
+                        failed = True
+                    with lock:
+                        stats['requests'] += 1
+                        stats['errors'] += failed
+            session = client.cookies.get('sessionid')
+            if session:
+                session_keys.append(session.value)
+            connection.close()
+
+        workers = [threading.Thread(target=shopper, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        Session.objects.filter(session_key__in=session_keys).delete()
+
+        self.stdout.write(
+            f'{mode:<17} {stats["requests"] / elapsed:8.1f} req/s   '
+            f'{stats["session_writes"]:>5} session writes   {stats["errors"]:>3} errors'
+        )
@@ -0,0 +1,201 @@
+import asyncio
+import gc
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import path
+
+from app1.streaming import aserve_file, serve_file
+
+VIDEO_PATH = None
+
+
+def sync_view(request):
+    return serve_file(request, VIDEO_PATH, content_type='video/mp4')
+
+
+async def async_view(request):
+    return await aserve_file(request, VIDEO_PATH, content_type='video/mp4')
+
+
+urlpatterns = [
+    path('sync/', sync_view),
+    path('async/', async_view),
+]
+
+
+class ThreadSampler:
+    """Peak threading.active_count() and traced memory while the block runs."""
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            gc.collect()
+            tracemalloc.reset_peak()
+        self.peak = threading.active_count()
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while self.running:
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+        self.memory = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test video playback with many concurrent viewers reading ranges '
+        'at a capped bandwidth (a slow client holds its request open): the '
+        'sync view behind a fixed WSGI thread pool (gunicorn gthread style), '
+        'the sync view under ASGI, and the async view under ASGI. Servers and '
+        'clients run in-process, no sockets or database rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewers', type=int, default=300)
+        parser.add_argument('--requests', type=int, default=2, help='range requests per viewer')
+        parser.add_argument('--range-kb', type=int, default=512)
+        parser.add_argument('--bandwidth-mb', type=float, default=1.0, help='per-viewer MiB/s')
+        parser.add_argument('--wsgi-threads', type=int, default=32)
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='report peak Python memory per mode (tracemalloc slows every mode down)')
+        parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi-sync', 'asgi'],
+                            choices=['wsgi', 'asgi-sync', 'asgi'])
+
+    def handle(self, *args, **options):
+        global VIDEO_PATH
+        self.options = options
+        self.span = options['range_kb'] * 1024
+        self.size = max(self.span * 16, 32 * 1024 * 1024)
+        self.bandwidth = options['bandwidth_mb'] * 1024 * 1024
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as video:
+            video.write(os.urandom(self.size))
+            VIDEO_PATH = video.name
+        try:
+            with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['*'], DEBUG=False), \
+                    warnings.catch_warnings():
+                # The sync view under ASGI warns on every request
+                warnings.simplefilter('ignore')
+                if options['trace_memory']:
+                    tracemalloc.start()
+                for mode in options['modes']:
+                    self.report(mode, *getattr(self, 'run_' + mode.replace('-', '_'))())
+        finally:
+            tracemalloc.stop()
+            os.unlink(VIDEO_PATH)
+
+    def ranges(self, viewer):
+        for n in range(self.options['requests']):
+            start = (viewer * 7919 + n * self.span) % (self.size - self.span)
+            yield f'bytes={start}-{start + self.span - 1}'
+
+    def run_wsgi(self):
+        handler = WSGIHandler()
+        latencies, first_bytes = [], []
+
+        def request(range_header, queued):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': '/sync/', 'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'HTTP_RANGE': range_header, 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.errors': io.StringIO(),
+            }
+            result = handler(environ, lambda status, headers, exc_info=None: None)
+            received, first = 0, None
+            try:
+                for chunk in result:
+                    first = first or time.perf_counter()
+                    received += len(chunk)
+                    # Slow client: the worker thread blocks on the socket
+                    time.sleep(len(chunk) / self.bandwidth)
+            finally:
+                result.close()
+            first_bytes.append(first - queued)
+            latencies.append(time.perf_counter() - queued)
+            return received
+
+        with ThreadSampler() as threads, ThreadPoolExecutor(self.options['wsgi_threads']) as pool:
+            start = time.perf_counter()
+            jobs = [pool.submit(request, r, time.perf_counter()) for viewer in range(self.options['viewers']) for r in self.ranges(viewer)]
+            received = sum(job.result() for job in jobs)
+            elapsed = time.perf_counter() - start
+        return elapsed, received, latencies, first_bytes, threads.peak, threads.memory
+
+    def run_asgi_sync(self):
+        return self.run_asgi('/sync/')
+
+    def run_asgi(self, url='/async/'):
+        application = ASGIHandler()
+        latencies, first_bytes = [], []
+
+        async def request(range_header):
+            queued = time.perf_counter()
+            done = asyncio.Event()
+            state = {'received': 0, 'first': None}
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] != 'http.response.body':
+                    return
+                body = message.get('body', b'')
+                state['first'] = state['first'] or time.perf_counter()
+                state['received'] += len(body)
+                await asyncio.sleep(len(body) / self.bandwidth)
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+                'method': 'GET', 'path': url, 'root_path': '', 'query_string': b'',
+                'headers': [(b'host', b'testserver'), (b'range', range_header.encode())],
+                'server': ('testserver', 80),
+            }
+            await application(scope, receive, send)
+            done.set()
+            first_bytes.append(state['first'] - queued)
+            latencies.append(time.perf_counter() - queued)
+            return state['received']
+
+        async def viewer(n):
+            return sum([await request(r) for r in self.ranges(n)])
+
+        async def main():
+            return sum(await asyncio.gather(*(viewer(n) for n in range(self.options['viewers']))))
+
+        with ThreadSampler() as threads:
+            start = time.perf_counter()
+            received = asyncio.run(main())
+            elapsed = time.perf_counter() - start
+        return elapsed, received, latencies, first_bytes, threads.peak, threads.memory
+
+    def report(self, mode, elapsed, received, latencies, first_bytes, peak_threads, peak_memory):
+        expected = self.options['viewers'] * self.options['requests'] * self.span
+        quantiles = statistics.quantiles(first_bytes, n=20)
+        self.stdout.write(
+            f'{mode:<9} {elapsed:6.2f}s  {received / elapsed / 2 ** 20:7.1f} MiB/s  '
+            f'ttfb p50 {quantiles[9] * 1000:7.1f} ms  p95 {quantiles[18] * 1000:7.1f} ms  '
+            f'peak threads {peak_threads:>4}'
+            + ('' if peak_memory is None else f'  peak memory {peak_memory / 2 ** 20:7.1f} MiB')
+            + ('' if received == expected else f'  SHORT {expected - received} bytes')
+        )
@@ -0,0 +1,62 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import F, Q
+
+from app1 import hls
+from app1.models import AboutVideo
+
+Status = AboutVideo.HLSStatus
+
+
+class Command(BaseCommand):
+    help = (
+        'Package AboutVideo uploads into HLS: queues uploads that were never '
+        'packaged (backfill), then drains every pending row with a local '
+        'worker pool. Safe to run from cron alongside the web workers; rows '
+        'are claimed with a conditional update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(getattr(settings, 'HLS_WORKERS', 1), 1))
+        parser.add_argument('--retry-failed', action='store_true', help='re-queue failed packages')
+        parser.add_argument('--all', action='store_true', help='re-package ready videos too')
+        parser.add_argument(
+            '--requeue-processing', action='store_true',
+            help='re-queue rows stuck in processing after a crash (only when no other worker is running)',
+        )
+
+    def handle(self, *args, **options):
+        videos = AboutVideo.objects.exclude(video='').exclude(video__isnull=True)
+        requeue = [Status.NONE]
+        if options['retry_failed']:
+            requeue.append(Status.FAILED)
+        if options['all']:
+            requeue.append(Status.READY)
+        if options['requeue_processing']:
+            requeue.append(Status.PROCESSING)
+        # Uploads never packaged (or replaced without a save() signal) plus
+        # whatever the flags re-queue; hls_source names the file to package.
+        queued = videos.filter(Q(hls_status__in=requeue) | ~Q(hls_source=F('video'))).update(
+            hls_status=Status.PENDING, hls_source=F('video'), hls_error='',
+        )
+
+        pending = list(videos.filter(hls_status=Status.PENDING).values_list('pk', flat=True))
+        self.stdout.write(f'Queued {queued} video(s); packaging {len(pending)} pending.')
+        if options['workers'] <= 1:
+            results = Counter(map(hls.package_video, pending))
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = Counter(pool.map(self.package, pending))
+        self.stdout.write(
+            f"Ready: {results[Status.READY]}  failed: {results[Status.FAILED]}  skipped: {results[None]}"
+        )
+
+    def package(self, pk):
+        try:
+            return hls.package_video(pk)
+        finally:
+            close_old_connections()
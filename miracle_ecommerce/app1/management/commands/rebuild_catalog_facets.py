@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1 import facets
+from app1.caching import bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the CategoryFacet summary table from the products. Product '
+        'signals keep it current; run this after bulk imports, '
+        'queryset.update() of prices or categories, or a change to '
+        'CATALOG_FACET_PRICE_EDGES.'
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        products = facets.rebuild()
+        # Drop cached facet responses built from the old counts
+        bump_version('product')
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {products} active products in {(time.perf_counter() - start) * 1000:.0f} ms.'
+        ))
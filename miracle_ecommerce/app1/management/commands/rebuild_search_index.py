@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from app1.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the product full-text index and its sync triggers, then reindex every product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if not fts_enabled(options['database']):
+            raise CommandError('The product full-text index is only available on SQLite.')
+        rebuild_index(options['database'])
+        self.stdout.write(self.style.SUCCESS('Product search index rebuilt.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app1 import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount every Counter row from its source table. Signal-driven '
+        'adjustments miss queryset.update()/bulk_create() and raw SQL, so '
+        'run this from cron (e.g. hourly) to correct any drift.'
+    )
+
+    def handle(self, *args, **options):
+        for name, (old, new) in counters.reconcile().items():
+            if old == new:
+                self.stdout.write(f'{name}: {new}')
+            else:
+                self.stdout.write(self.style.WARNING(f'{name}: {old} -> {new}'))
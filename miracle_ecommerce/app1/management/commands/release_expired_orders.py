@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app1.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Expire checkout reservations past their TTL and return their stock. Run periodically (e.g. every minute from cron).'
+
+    def handle(self, *args, **options):
+        released = Order.objects.release_expired()
+        self.stdout.write(f'Released {released} expired reservation(s).')
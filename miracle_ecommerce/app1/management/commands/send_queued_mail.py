@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app1 import mailer
+from app1.models import OutboxEmail
+
+Status = OutboxEmail.Status
+
+
+class Command(BaseCommand):
+    help = (
+        'Send every due message in the mail outbox (rows queued while no '
+        'worker was running, retries whose backoff has passed, and sends '
+        'abandoned by a crashed worker). Safe to run from cron alongside '
+        'the web workers; rows are claimed with a conditional update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='re-queue messages that ran out of attempts')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = OutboxEmail.objects.filter(status=Status.FAILED).update(
+                status=Status.PENDING, attempts=0,
+            )
+            self.stdout.write(f'Re-queued {requeued} failed message(s).')
+        try:
+            sent = mailer.drain()
+        finally:
+            mailer.close_connection()
+        left = OutboxEmail.objects.filter(Q(status=Status.PENDING) | Q(status=Status.SENDING)).count()
+        self.stdout.write(f'Sent {sent} message(s); {left} pending or in flight.')
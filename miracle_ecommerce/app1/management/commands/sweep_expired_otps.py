@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from app1.models import EmailOTP
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired EmailOTP rows (and rows from before OTPs expired) in '
+        'small batches, so the table stays small and each delete holds the '
+        'write lock only briefly. Meant to run from cron every few minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OTP_SWEEP_BATCH_SIZE', 1000))
+        parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        expired = EmailOTP.objects.filter(Q(expires_at__lte=timezone.now()) | Q(expires_at__isnull=True))
+        deleted = 0
+        while True:
+            # Primary keys come off the expires_at index
+            ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += EmailOTP.objects.filter(pk__in=ids).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f'Deleted {deleted} expired OTP(s).')
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over the SQLite files standing in '
+        'for read replicas (DATABASE_REPLICAS) with the online backup API. '
+        'Run it on a schedule to emulate replication lag locally; real '
+        'replicas (e.g. Postgres streaming replication) need no sync.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases (default: every SQLite replica)')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('The primary database is not SQLite.')
+        aliases = options['aliases'] or [
+            alias for alias in getattr(settings, 'DATABASE_REPLICAS', ())
+            if connections[alias].vendor == 'sqlite'
+        ]
+        if not aliases:
+            raise CommandError('No SQLite replicas configured in DATABASE_REPLICAS.')
+
+        primary.ensure_connection()
+        for alias in aliases:
+            if alias not in getattr(settings, 'DATABASE_REPLICAS', ()):
+                raise CommandError(f'{alias} is not listed in DATABASE_REPLICAS.')
+            replica = connections[alias]
+            # Drop this process's handle on the old copy
+            replica.close()
+            start = time.perf_counter()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: synced in {(time.perf_counter() - start) * 1000:.1f} ms')
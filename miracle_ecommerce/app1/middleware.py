@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+
+from .routers import routing_scope, wrote
+
+PIN_COOKIE = 'primary_pin'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Give each request its own replica pin (see app1.routers). A request
+    that writes sets a cookie keeping the client's next requests on the
+    primary for REPLICA_PIN_SECONDS, longer than the replicas are expected
+    to lag, so a cart update is visible on the page that follows it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        with routing_scope(pinned=self.pinned_until(request) > time.time()):
+            response = self.get_response(request)
+            if wrote() and seconds:
+                response.set_cookie(
+                    PIN_COOKIE,
+                    str(int(time.time() + seconds)),
+                    max_age=seconds,
+                    httponly=True,
+                    samesite=settings.SESSION_COOKIE_SAMESITE,
+                    secure=settings.SESSION_COOKIE_SECURE,
+                )
+        return response
+
+    def pinned_until(self, request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            return 0
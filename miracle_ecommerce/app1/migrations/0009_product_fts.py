@@ -0,0 +1,49 @@
+from django.db import migrations
+
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS app1_product_fts USING fts5(
+        name, description,
+        content='app1_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS app1_product_fts_ai AFTER INSERT ON app1_product BEGIN
+        INSERT INTO app1_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app1_product_fts_ad AFTER DELETE ON app1_product BEGIN
+        INSERT INTO app1_product_fts(app1_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app1_product_fts_au AFTER UPDATE OF name, description ON app1_product BEGIN
+        INSERT INTO app1_product_fts(app1_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO app1_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO app1_product_fts(app1_product_fts) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    'DROP TRIGGER IF EXISTS app1_product_fts_ai',
+    'DROP TRIGGER IF EXISTS app1_product_fts_ad',
+    'DROP TRIGGER IF EXISTS app1_product_fts_au',
+    'DROP TABLE IF EXISTS app1_product_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0008_alter_aboutvideo_title'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FTS_SCHEMA), run(DROP_FTS)),
+    ]
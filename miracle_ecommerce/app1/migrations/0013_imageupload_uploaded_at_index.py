@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['uploaded_at', 'id'], name='app1_imageu_uploade_a294c5_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_user_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Counter = apps.get_model('app1', 'Counter')
+    Counter.objects.bulk_create([
+        Counter(name='users.total', value=User.objects.count()),
+        Counter(name='users.active', value=User.objects.filter(is_active=True).count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0015_emailotp_expiry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(seed_user_counters, migrations.RunPython.noop),
+    ]
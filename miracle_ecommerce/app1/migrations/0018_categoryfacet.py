@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:12
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_facets(apps, schema_editor):
+    Product = apps.get_model('app1', 'Product')
+    CategoryFacet = apps.get_model('app1', 'CategoryFacet')
+    edges = [Decimal(str(edge)) for edge in getattr(settings, 'CATALOG_FACET_PRICE_EDGES', [10, 25, 50, 100, 250])]
+    bucket = models.Case(
+        *[models.When(price__lt=edge, then=models.Value(i)) for i, edge in enumerate(edges)],
+        default=models.Value(len(edges)),
+    )
+    rows = (
+        Product.objects.filter(is_active=True)
+        .annotate(bucket=bucket)
+        .values('category_id', 'bucket')
+        .annotate(product_count=models.Count('id'))
+        .order_by()
+    )
+    CategoryFacet.objects.bulk_create([CategoryFacet(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0017_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('product_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='app1.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'bucket'), name='category_facet_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(seed_facets, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
 
+    class Meta:
+        # /products/category/<name>/ matches names case-insensitively on Lower(name)
+        indexes = [models.Index(Lower('name'), name='category_name_lower_idx')]
+
     def _str_(self):
         return self.name
 
@@ -15,9 +21,32 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized WebP/JPEG copies of `image` (app1.images); null until generated
+    image_variants = models.JSONField(blank=True, null=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Storefront lists show active products only, optionally in one
+        # category, as keyset pages over (created_at, id) or (price, id)
+        # (app1.pagination); partial indexes skip inactive rows entirely.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], condition=Q(is_active=True), name='product_active_created_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(is_active=True), name='product_active_price_idx'),
+            models.Index(
+                fields=['category', 'created_at', 'id'], condition=Q(is_active=True), name='product_cat_created_idx'
+            ),
+            models.Index(fields=['category', 'price', 'id'], condition=Q(is_active=True), name='product_cat_price_idx'),
+            # Natural key of catalog imports (app1.catalog_io)
+            models.Index(fields=['category', 'name'], name='product_cat_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The facet counts (app1.signals) are adjusted in the same transaction
+        # as the row; delete() already runs its signals inside one
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Product, instance=self)):
+            super().save(*args, **kwargs)
+
     def _str_(self):
         return self.name
 
@@ -31,26 +60,142 @@ class EmailOTP(models.Model):
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
+    # Until when the code can be verified, or once verified, used to
+    # register; `manage.py sweep_expired_otps` deletes rows past it
+    expires_at = models.DateTimeField(blank=True, null=True)
+    # Wrong codes entered since the OTP was sent (capped at OTP_MAX_ATTEMPTS)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        # Lookups go through the unique email index; this one serves the sweeper
+        indexes = [models.Index(fields=['expires_at'])]
 
     def _str_(self):
         return self.email
+
+
+from django.utils import timezone
+
+
+class OutboxEmail(models.Model):
+    """Outgoing mail waiting for the app1.mailer workers; pending rows are the queue."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True, default='')
+    subject = models.CharField(max_length=255)
+    # Cleared once sent (it carries the OTP)
+    body = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Not sent before this (retry backoff)
+    available_at = models.DateTimeField(default=timezone.now)
+    # Token of the worker batch that claimed the row, and when
+    claim = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'])]
+
+    def __str__(self):
+        return f'{self.to_email}: {self.subject} ({self.status})'
     
 
 
 
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from .models import Product  # adjust if app name differs
 
+CENTS = Decimal('0.01')
+
+
+def line_total(prefix=''):
+    """quantity * product.price as a SQL expression, optionally through a relation."""
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}product__price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(
+            items_total=Coalesce(Sum('items__quantity'), 0),
+            price_total=Coalesce(
+                Sum(line_total('items__')), Decimal('0'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    def with_items(self):
+        """Totals plus items (with product and category) in two queries."""
+        return self.with_totals().prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.with_subtotals().select_related('product__category'))
+        )
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_subtotals(self):
+        return self.annotate(line_total=line_total())
+
+    def add_quantity(self, cart_id, product_id, quantity):
+        """
+        Atomically add ``quantity`` of a product to a cart, creating the line
+        if needed. On SQLite/PostgreSQL this is a single
+        INSERT ... ON CONFLICT DO UPDATE, so concurrent adds never lose an
+        increment or trip the (cart, product) unique constraint.
+        """
+        # A write, whatever alias reads on this queryset would be routed to
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        if connection.vendor in ('sqlite', 'postgresql'):
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (cart_id, product_id, quantity) VALUES (%s, %s, %s) '
+                    f'ON CONFLICT (cart_id, product_id) '
+                    f'DO UPDATE SET quantity = {table}.quantity + excluded.quantity',
+                    [cart_id, product_id, quantity],
+                )
+            return
+        with transaction.atomic(using=using):
+            lines = self.filter(cart_id=cart_id, product_id=product_id)
+            if lines.update(quantity=F('quantity') + quantity):
+                return
+            try:
+                with transaction.atomic(using=using):
+                    self.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+            except IntegrityError:
+                lines.update(quantity=F('quantity') + quantity)
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        if hasattr(self, 'items_total'):
+            return self.items_total
+        return self.items.aggregate(total=Coalesce(Sum('quantity'), 0))['total']
 
     def total_price(self):
-        return sum(item.subtotal() for item in self.items.all())
+        if hasattr(self, 'price_total'):
+            return self.price_total.quantize(CENTS)
+        total = self.items.aggregate(total=Sum(line_total()))['total']
+        return (total or Decimal('0')).quantize(CENTS)
 
     def _str_(self):
         return f"Cart of {self.user.username}"
@@ -60,10 +205,14 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product')
 
     def subtotal(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total.quantize(CENTS)
         return self.quantity * self.product.price
 
     def _str_(self):
@@ -73,23 +222,164 @@ class CartItem(models.Model):
 
 
 
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Case, When
+from django.utils import timezone
+from .caching import bump_version
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f"Insufficient stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+class OrderQuerySet(models.QuerySet):
+    def place_from_cart(self, cart):
+        """
+        Convert ``cart`` into a reserved order in one transaction.
+
+        Stock is taken with a conditional ``UPDATE ... SET stock = stock - n
+        WHERE stock >= n`` per line (in product id order, so concurrent
+        checkouts lock rows in the same order). If any line can't be
+        reserved the whole transaction rolls back and InsufficientStock names
+        the short products; nothing is ever decremented below zero.
+
+        The cart row is locked first and its items are taken (deleted) before
+        any stock moves, so two checkouts of the same cart can't both turn it
+        into an order: the second finds it empty and gets None.
+        """
+        ttl = timedelta(seconds=getattr(settings, 'ORDER_RESERVATION_SECONDS', 900))
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            cart = Cart.objects.using(using).select_for_update().get(pk=cart.pk)
+            items = list(cart.items.select_related('product').order_by('product_id'))
+            if not items or CartItem.objects.filter(id__in=[item.id for item in items]).delete()[0] != len(items):
+                return None
+            short = [
+                item.product_id for item in items
+                if not Product.objects.filter(
+                    id=item.product_id, is_active=True, stock__gte=item.quantity,
+                ).update(stock=F('stock') - item.quantity)
+            ]
+            if short:
+                raise InsufficientStock(short)
+            order = self.create(
+                user_id=cart.user_id,
+                total_price=sum(item.quantity * item.product.price for item in items),
+                reserved_until=timezone.now() + ttl,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=item.product_id, quantity=item.quantity, unit_price=item.product.price)
+                for item in items
+            ])
+            # queryset.update() skips the signals that invalidate the catalog cache
+            transaction.on_commit(lambda: bump_version('product'), using=using)
+        return order
+
+    def release_expired(self):
+        """Expire reservations past their TTL and return their stock."""
+        expired = self.filter(status=Order.Status.RESERVED, reserved_until__lte=timezone.now())
+        return sum(order.release(Order.Status.EXPIRED) for order in expired.only('id'))
+
+
+class Order(models.Model):
+    class Status(models.TextChoices):
+        RESERVED = 'reserved', 'Reserved'
+        CONFIRMED = 'confirmed', 'Confirmed'
+        CANCELLED = 'cancelled', 'Cancelled'
+        EXPIRED = 'expired', 'Expired'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.RESERVED)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2)
+    reserved_until = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'reserved_until']),
+            # A user's orders, newest first
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def confirm(self):
+        """Reserved -> confirmed, only while the reservation is still live."""
+        return bool(Order.objects.filter(
+            pk=self.pk, status=self.Status.RESERVED, reserved_until__gt=timezone.now(),
+        ).update(status=self.Status.CONFIRMED))
+
+    def release(self, status):
+        """
+        Reserved -> ``status`` and put the stock back. The status flip is a
+        conditional update, so an order is released at most once even if the
+        sweeper and a cancel race.
+        """
+        with transaction.atomic():
+            if not Order.objects.filter(pk=self.pk, status=self.Status.RESERVED).update(status=status):
+                return False
+            quantities = dict(self.items.values_list('product_id', 'quantity'))
+            Product.objects.filter(id__in=quantities).update(stock=F('stock') + Case(
+                *[When(id=product_id, then=quantity) for product_id, quantity in quantities.items()],
+                output_field=models.PositiveIntegerField(),
+            ))
+            transaction.on_commit(lambda: bump_version('product'))
+        return True
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.status})"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def subtotal(self):
+        return self.quantity * self.unit_price
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity}"
+
+
+
+
+
 from django.db import models
 
 class ImageUpload(models.Model):
     image = models.ImageField(upload_to='image/')  
+    image_variants = models.JSONField(blank=True, null=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Keyset pages of the gallery walk (uploaded_at, id)
+        indexes = [models.Index(fields=['uploaded_at', 'id'])]
+
 
 # Recipe model
 class Recipe(models.Model):
     title = models.CharField(max_length=255)
     image = models.ImageField(upload_to='recipes/', blank=True, null=True)
+    image_variants = models.JSONField(blank=True, null=True, editable=False)
     ingredients = models.JSONField(default=list, blank=True)
     instructions = models.JSONField(default=list, blank=True)
     benefits = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pages newest first over (created_at, id)
+            models.Index(fields=['created_at', 'id']),
+            # Natural key of catalog imports (app1.catalog_io)
+            models.Index(fields=['title']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -104,6 +394,53 @@ class AboutVideo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # HLS packaging of the upload (app1.hls); the pending rows are the queue
+    class HLSStatus(models.TextChoices):
+        NONE = 'none', 'None'
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
+    hls_status = models.CharField(max_length=16, choices=HLSStatus.choices, default=HLSStatus.NONE)
+    # Media-relative path of the master playlist, and the video.name that was
+    # last queued for packaging
+    hls_manifest = models.CharField(max_length=255, blank=True, default='')
+    hls_source = models.CharField(max_length=255, blank=True, default='')
+    hls_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        # Keyset pages newest first over (created_at, id)
+        indexes = [models.Index(fields=['created_at', 'id'])]
+
     def __str__(self):
         return self.title or self.youtube_id or f"AboutVideo {self.pk or ''}"
 
+
+class Counter(models.Model):
+    """Named running total kept by app1.counters (e.g. users.total)."""
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.name} = {self.value}'
+
+
+class CategoryFacet(models.Model):
+    """
+    Active products of a category in one price bucket, kept by app1.facets
+    so the storefront sidebar never counts products per request.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets')
+    # Index into the CATALOG_FACET_PRICE_EDGES ranges (app1.facets.price_bucket)
+    bucket = models.PositiveSmallIntegerField()
+    product_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'bucket'], name='category_facet_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.category_id}/{self.bucket} = {self.product_count}'
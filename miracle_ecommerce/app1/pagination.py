@@ -0,0 +1,164 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CatalogCursorPagination(BasePagination):
+    """
+    Keyset pagination for the catalog endpoints.
+
+    Pages are ordered by one of the view's ``ordering_fields`` with ``id`` as a
+    tie-breaker, and the cursor carries the (value, id) of the last row seen,
+    so a deep page is a single indexed range scan instead of an OFFSET and
+    rows inserted while a client is paging never shift the next page.
+
+    Search results (querysets selecting ``search_rank``, see app1.search)
+    default to relevance order unless the client asks for an explicit ordering.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    ordering_fields = ('created_at', 'price')
+    default_ordering = '-created_at'
+    rank_ordering = 'search_rank'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'CATALOG_PAGE_SIZE', 10)
+        max_page_size = getattr(settings, 'CATALOG_MAX_PAGE_SIZE', 100)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+            if requested > 0:
+                page_size = requested
+        except (KeyError, ValueError):
+            pass
+        return min(page_size, max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        fields = getattr(view, 'ordering_fields', None) or self.ordering_fields
+        ordering = request.query_params.get(self.ordering_query_param, '')
+        if ordering.lstrip('-') in fields:
+            return ordering
+        if self.rank_ordering in queryset.query.extra:
+            return self.rank_ordering
+        return self.default_ordering
+
+    def parse_cursor_value(self, queryset, value):
+        if self.field in queryset.query.extra:
+            return float(value)
+        return queryset.model._meta.get_field(self.field).to_python(value)
+
+    def filter_after(self, queryset, lookup, value, pk):
+        if self.field in queryset.query.extra:
+            # Extra-select columns can't be used in Q() lookups.
+            sql, params = queryset.query.extra[self.field]
+            op = '<' if lookup == 'lt' else '>'
+            table = queryset.model._meta.db_table
+            return queryset.extra(
+                where=[f'(({sql}) {op} %s OR (({sql}) = %s AND {table}.id {op} %s))'],
+                params=[*params, value, *params, value, pk],
+            )
+        return queryset.filter(
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'id__{lookup}': pk})
+        )
+
+    def encode_cursor(self, value, pk, reverse=False):
+        payload = json.dumps([str(value), pk, reverse], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return value, int(pk), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+        # Walking backwards is the same scan with the comparison flipped.
+        if descending != reverse:
+            lookup, order = 'lt', ('-' + self.field, '-id')
+        else:
+            lookup, order = 'gt', (self.field, 'id')
+
+        queryset = queryset.order_by(*order)
+        if cursor:
+            try:
+                value = self.parse_cursor_value(queryset, cursor[0])
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = self.filter_after(queryset, lookup, value, cursor[1])
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        return rows
+
+    def _link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        # Rows are model instances or, for values() querysets, plain dicts.
+        if isinstance(row, dict):
+            value, pk = row[self.field], row['id']
+        else:
+            value, pk = getattr(row, self.field), row.pk
+        value = value.isoformat() if hasattr(value, 'isoformat') else value
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(value, pk, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class GalleryCursorPagination(CatalogCursorPagination):
+    """Newest-first keyset pages over ImageUpload.uploaded_at."""
+    ordering_fields = ('uploaded_at',)
+    default_ordering = '-uploaded_at'
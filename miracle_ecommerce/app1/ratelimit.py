@@ -0,0 +1,53 @@
+"""
+Token-bucket rate limiting on the default cache.
+
+A bucket holds up to ``capacity`` tokens and refills continuously at
+``capacity`` per ``window`` seconds, so a client can burst ``capacity``
+requests and then sustains the average rate. Buckets live in the cache
+(one entry per key, expiring once full again); the read-modify-write is
+serialised per process, so several processes need a shared cache backend
+and may let through a few extra requests when racing.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+_lock = threading.Lock()
+
+
+def take_token(key, capacity, window):
+    """
+    Take a token from bucket ``key``. Returns 0 when allowed, otherwise
+    the number of seconds until a token is available.
+    """
+    return check_limits([(key, capacity, window)])
+
+
+def check_limits(limits):
+    """
+    Take a token from every ``(key, capacity, window)`` bucket, or from
+    none: if any bucket is empty nothing is taken and the longest wait in
+    seconds is returned (0 when every bucket allowed the request), so a
+    request refused by one limit doesn't drain the others.
+    """
+    with _lock:
+        now = time.time()
+        buckets, wait = [], 0
+        for key, capacity, window in limits:
+            rate = capacity / window
+            key = f'ratelimit:{key}'
+            tokens, stamp = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                wait = max(wait, 1, int((1 - tokens) / rate + 0.999))
+            buckets.append((key, tokens, window))
+        if wait:
+            return wait
+        for key, tokens, window in buckets:
+            cache.set(key, (tokens - 1, now), timeout=int(window) + 1)
+        return 0
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
@@ -0,0 +1,110 @@
+"""
+Database routers.
+
+ReadConnectionRouter splits reads from writes on the single SQLite file.
+PrimaryReplicaRouter adds replicas: reads of REPLICA_MODELS (the catalog)
+go to a random alias in DATABASE_REPLICAS, everything else keeps the
+primary file. A replica may lag behind the primary, so once anything
+writes, the rest of that context reads from the primary (read-your-writes),
+and ReplicaPinningMiddleware carries the pin over to the client's next
+requests for REPLICA_PIN_SECONDS.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# Reads in this context go to the primary
+_pinned = ContextVar('replica_pinned', default=False)
+# Something was written in this context
+_wrote = ContextVar('replica_wrote', default=False)
+
+
+def pinned():
+    return _pinned.get()
+
+
+def wrote():
+    return _wrote.get()
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """
+    Fresh pin state for one request or background job: reads start on the
+    replicas (or the primary if ``pinned``) and the first write pins the
+    rest of the block. The state outside is restored on exit.
+    """
+    tokens = _pinned.set(pinned), _wrote.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(tokens[0])
+        _wrote.reset(tokens[1])
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block (e.g. data that was just written)."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+        if _wrote.get():
+            # A write inside the block still pins what follows
+            _pinned.set(True)
+
+
+class ReadConnectionRouter:
+    """
+    Send reads to the query-only ``read`` connection (see
+    miracle_ecommerce.database) unless the default connection is inside a
+    transaction, whose uncommitted writes only it can see. Both aliases
+    open the same SQLite file, so every other read sees the latest commit.
+    """
+    read_alias = 'read'
+
+    def db_for_read(self, model, **hints):
+        if self.read_alias not in connections or connections['default'].in_atomic_block:
+            return 'default'
+        return self.read_alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same database behind both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class PrimaryReplicaRouter(ReadConnectionRouter):
+    """ReadConnectionRouter that reads REPLICA_MODELS from DATABASE_REPLICAS."""
+
+    def replicas(self):
+        return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', ()) if alias in connections]
+
+    def db_for_read(self, model, **hints):
+        replicas = self.replicas()
+        if (
+            not replicas
+            or model._meta.label not in getattr(settings, 'REPLICA_MODELS', ())
+            or _pinned.get()
+            or connections['default'].in_atomic_block
+        ):
+            return super().db_for_read(model, **hints)
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        _wrote.set(True)
+        return super().db_for_write(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the primary's rows
+        return True
@@ -0,0 +1,82 @@
+import re
+
+from django.db import connections
+from rest_framework import filters
+
+FTS_TABLE = 'app1_product_fts'
+
+# Kept in step with migration 0009; `manage.py rebuild_search_index` re-runs
+# these if the triggers were lost (e.g. a SQLite table rebuild of app1_product).
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='app1_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON app1_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON app1_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON app1_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+# bm25 column weights: a hit in the name outranks one in the description
+RANK_SQL = f'bm25({FTS_TABLE}, 10.0, 1.0)'
+
+
+def fts_enabled(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, query):
+    """
+    Filter a Product queryset by ``query``.
+
+    On SQLite this joins the FTS5 index (one MATCH per query, driven by the
+    index rather than the product table) and selects ``search_rank`` (bm25,
+    lower is better) for relevance ordering; other backends fall back to the
+    icontains scan over name/description.
+    """
+    match = build_match_expression(query)
+    if not match:
+        return queryset
+    if not fts_enabled(queryset.db):
+        for term in query.split():
+            queryset = queryset.filter(name__icontains=term) | queryset.filter(description__icontains=term)
+        return queryset
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = app1_product.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': RANK_SQL},
+    )
+
+
+def rebuild_index(using='default'):
+    with connections[using].cursor() as cursor:
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """``?search=`` backed by the product full-text index."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_products(queryset, query)
@@ -1,5 +1,21 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 from .models import Category, Product, Recipe, AboutVideo
+from .images import image_srcset, media_base_url, media_url
+
+
+class ImageSrcsetField(serializers.Field):
+    """``{format: srcset}`` of the instance's resized ``image`` variants (app1.images)."""
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        return image_srcset(
+            obj._meta.model_name, obj.pk, obj.image.name if obj.image else '', obj.image_variants,
+            self.context.get('request'),
+        )
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,22 +28,82 @@ class ProductSerializer(serializers.ModelSerializer):
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True
     )
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'stock', 'image', 'is_active', 'created_at', 'category', 'category_id']
+        fields = ['id', 'name', 'description', 'price', 'stock', 'image', 'image_srcset', 'is_active', 'created_at', 'category', 'category_id']
+
+
+class ProductListSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for the product list endpoints.
+
+    Consumes rows from ``ProductListSerializer.rows(queryset)`` (category
+    columns joined in the same query) and produces the same shape as
+    ``ProductSerializer`` without building a bound field tree per row.
+    """
+    values_fields = (
+        'id', 'name', 'description', 'price', 'stock', 'image', 'image_variants', 'is_active', 'created_at',
+        'category_id', 'category__name', 'category__description',
+    )
+    price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+    created_at_field = serializers.DateTimeField()
+
+    @classmethod
+    def rows(cls, queryset):
+        """values() rows for this serializer, keeping extra-select columns such as search_rank."""
+        return queryset.values(*cls.values_fields, *queryset.query.extra)
+
+    def to_representation(self, row):
+        if not hasattr(self, 'media_base'):
+            self.media_base = media_base_url(self.context.get('request'))
+        image = row['image']
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': self.price_field.to_representation(row['price']),
+            'stock': row['stock'],
+            'image': media_url(self.media_base, image),
+            'image_srcset': image_srcset(
+                'product', row['id'], image, row['image_variants'], self.context.get('request'), self.media_base,
+            ),
+            'is_active': row['is_active'],
+            'created_at': self.created_at_field.to_representation(row['created_at']),
+            'category': {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'description': row['category__description'],
+            },
+        }
 
 
 class RecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'image', 'ingredients', 'instructions', 'benefits', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'image', 'image_srcset', 'ingredients', 'instructions', 'benefits', 'created_at', 'updated_at']
 
 
 class AboutVideoSerializer(serializers.ModelSerializer):
+    # Adaptive-bitrate master playlist once app1.hls has packaged the upload;
+    # `video` stays the raw file for players without HLS support.
+    hls_manifest_url = serializers.SerializerMethodField()
+
     class Meta:
         model = AboutVideo
-        fields = ['id', 'title', 'description', 'video', 'youtube_id', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'video', 'youtube_id', 'hls_status', 'hls_manifest_url',
+                  'created_at', 'updated_at']
+        read_only_fields = ['hls_status']
+
+    def get_hls_manifest_url(self, obj):
+        if obj.hls_status != AboutVideo.HLSStatus.READY or not obj.hls_manifest:
+            return None
+        url = default_storage.url(obj.hls_manifest)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 
@@ -52,6 +128,9 @@ class OTPVerifySerializer(serializers.Serializer):
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from django.db import transaction
+from django.utils import timezone
+from .authentication import ClaimsRefreshToken
 from .models import EmailOTP
 
 class RegisterSerializer(serializers.Serializer):
@@ -61,23 +140,26 @@ class RegisterSerializer(serializers.Serializer):
 
     def validate(self, data):
         email = data.get('email')
-        try:
-            otp_entry = EmailOTP.objects.get(email=email, is_verified=True)
-        except EmailOTP.DoesNotExist:
+        if not EmailOTP.objects.filter(email=email, is_verified=True, expires_at__gt=timezone.now()).exists():
             raise serializers.ValidationError("Email not verified with OTP.")
         return data
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['email'],
-            email=validated_data['email'],
-            password=validated_data['password'],
-            first_name=validated_data['name']
-        )
+        # The user row, its counter adjustments (app1.signals) and the
+        # spent OTP commit together
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data['email'],
+                email=validated_data['email'],
+                password=validated_data['password'],
+                first_name=validated_data['name']
+            )
+            # The OTP is single use
+            EmailOTP.objects.filter(email=validated_data['email']).delete()
         return user
 
     def to_representation(self, instance):
-        refresh = RefreshToken.for_user(instance)
+        refresh = ClaimsRefreshToken.for_user(instance)
         return {
             'message': 'User registered successfully',
             'refresh': str(refresh),
@@ -102,6 +184,20 @@ class CartItemSerializer(serializers.ModelSerializer):
     def get_subtotal(self, obj):
         return obj.subtotal()
 
+class CartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=200)
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.SerializerMethodField()
@@ -111,11 +207,34 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user', 'items', 'total_items', 'total_price']
 
+    # Computed in SQL: pass carts from Cart.objects.with_items()
     def get_total_items(self, obj):
-        return sum(item.quantity for item in obj.items.all())
+        return obj.total_items()
 
     def get_total_price(self, obj):
-        return sum(float(item.product.price) * item.quantity for item in obj.items.all())
+        return float(obj.total_price())
+
+
+
+
+from rest_framework import serializers
+from .models import Order, OrderItem
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_price', 'reserved_until', 'created_at', 'items']
 
 
 
@@ -124,6 +243,35 @@ from rest_framework import serializers
 from .models import ImageUpload
 
 class ImageUploadSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = ImageUpload
-        fields = ['id', 'image', 'uploaded_at']
+        fields = ['id', 'image', 'image_srcset', 'uploaded_at']
+
+
+class ImageUploadListSerializer(serializers.BaseSerializer):
+    """
+    Read-only gallery rows from ``ImageUploadListSerializer.rows(queryset)``,
+    in the same shape as ``ImageUploadSerializer``. The media URL prefix is
+    resolved once per serializer rather than once per image.
+    """
+    values_fields = ('id', 'image', 'image_variants', 'uploaded_at')
+    uploaded_at_field = serializers.DateTimeField()
+
+    @classmethod
+    def rows(cls, queryset):
+        return queryset.values(*cls.values_fields)
+
+    def to_representation(self, row):
+        if not hasattr(self, 'media_base'):
+            self.media_base = media_base_url(self.context.get('request'))
+        return {
+            'id': row['id'],
+            'image': media_url(self.media_base, row['image']),
+            'image_srcset': image_srcset(
+                'imageupload', row['id'], row['image'], row['image_variants'],
+                self.context.get('request'), self.media_base,
+            ),
+            'uploaded_at': self.uploaded_at_field.to_representation(row['uploaded_at']),
+        }
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from django.db import transaction
+
+from . import counters, facets, hls, images
+from .caching import bump_version
+from .models import AboutVideo, Category, ImageUpload, Product, Recipe
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_version(sender._meta.model_name)
+
+
+@receiver(post_init, sender=Product)
+def remember_product_facet(sender, instance, **kwargs):
+    # The (category, price bucket) the stored row is counted under, so
+    # post_save can move it when price, category or is_active change
+    instance._facet_key = facets.facet_key(instance) if instance.pk else None
+
+
+def changes_facet(update_fields):
+    return update_fields is None or bool({'category', 'price', 'is_active'} & set(update_fields))
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def load_product_facet(sender, instance, update_fields=None, **kwargs):
+    # Loaded without price, category or is_active: read the stored values
+    # (inside the saving transaction) before the write replaces them
+    if instance._facet_key is facets.UNKNOWN and changes_facet(update_fields):
+        instance._facet_key = facets.stored_key(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, created, update_fields=None, **kwargs):
+    if not changes_facet(update_fields):
+        return
+    new = facets.facet_key(instance)
+    if new is facets.UNKNOWN:
+        new = facets.stored_key(instance.pk)
+    facets.move(None if created else instance._facet_key, new)
+    instance._facet_key = new
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facet(sender, instance, **kwargs):
+    facets.move(instance._facet_key, None)
+
+
+@receiver(post_save, sender=AboutVideo)
+def queue_hls_packaging(sender, instance, raw=False, **kwargs):
+    if not raw and hls.mark_pending(instance):
+        hls.enqueue(instance.pk)
+
+
+@receiver(post_delete, sender=AboutVideo)
+def remove_hls_packages(sender, instance, **kwargs):
+    transaction.on_commit(lambda: hls.remove_versions(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=ImageUpload)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.enqueue(instance)
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_user_active(sender, instance, **kwargs):
+    # is_active as loaded, so post_save can tell whether it changed (read
+    # from __dict__ so a deferred field is not fetched here)
+    instance._counted_active = instance.__dict__.get('is_active') if instance.pk else None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_saved_user(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created:
+        counters.adjust(counters.USERS_TOTAL, 1)
+        was_active = False
+    elif update_fields is not None and 'is_active' not in update_fields:
+        # e.g. update_last_login on every sign-in
+        return
+    else:
+        was_active = instance._counted_active
+    if was_active is not None and was_active != instance.is_active:
+        counters.adjust(counters.USERS_ACTIVE, 1 if instance.is_active else -1)
+    instance._counted_active = instance.is_active
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def count_deleted_user(sender, instance, **kwargs):
+    counters.adjust(counters.USERS_TOTAL, -1)
+    if instance._counted_active:
+        counters.adjust(counters.USERS_ACTIVE, -1)
@@ -0,0 +1,119 @@
+"""
+Storages that give files content-addressed names, so app1.fileserve can
+send them with an immutable, year-long cache lifetime.
+
+- HashedFileSystemStorage (media): an upload is stored as
+  ``products/tea.3f5a9c0d12ab.jpg``; uploading the same bytes again reuses
+  the existing file.
+- CompressedManifestStaticFilesStorage (static): collectstatic writes the
+  usual ``name.<hash>.ext`` copies plus ``.gz`` (and ``.br`` when the
+  brotli package is installed) siblings of text assets.
+"""
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # optional: gzip siblings only
+    brotli = None
+
+HASH_LENGTH = 12
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.html', '.txt', '.xml', '.ico'}
+
+# A sibling that saves less than this is not worth a second file
+MIN_COMPRESSION_RATIO = 0.95
+
+
+def content_hash(content):
+    digest = hashlib.md5(usedforsecurity=False)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def write_compressed(path):
+    """
+    Write ``path.gz`` (and ``path.br``) next to ``path`` when they are
+    missing or older than it. Returns the siblings that exist afterwards.
+    """
+    stat = os.stat(path)
+    encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    data = None
+    written = []
+    for suffix, encode in encoders:
+        target = path + suffix
+        if os.path.exists(target) and os.stat(target).st_mtime_ns >= stat.st_mtime_ns:
+            written.append(target)
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        compressed = encode(data)
+        if len(compressed) >= len(data) * MIN_COMPRESSION_RATIO:
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        scratch = f'{target}.{os.getpid()}.tmp'
+        with open(scratch, 'wb') as f:
+            f.write(compressed)
+        os.replace(scratch, target)
+        written.append(target)
+    return written
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage that names every saved file after its content."""
+
+    def hashed_name(self, name, content, max_length=None):
+        directory, filename = os.path.split(name)
+        stem, ext = os.path.splitext(filename)
+        suffix = f'.{content_hash(content)}{ext}'
+        if max_length:
+            # Trim the readable stem rather than let get_available_name()
+            # append a random suffix that breaks the hash
+            room = max_length - len(suffix) - (len(directory) + 1 if directory else 0)
+            stem = stem[:max(room, 1)]
+        return os.path.join(directory, stem + suffix).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content, max_length)
+        if self.exists(name):
+            # Same bytes already stored under this name
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes precompressed siblings."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            for stored in {name, self.hashed_files.get(self.hash_key(self.clean_name(name)), name)}:
+                if self.exists(stored):
+                    write_compressed(self.path(stored))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic has not run (development, tests): link the
+            # unhashed name, which fileserve finds through the finders
+            return name
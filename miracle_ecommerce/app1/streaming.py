@@ -0,0 +1,312 @@
+"""
+HTTP range serving for large media files (about-page videos).
+
+Single ranges and whole files go out as FileResponse over a real file
+descriptor, so a WSGI server with ``wsgi.file_wrapper`` (gunicorn, uWSGI)
+hands them to ``sendfile`` instead of copying through Python. With
+VIDEO_STREAM_OFFLOAD set, the response is an empty X-Accel-Redirect /
+X-Sendfile handoff and the front web server does the I/O and range logic.
+aserve_file is the ASGI variant for async views.
+"""
+import asyncio
+import mimetypes
+import os
+import uuid
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range`` header into a sorted list of inclusive (start, end)
+    byte ranges, merging overlapping/adjacent ones.
+
+    Returns None when the header should be ignored (missing, not bytes,
+    syntactically invalid, or more than MAX_RANGES ranges) so the caller
+    serves the whole file, as RFC 9110 allows. Raises RangeNotSatisfiable
+    when it is well formed but no range overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    parts = [part.strip() for part in spec.split(',') if part.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the final N bytes
+                length = int(last)
+                if length < 0:
+                    return None
+                if length == 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class FileRange:
+    """
+    File-like view of ``length`` bytes of an open file starting at its
+    current offset. ``fileno()`` is exposed so wsgi.file_wrapper can
+    sendfile() the range (bounded by Content-Length).
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_validators(stat):
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    return etag, int(stat.st_mtime)
+
+
+def not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and mtime <= since
+
+
+def if_range_matches(request, etag, mtime):
+    """Honour a Range only if If-Range is absent or still names this file."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        # Strong comparison only: weak tags never match for ranges
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date == mtime
+
+
+def offload_response(path, content_type, mode):
+    relative = os.path.relpath(path, settings.MEDIA_ROOT)
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'VIDEO_STREAM_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative.replace(os.sep, '/')
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+class RangeRequest:
+    """
+    What to send for ``path`` given the request's Range and conditional
+    headers; shared by the sync and async servers.
+    """
+
+    def __init__(self, request, path, content_type=None, offload=True):
+        stat = os.stat(path)
+        if content_type is None:
+            content_type, _ = mimetypes.guess_type(path)
+            content_type = content_type or 'application/octet-stream'
+        self.request = request
+        self.path = path
+        self.size = stat.st_size
+        self.content_type = content_type
+        self.etag, self.mtime = file_validators(stat)
+        self.block_size = getattr(settings, 'VIDEO_STREAM_BLOCK_SIZE', 1024 * 1024)
+        # Offload handoffs name paths under MEDIA_ROOT
+        self.offload = getattr(settings, 'VIDEO_STREAM_OFFLOAD', None) if offload else None
+        self.ranges = None
+
+    def early_response(self):
+        """304, offload handoff or 416 if one applies, else None (and sets ``ranges``)."""
+        request = self.request
+        if not_modified(request, self.etag, self.mtime):
+            return HttpResponseNotModified()
+
+        if self.offload:
+            # The web server applies Range/If-Range itself
+            return offload_response(self.path, self.content_type, self.offload)
+
+        if if_range_matches(request, self.etag, self.mtime):
+            try:
+                self.ranges = parse_range_header(request.headers.get('Range', ''), self.size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{self.size}'
+                return response
+        return None
+
+    def multipart(self):
+        """
+        multipart/byteranges body as segments (bytes, or inclusive
+        (start, end) file offsets), its exact length and content type.
+        """
+        boundary = uuid.uuid4().hex
+        segments = []
+        for index, (start, end) in enumerate(self.ranges):
+            head = (f'--{boundary}\r\nContent-Type: {self.content_type}\r\n'
+                    f'Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n')
+            segments.append(('\r\n' if index else '') + head)
+            segments.append((start, end))
+        segments.append(f'\r\n--{boundary}--\r\n')
+        segments = [s.encode('ascii') if isinstance(s, str) else s for s in segments]
+        length = sum(len(s) if isinstance(s, bytes) else s[1] - s[0] + 1 for s in segments)
+        return segments, length, f'multipart/byteranges; boundary={boundary}'
+
+    def finish(self, response):
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.mtime)
+        return response
+
+
+def read_segments(path, segments, block_size):
+    with open(path, 'rb') as file:
+        for segment in segments:
+            if isinstance(segment, bytes):
+                yield segment
+                continue
+            start, end = segment
+            file.seek(start)
+            part = FileRange(file, end - start + 1)
+            for chunk in iter(lambda: part.read(block_size), b''):
+                yield chunk
+
+
+async def aread_segments(path, segments, block_size):
+    """
+    Async counterpart of read_segments. Each block is a positional read in
+    the default executor, so no thread is held between blocks while the
+    client drains the socket; a disconnect cancels the generator and the
+    descriptor is closed.
+    """
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        for segment in segments:
+            if isinstance(segment, bytes):
+                yield segment
+                continue
+            position, end = segment
+            while position <= end:
+                chunk = await asyncio.to_thread(os.pread, fd, min(block_size, end - position + 1), position)
+                if not chunk:
+                    return
+                position += len(chunk)
+                yield chunk
+    finally:
+        os.close(fd)
+
+
+def serve_file(request, path, content_type=None, offload=True):
+    """
+    Serve ``path`` honouring Range (single, suffix and multi-range),
+    If-Range, If-None-Match and If-Modified-Since. ``offload=False`` sends
+    the bytes even when VIDEO_STREAM_OFFLOAD is set.
+    """
+    plan = RangeRequest(request, path, content_type, offload)
+    response = plan.early_response()
+    if response is not None:
+        return plan.finish(response)
+
+    ranges = plan.ranges
+    if ranges and len(ranges) > 1:
+        segments, length, multipart_type = plan.multipart()
+        response = StreamingHttpResponse(
+            read_segments(path, segments, plan.block_size), status=206, content_type=multipart_type
+        )
+        response['Content-Length'] = str(length)
+        return plan.finish(response)
+
+    file = open(path, 'rb')
+    if ranges:
+        start, end = ranges[0]
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=plan.content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{plan.size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(file, content_type=plan.content_type)
+        response['Content-Length'] = str(plan.size)
+    response.block_size = plan.block_size
+    return plan.finish(response)
+
+
+async def aserve_file(request, path, content_type=None):
+    """
+    serve_file for async views under ASGI. The body is an async iterator
+    reading VIDEO_STREAM_ASYNC_BLOCK_SIZE blocks on demand; a sync
+    FileResponse returned under ASGI is instead read fully into memory via
+    sync_to_async before the first byte goes out.
+    """
+    plan = await asyncio.to_thread(RangeRequest, request, path, content_type)
+    block_size = getattr(settings, 'VIDEO_STREAM_ASYNC_BLOCK_SIZE', 64 * 1024)
+    response = plan.early_response()
+    if response is not None:
+        return plan.finish(response)
+
+    ranges = plan.ranges
+    if ranges and len(ranges) > 1:
+        segments, length, content_type = plan.multipart()
+    elif ranges:
+        (start, end), = ranges
+        segments, length, content_type = [(start, end)], end - start + 1, plan.content_type
+    else:
+        segments, length, content_type = [(0, plan.size - 1)], plan.size, plan.content_type
+
+    response = StreamingHttpResponse(
+        aread_segments(path, segments, block_size),
+        status=206 if ranges else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    if ranges and len(ranges) == 1:
+        response['Content-Range'] = f'bytes {start}-{end}/{plan.size}'
+    return plan.finish(response)
@@ -1,3 +1,1615 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from miracle_ecommerce.database import sqlite_replicas
+
+from . import mailer
+from .middleware import PIN_COOKIE
+from .routers import PrimaryReplicaRouter, routing_scope
+from .authentication import ClaimsRefreshToken
+from .models import (
+    AboutVideo, Cart, CartItem, Category, CategoryFacet, Counter, EmailOTP, ImageUpload, Order, OutboxEmail, Product,
+    Recipe,
+)
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def make_products(self, count, category=None, **extra):
+        category = category or self.category
+        return Product.objects.bulk_create([
+            Product(
+                category=category,
+                name=f'Product {i}',
+                description=f'Description {i}',
+                price=Decimal(extra.get('price', 10 + i % 5)),
+                stock=extra.get('stock', 5),
+            )
+            for i in range(count)
+        ])
+
+
+class CatalogCursorPaginationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+
+    def collect(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(p['id'] for p in data['results'])
+            url = data['next']
+        return ids
+
+    def test_walks_every_product_once_for_each_ordering(self):
+        self.make_products(25)
+        for ordering in ('-created_at', 'created_at', 'price', '-price'):
+            ids = self.collect(f'/products/?ordering={ordering}&page_size=7')
+            self.assertEqual(sorted(ids), sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_cursor_is_stable_when_rows_are_inserted(self):
+        self.make_products(6)
+        first = self.client.get('/products/?page_size=3').json()
+        self.make_products(4)
+        second = self.client.get(first['next']).json()
+        seen = [p['id'] for p in first['results'] + second['results']]
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_previous_link_returns_the_prior_page(self):
+        self.make_products(9)
+        first = self.client.get('/products/?ordering=price&page_size=4').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([p['id'] for p in back['results']], [p['id'] for p in first['results']])
+
+    @override_settings(CATALOG_MAX_PAGE_SIZE=5)
+    def test_page_size_is_capped(self):
+        self.make_products(12)
+        data = self.client.get('/products/?page_size=1000').json()
+        self.assertEqual(len(data['results']), 5)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/products/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_products_by_category_name_is_paginated(self):
+        self.make_products(15)
+        data = self.client.get('/products-by-category/powders/?page_size=10').json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(len(self.collect('/products-by-category/all/?page_size=10')), 15)
+
+
+class ProductListQueryCountTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders', description='Dried leaf')
+        other = Category.objects.create(name='Teas')
+        self.make_products(10)
+        self.make_products(10, category=other)
+
+    def test_product_list_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/products/?page_size=50&search=Product&ordering=price')
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_products_by_category_name_query_count(self):
+        with self.assertNumQueries(1):
+            self.client.get('/products-by-category/all/?page_size=50')
+        with self.assertNumQueries(2):
+            self.client.get('/products-by-category/powders/?page_size=50&search=3')
+
+    def test_list_shape_matches_detail_serializer(self):
+        product = Product.objects.filter(category=self.category).first()
+        listed = next(p for p in self.client.get('/products/?page_size=50').json()['results']
+                      if p['id'] == product.id)
+        self.assertEqual(listed, self.client.get(f'/products/{product.id}/').json())
+
+
+class ProductSearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.leaf = Product.objects.create(
+            category=self.category, name='Moringa leaf powder', description='Dried leaves', price=5, stock=1)
+        self.tea = Product.objects.create(
+            category=self.category, name='Green tea', description='Blended with moringa', price=7, stock=1)
+        self.soap = Product.objects.create(
+            category=self.category, name='Herbal soap', description='Handmade', price=3, stock=1)
+
+    def search(self, url):
+        return [p['id'] for p in self.client.get(url).json()['results']]
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        self.assertEqual(self.search('/products/?search=mori'), [self.leaf.id, self.tea.id])
+        self.assertEqual(self.search('/products-by-category/all/?search=mori'), [self.leaf.id, self.tea.id])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('/products/?search=green%20mori'), [self.tea.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search('/products/?search=mori&ordering=-price'), [self.tea.id, self.leaf.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.soap.name = 'Moringa soap'
+        self.soap.save()
+        self.leaf.delete()
+        self.assertEqual(sorted(self.search('/products/?search=moringa')), sorted([self.tea.id, self.soap.id]))
+
+    def test_rank_cursor_pages_through_results(self):
+        self.make_products(12)
+        first = self.client.get('/products/?search=product&page_size=5').json()
+        ids = [p['id'] for p in first['results']]
+        url = first['next']
+        while url:
+            page = self.client.get(url).json()
+            ids.extend(p['id'] for p in page['results'])
+            url = page['next']
+        self.assertEqual(len(set(ids)), 12)
+
+
+class CatalogResponseCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.make_products(3)
+
+    def test_repeat_request_is_served_without_queries(self):
+        first = self.client.get('/products/?ordering=price')
+        with self.assertNumQueries(0):
+            second = self.client.get('/products/?ordering=price')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/products/?ordering=price')
+        with self.assertNumQueries(1):
+            self.client.get('/products/?ordering=-price')
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/products-by-category/powders/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/products-by-category/powders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_save_and_delete_invalidate(self):
+        etag = self.client.get('/categories/')['ETag']
+        self.category.description = 'Dried leaf'
+        self.category.save()
+        response = self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['description'], 'Dried leaf')
+
+        self.client.get('/products/')
+        Product.objects.first().delete()
+        self.assertEqual(len(self.client.get('/products/').json()['results']), 2)
+
+
+class CartTotalsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def fill(self, count):
+        products = self.make_products(count)
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=i + 1)
+            for i, product in enumerate(products)
+        ])
+        return products
+
+    def test_cart_read_query_count_does_not_grow_with_items(self):
+        self.fill(1)
+        with self.assertNumQueries(2):
+            self.client.get('/cart/')
+        self.fill(10)
+        with self.assertNumQueries(2):
+            data = self.client.get('/cart/').json()
+        self.assertEqual(len(data['items']), 11)
+
+    def test_totals_match_python_sums(self):
+        self.fill(4)
+        data = self.client.get('/cart/').json()
+        items = CartItem.objects.select_related('product')
+        self.assertEqual(data['total_items'], sum(i.quantity for i in items))
+        self.assertAlmostEqual(data['total_price'], float(sum(i.quantity * i.product.price for i in items)))
+        self.assertEqual(
+            sorted(Decimal(item['subtotal']) for item in data['items']),
+            sorted(i.quantity * i.product.price for i in items),
+        )
+
+    def test_unannotated_cart_falls_back_to_aggregates(self):
+        self.fill(3)
+        cart = Cart.objects.get(pk=self.cart.pk)
+        self.assertEqual(cart.total_items(), 6)
+        self.assertEqual(cart.total_price(), Cart.objects.with_totals().get(pk=cart.pk).total_price())
+
+    def test_empty_cart(self):
+        self.cart.delete()
+        data = self.client.get('/cart/').json()
+        self.assertEqual((data['items'], data['total_items'], data['total_price']), ([], 0, 0))
+
+
+class SessionCartReadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+
+    def add(self, products):
+        for product in products:
+            self.client.post('/cart/', {'product': product.id, 'quantity': 2}, format='json')
+
+    def test_products_fetched_in_one_query(self):
+        products = self.make_products(10)
+        self.add(products)
+        with self.assertNumQueries(1):
+            data = self.client.get('/cart/').json()
+        self.assertEqual(len(data['items']), 10)
+        self.assertEqual(data['total_items'], 20)
+
+    def test_shape_matches_authenticated_cart_items(self):
+        product = self.make_products(1)[0]
+        self.add([product])
+        item = self.client.get('/cart/').json()['items'][0]
+        self.assertEqual(set(item), {'id', 'product', 'product_details', 'quantity', 'actual_price', 'subtotal'})
+        self.assertEqual(item['id'], product.id)
+        self.assertEqual(item['product_details']['name'], product.name)
+
+    def test_deleted_products_are_skipped(self):
+        products = self.make_products(2)
+        self.add(products)
+        products[0].delete()
+        data = self.client.get('/cart/').json()
+        self.assertEqual([i['product'] for i in data['items']], [products[1].id])
+
+
+class AnonymousCartStorageTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.products = self.make_products(3)
+
+    def session_writes(self, queries):
+        return [q for q in queries if 'django_session' in q['sql']]
+
+    def run_cart_flow(self):
+        with CaptureQueriesContext(connection) as queries:
+            for product in self.products:
+                self.client.post('/cart/', {'product': product.id, 'quantity': 1}, format='json')
+            self.client.post('/cart/', {'product': self.products[0].id, 'quantity': 2}, format='json')
+            self.client.put(f'/cart/{self.products[1].id}/', {'quantity': 5}, format='json')
+            self.client.delete(f'/cart/{self.products[2].id}/')
+            data = self.client.get('/cart/').json()
+        quantities = {item['product']: item['quantity'] for item in data['items']}
+        self.assertEqual(quantities, {self.products[0].id: 3, self.products[1].id: 5})
+        return queries
+
+    def test_cookie_cart_never_touches_sessions(self):
+        queries = self.run_cart_flow()
+        self.assertEqual(self.session_writes(queries), [])
+
+    def test_cookie_is_only_reissued_on_change(self):
+        self.client.post('/cart/', {'product': self.products[0].id}, format='json')
+        self.assertNotIn('anon_cart', self.client.get('/cart/').cookies)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies['anon_cart'] = '{"1":99}'
+        self.assertEqual(self.client.get('/cart/').json()['items'], [])
+
+    @override_settings(ANONYMOUS_CART_STORAGE='app1.cart_storage.SessionCartStorage')
+    def test_session_storage_only_writes_on_change(self):
+        self.run_cart_flow()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/cart/')
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in self.session_writes(queries)))
+
+    def test_invalid_quantities_are_rejected(self):
+        product = self.products[0]
+        self.client.post('/cart/', {'product': product.id}, format='json')
+        for quantity in ('abc', None, 0, -2):
+            response = self.client.post('/cart/', {'product': product.id, 'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, 400, quantity)
+            self.assertIn('quantity', response.json())
+            response = self.client.put(f'/cart/{product.id}/', {'quantity': quantity}, format='json')
+            self.assertEqual(response.status_code, 400, quantity)
+        items = self.client.get('/cart/').json()['items']
+        self.assertEqual([(item['product'], item['quantity']) for item in items], [(product.id, 1)])
+
+    def test_legacy_session_entries_are_read(self):
+        from .cart_storage import normalize_cart
+        legacy = {'7': {'product_name': 'Tea', 'quantity': 2, 'price': '3.00'}, 'x': 1, '8': 4}
+        self.assertEqual(normalize_cart(legacy), {'7': 2, '8': 4})
+
+
+class CartBatchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.products = self.make_products(6)
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+
+    def batch(self, *operations):
+        return self.client.post('/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def quantities(self, data):
+        return {item['product']: item['quantity'] for item in data['items']}
+
+    def test_operations_fold_in_order(self):
+        self.client.force_authenticate(self.user)
+        a, b, c = (p.id for p in self.products[:3])
+        self.batch({'op': 'add', 'product': a, 'quantity': 2}, {'op': 'add', 'product': b})
+        data = self.batch(
+            {'op': 'add', 'product': a, 'quantity': 3},
+            {'op': 'set', 'product': b, 'quantity': 4},
+            {'op': 'add', 'product': b},
+            {'op': 'add', 'product': c},
+            {'op': 'remove', 'product': c},
+        ).json()
+        self.assertEqual(self.quantities(data), {a: 5, b: 5})
+        self.assertEqual(data['total_items'], 10)
+
+    def test_query_count_does_not_depend_on_operation_count(self):
+        self.client.force_authenticate(self.user)
+        Cart.objects.create(user=self.user)
+        self.batch({'op': 'add', 'product': self.products[0].id})
+        operations = [{'op': 'add', 'product': p.id} for p in self.products]
+        operations.append({'op': 'remove', 'product': self.products[0].id})
+        # cart, products, locked items, savepoint x2, delete, update/insert, response x2
+        with self.assertNumQueries(9):
+            data = self.batch(*operations).json()
+        self.assertEqual(len(data['items']), 5)
+
+    def test_unknown_product_rejects_whole_batch(self):
+        self.client.force_authenticate(self.user)
+        response = self.batch({'op': 'add', 'product': self.products[0].id}, {'op': 'add', 'product': 999})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['products'], [999])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_invalid_payload(self):
+        self.assertEqual(self.batch({'op': 'explode', 'product': 1}).status_code, 400)
+        self.assertEqual(self.client.post('/cart/batch/', {'operations': []}, format='json').status_code, 400)
+
+    def test_anonymous_cart(self):
+        a, b = self.products[0].id, self.products[1].id
+        self.batch({'op': 'add', 'product': a}, {'op': 'set', 'product': b, 'quantity': 3})
+        data = self.batch({'op': 'add', 'product': a, 'quantity': 2}, {'op': 'remove', 'product': b}).json()
+        self.assertEqual(self.quantities(data), {a: 3})
+        self.assertEqual(self.quantities(self.client.get('/cart/').json()), {a: 3})
+
+
+class CartAddConcurrencyTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        category = Category.objects.create(name='Powders')
+        self.product = Product.objects.create(category=category, name='Leaf', description='', price=2, stock=1)
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add(self, quantity=1):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post('/cart/', {'product': self.product.id, 'quantity': quantity}, format='json')
+
+    def test_add_is_one_upsert(self):
+        # product (on the read connection), cart, upsert
+        with self.assertNumQueries(2), self.assertNumQueries(1, using='read'):
+            self.add()
+        with self.assertNumQueries(2), self.assertNumQueries(1, using='read'):
+            self.add(4)
+        self.assertEqual(CartItem.objects.get().quantity, 5)
+
+    def test_concurrent_adds_do_not_lose_updates(self):
+        threads, adds = 8, 10
+        failures = []
+
+        def hammer():
+            try:
+                for _ in range(adds):
+                    if self.add().status_code != 201:
+                        failures.append('status')
+            except Exception as exc:
+                failures.append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=hammer) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, threads * adds)
+
+    def test_rejects_non_positive_quantity(self):
+        self.assertEqual(self.add(0).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CheckoutTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.leaf, self.tea = self.make_products(2, stock=5)
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, **quantities):
+        for product, quantity in ((self.leaf, quantities.get('leaf', 0)), (self.tea, quantities.get('tea', 0))):
+            if quantity:
+                self.client.post('/cart/', {'product': product.id, 'quantity': quantity}, format='json')
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock
+
+    def test_checkout_reserves_stock_and_empties_cart(self):
+        self.fill_cart(leaf=2, tea=1)
+        response = self.client.post('/orders/checkout/')
+        self.assertEqual(response.status_code, 201)
+        order = response.json()
+        self.assertEqual(order['status'], 'reserved')
+        self.assertEqual(Decimal(order['total_price']), 2 * self.leaf.price + self.tea.price)
+        self.assertEqual((self.stock(self.leaf), self.stock(self.tea)), (3, 4))
+        self.assertEqual(self.client.get('/cart/').json()['items'], [])
+
+    def test_insufficient_stock_rolls_back_every_line(self):
+        self.fill_cart(leaf=2, tea=6)
+        response = self.client.post('/orders/checkout/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['products'], [self.tea.id])
+        self.assertEqual((self.stock(self.leaf), self.stock(self.tea)), (5, 5))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(len(self.client.get('/cart/').json()['items']), 2)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.client.post('/orders/checkout/').status_code, 400)
+
+    def listed_stock(self):
+        return {p['id']: p['stock'] for p in self.client.get('/products/').json()['results']}
+
+    def test_cached_product_list_follows_stock_changes(self):
+        self.assertEqual(self.listed_stock()[self.leaf.id], 5)
+        self.fill_cart(leaf=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.client.post('/orders/checkout/').json()['id']
+        self.assertEqual(self.listed_stock()[self.leaf.id], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/orders/{order_id}/cancel/')
+        self.assertEqual(self.listed_stock()[self.leaf.id], 5)
+
+    def test_cart_is_checked_out_once(self):
+        self.fill_cart(leaf=1)
+        cart = Cart.objects.get(user=self.user)
+        self.assertIsNotNone(Order.objects.place_from_cart(cart))
+        # A second checkout holding the same (stale) cart finds it emptied
+        self.assertIsNone(Order.objects.place_from_cart(cart))
+        self.assertEqual((Order.objects.count(), self.stock(self.leaf)), (1, 4))
+
+    def test_cancel_returns_stock_once(self):
+        self.fill_cart(leaf=3)
+        order_id = self.client.post('/orders/checkout/').json()['id']
+        self.assertEqual(self.client.post(f'/orders/{order_id}/cancel/').json()['status'], 'cancelled')
+        self.assertEqual(self.client.post(f'/orders/{order_id}/cancel/').status_code, 409)
+        self.assertEqual(self.stock(self.leaf), 5)
+
+    def test_expired_reservations_are_released(self):
+        self.fill_cart(leaf=4)
+        order_id = self.client.post('/orders/checkout/').json()['id']
+        Order.objects.filter(pk=order_id).update(reserved_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Order.objects.release_expired(), 1)
+        self.assertEqual(Order.objects.release_expired(), 0)
+        self.assertEqual(self.stock(self.leaf), 5)
+        self.assertEqual(self.client.post(f'/orders/{order_id}/confirm/').status_code, 409)
+
+    def test_confirm_keeps_stock(self):
+        self.fill_cart(leaf=1)
+        order_id = self.client.post('/orders/checkout/').json()['id']
+        self.assertEqual(self.client.post(f'/orders/{order_id}/confirm/').json()['status'], 'confirmed')
+        Order.objects.filter(pk=order_id).update(reserved_until=timezone.now() - timedelta(seconds=1))
+        Order.objects.release_expired()
+        self.assertEqual(self.stock(self.leaf), 4)
+
+    def test_orders_are_private(self):
+        self.fill_cart(leaf=1)
+        order_id = self.client.post('/orders/checkout/').json()['id']
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/orders/{order_id}/').status_code, 404)
+        self.assertEqual(self.client.get('/orders/').json(), [])
+
+
+class CheckoutStressTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def test_no_oversell_under_contention(self):
+        stock, shoppers = 7, 24
+        category = Category.objects.create(name='Powders')
+        product = Product.objects.create(category=category, name='Leaf', description='', price=2, stock=stock)
+        users = []
+        for n in range(shoppers):
+            user = User.objects.create_user(f'shopper{n}', f'shopper{n}@example.com', 'pw')
+            CartItem.objects.create(cart=Cart.objects.create(user=user), product=product, quantity=1)
+            users.append(user)
+
+        statuses = []
+        barrier = threading.Barrier(shoppers)
+
+        def checkout(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                statuses.append(client.post('/orders/checkout/').status_code)
+            except Exception as exc:
+                statuses.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=checkout, args=(user,)) for user in users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        product.refresh_from_db()
+        sold = sum(Order.objects.filter(status='reserved').values_list('items__quantity', flat=True))
+        self.assertEqual(statuses.count(201), stock, statuses)
+        self.assertEqual(sold, stock)
+        self.assertEqual(product.stock, 0)
+
+
+class VideoStreamTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, VIDEO_STREAM_OFFLOAD=None)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(media_root, 'videos'))
+        self.data = bytes(range(256)) * 40
+        with open(os.path.join(media_root, 'videos', 'clip.mp4'), 'wb') as f:
+            f.write(self.data)
+        video = AboutVideo.objects.create(title='Clip', video='videos/clip.mp4')
+        self.url = f'/about-videos/{video.pk}/stream/'
+        self.async_url = self.url + 'async/'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+
+    def test_single_open_and_suffix_ranges(self):
+        size = len(self.data)
+        for header, start, end in (('bytes=100-199', 100, 199), ('bytes=10000-', 10000, size - 1),
+                                   ('bytes=-500', size - 500, size - 1), ('bytes=0-99999', 0, size - 1)):
+            response, body = self.get(Range=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(body, self.data[start:end + 1], header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+            self.assertEqual(response['Content-Length'], str(end - start + 1))
+
+    def test_multiple_ranges_are_multipart(self):
+        response, body = self.get(Range='bytes=0-9, 5-19, 1000-1009')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        self.assertEqual(response['Content-Length'], str(len(body)))
+        boundary = response['Content-Type'].split('boundary=')[1].encode()
+        parts = body.split(b'--' + boundary)[1:-1]
+        self.assertEqual(len(parts), 2)  # 0-9 and 5-19 are merged
+        self.assertIn(b'Content-Range: bytes 0-19/10240', parts[0])
+        self.assertTrue(parts[0].endswith(b'\r\n\r\n' + self.data[:20] + b'\r\n'))
+        self.assertTrue(parts[1].endswith(self.data[1000:1010] + b'\r\n'))
+
+    def test_unsatisfiable_range_is_416(self):
+        response, _ = self.get(Range='bytes=20000-20010')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10240')
+
+    def test_malformed_range_serves_whole_file(self):
+        for header in ('bytes=abc', 'items=0-1', 'bytes=9-2', 'bytes'):
+            response, body = self.get(Range=header)
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(body, self.data)
+
+    def test_if_range_and_conditional_get(self):
+        response, _ = self.get()
+        etag, modified = response['ETag'], response['Last-Modified']
+        for validator in (etag, modified):
+            response, body = self.get(Range='bytes=0-9', **{'If-Range': validator})
+            self.assertEqual((response.status_code, body), (206, self.data[:10]))
+        response, body = self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(self.get(**{'If-None-Match': etag})[0].status_code, 304)
+        self.assertEqual(self.get(**{'If-Modified-Since': modified})[0].status_code, 304)
+
+    def test_offload_mode_hands_off_to_web_server(self):
+        with override_settings(VIDEO_STREAM_OFFLOAD='x-accel-redirect'):
+            response, body = self.get(Range='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/clip.mp4')
+
+    async def aget(self, **headers):
+        response = await self.async_client.get(self.async_url, headers=headers)
+        body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else b''
+        return response, body
+
+    async def test_async_view_serves_ranges(self):
+        response, body = await self.aget()
+        self.assertEqual((response.status_code, body), (200, self.data))
+        response, body = await self.aget(Range='bytes=-500')
+        self.assertEqual((response.status_code, body), (206, self.data[-500:]))
+        self.assertEqual(response['Content-Range'], 'bytes 9740-10239/10240')
+        self.assertEqual(response['Content-Length'], '500')
+        response, body = await self.aget(Range='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], str(len(body)))
+        self.assertIn(b'Content-Range: bytes 4-5/10240', body)
+        response, _ = await self.aget(Range='bytes=99999-')
+        self.assertEqual(response.status_code, 416)
+        missing = await self.async_client.get('/about-videos/0/stream/async/')
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(VIDEO_STREAM_ASYNC_BLOCK_SIZE=1024)
+    def test_async_view_stops_reading_on_disconnect(self):
+        # As the test clients do: keep the handler from closing the test connection
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+        application = get_asgi_application()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': 'GET', 'path': self.async_url, 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'testserver')], 'server': ('testserver', 80),
+        }
+        sent = []
+
+        async def run():
+            disconnected = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.body':
+                    sent.append(message['body'])
+                    # The viewer closes the tab after the first block
+                    disconnected.set()
+                    await asyncio.sleep(0.01)
+
+            await application(scope, receive, send)
+
+        fds = set(os.listdir('/proc/self/fd'))
+        # async_to_sync keeps ORM calls on this thread's test transaction
+        async_to_sync(run)()
+        self.assertEqual(b''.join(sent), self.data[:1024])
+        self.assertEqual(set(os.listdir('/proc/self/fd')), fds)
+
+
+FAKE_FFMPEG = """#!{python}
+import os, sys
+args = sys.argv[1:]
+segment = args[args.index('-hls_segment_filename') + 1] % 0
+with open(segment, 'wb') as f:
+    f.write(open(args[args.index('-i') + 1], 'rb').read()[:16])
+with open(args[-1], 'w') as f:
+    f.write('#EXTM3U\\n#EXT-X-PLAYLIST-TYPE:VOD\\n#EXTINF:6.0,\\n' + os.path.basename(segment) + '\\n#EXT-X-ENDLIST\\n')
+"""
+
+
+class HLSPackagingTests(CatalogTestCase):
+    """Packaging with a stub encoder standing in for ffmpeg."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        encoder = os.path.join(self.media_root, 'fake-ffmpeg')
+        with open(encoder, 'w') as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(encoder, 0o755)
+        override = override_settings(
+            MEDIA_ROOT=self.media_root, HLS_FFMPEG_BINARY=encoder, HLS_WORKERS=0,
+            HLS_RENDITIONS=[
+                {'name': '720p', 'height': 720, 'video_kbps': 2800, 'audio_kbps': 128},
+                {'name': '360p', 'height': 360, 'video_kbps': 800, 'audio_kbps': 96},
+            ],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'videos'))
+        for name in ('clip.mp4', 'clip2.mp4'):
+            with open(os.path.join(self.media_root, 'videos', name), 'wb') as f:
+                f.write(os.urandom(1024))
+
+    def upload(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            video = AboutVideo.objects.create(title='Clip', video='videos/clip.mp4', **fields)
+        video.refresh_from_db()
+        return video
+
+    def test_upload_is_packaged_and_exposed(self):
+        video = self.upload()
+        self.assertEqual(video.hls_status, AboutVideo.HLSStatus.READY)
+        with open(os.path.join(self.media_root, video.hls_manifest)) as f:
+            master = f.read()
+        # Lowest bitrate first
+        self.assertLess(master.index('360p/index.m3u8'), master.index('720p/index.m3u8'))
+        self.assertIn('#EXT-X-STREAM-INF:BANDWIDTH=952000', master)
+        manifest_dir = os.path.dirname(os.path.join(self.media_root, video.hls_manifest))
+        self.assertTrue(os.path.exists(os.path.join(manifest_dir, '720p', 'seg_0000.ts')))
+
+        data = self.client.get(f'/about-videos/{video.pk}/').json()
+        self.assertEqual(data['hls_status'], 'ready')
+        self.assertTrue(data['hls_manifest_url'].endswith('/media/' + video.hls_manifest))
+        self.assertTrue(data['video'].endswith('/media/videos/clip.mp4'))
+
+    def test_metadata_edit_does_not_repackage(self):
+        video = self.upload()
+        video.title = 'Renamed'
+        with self.captureOnCommitCallbacks() as callbacks:
+            video.save()
+        self.assertEqual(callbacks, [])
+
+    def test_new_upload_replaces_previous_package(self):
+        video = self.upload()
+        old_dir = os.path.dirname(os.path.join(self.media_root, video.hls_manifest))
+        video.video = 'videos/clip2.mp4'
+        with self.captureOnCommitCallbacks(execute=True):
+            video.save()
+        video.refresh_from_db()
+        self.assertEqual((video.hls_status, video.hls_source), ('ready', 'videos/clip2.mp4'))
+        self.assertNotEqual(os.path.dirname(os.path.join(self.media_root, video.hls_manifest)), old_dir)
+        self.assertFalse(os.path.exists(old_dir))
+
+    def test_missing_encoder_fails_and_backfill_retries(self):
+        with override_settings(HLS_FFMPEG_BINARY=os.path.join(self.media_root, 'missing')):
+            video = self.upload()
+        self.assertEqual(video.hls_status, AboutVideo.HLSStatus.FAILED)
+        self.assertIn('encoder not found', video.hls_error)
+        self.assertIsNone(self.client.get(f'/about-videos/{video.pk}/').json()['hls_manifest_url'])
+
+        call_command('package_about_videos', '--retry-failed', stdout=open(os.devnull, 'w'))
+        video.refresh_from_db()
+        self.assertEqual(video.hls_status, AboutVideo.HLSStatus.READY)
+
+    def test_backfill_packages_existing_uploads(self):
+        # Rows created before packaging existed (no save signal)
+        AboutVideo.objects.bulk_create([
+            AboutVideo(title='Old', video='videos/clip.mp4'),
+            AboutVideo(title='Old 2', video='videos/clip2.mp4'),
+            AboutVideo(title='YouTube only', youtube_id='abc'),
+        ])
+        call_command('package_about_videos', '--workers', '1', stdout=open(os.devnull, 'w'))
+        statuses = dict(AboutVideo.objects.values_list('title', 'hls_status'))
+        self.assertEqual(statuses, {'Old': 'ready', 'Old 2': 'ready', 'YouTube only': 'none'})
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0, IMAGE_VARIANT_WIDTHS=[100, 200], IMAGE_VARIANT_FORMATS=['webp', 'jpeg'])
+class ImageVariantTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Teas')
+
+    def write_image(self, name, size=(300, 150), color=(200, 30, 30, 128)):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGBA', size, color).save(path, 'PNG')
+        return name
+
+    def make_product(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                category=self.category, name='Tea', description='', price=Decimal('3'), stock=1, image=image,
+            )
+        product.refresh_from_db()
+        return product
+
+    def test_upload_generates_hashed_variants(self):
+        product = self.make_product(self.write_image('products/tea.png'))
+        variants = product.image_variants
+        self.assertEqual((variants['source'], variants['width'], variants['height']), ('products/tea.png', 300, 150))
+        self.assertEqual(sorted(variants['formats']), ['jpeg', 'webp'])
+        name = variants['formats']['jpeg']['100']
+        self.assertEqual(name, f"variants/{variants['hash'][:2]}/{variants['hash']}-100w.jpg")
+        with Image.open(os.path.join(self.media_root, name)) as thumb:
+            self.assertEqual((thumb.format, thumb.mode, thumb.size), ('JPEG', 'RGB', (100, 50)))
+        with Image.open(os.path.join(self.media_root, variants['formats']['webp']['200'])) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ('WEBP', (200, 100)))
+
+    def test_serializers_expose_srcset(self):
+        product = self.make_product(self.write_image('products/tea.png'))
+        names = product.image_variants['formats']['webp']
+        expected = f"http://testserver/media/{names['100']} 100w, http://testserver/media/{names['200']} 200w"
+        self.assertEqual(self.client.get(f'/products/{product.pk}/').json()['image_srcset']['webp'], expected)
+        listed = self.client.get('/products/').json()['results'][0]
+        self.assertEqual(listed['image_srcset']['webp'], expected)
+        self.assertIn('jpeg', listed['image_srcset'])
+
+    def test_small_images_are_not_upscaled_and_identical_uploads_share_files(self):
+        first = self.make_product(self.write_image('products/a.png', size=(150, 150)))
+        second = self.make_product(self.write_image('products/b.png', size=(150, 150)))
+        self.assertEqual(sorted(first.image_variants['formats']['webp'], key=int), ['100', '150'])
+        self.assertEqual(first.image_variants['formats'], second.image_variants['formats'])
+
+    def test_legacy_images_are_generated_on_first_request(self):
+        ImageUpload.objects.bulk_create([ImageUpload(image=self.write_image('image/old.png'))])
+        upload = ImageUpload.objects.get()
+        srcset = self.client.get('/get-all-images/').json()['results'][0]['image_srcset']
+        lazy_url = f'http://testserver/image-variants/imageupload/{upload.pk}/200.webp'
+        self.assertIn(f'{lazy_url} 200w', srcset['webp'])
+
+        response = self.client.get(lazy_url)
+        self.assertEqual(response.status_code, 302)
+        upload.refresh_from_db()
+        self.assertEqual(response['Location'], '/media/' + upload.image_variants['formats']['webp']['200'])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, upload.image_variants['formats']['webp']['200'])))
+        srcset = self.client.get('/get-all-images/').json()['results'][0]['image_srcset']
+        self.assertNotIn('image-variants', srcset['webp'])
+
+    def test_backfill_command(self):
+        ImageUpload.objects.bulk_create([ImageUpload(image=self.write_image(f'image/{n}.png')) for n in range(3)])
+        call_command('generate_image_variants', '--workers', '1', stdout=open(os.devnull, 'w'))
+        for upload in ImageUpload.objects.all():
+            self.assertEqual(upload.image_variants['source'], upload.image.name)
+
+
+class GalleryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        ImageUpload.objects.bulk_create([ImageUpload(image=f'image/{n}.png') for n in range(25)])
+        # Several uploads share a timestamp so the id tie-breaker matters
+        uploads = list(ImageUpload.objects.order_by('id'))
+        base = timezone.now()
+        for n, upload in enumerate(uploads):
+            upload.uploaded_at = base - timedelta(minutes=n // 3)
+        ImageUpload.objects.bulk_update(uploads, ['uploaded_at'])
+        self.newest_first = list(ImageUpload.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+
+    def test_cursor_pages_newest_first(self):
+        ids, url = [], '/get-all-images/?page_size=10'
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            ids.extend(image['id'] for image in data['results'])
+            url = data['next']
+        self.assertEqual(ids, self.newest_first)
+
+    def test_rows_have_serializer_shape(self):
+        first = self.client.get('/get-all-images/').json()['results'][0]
+        self.assertEqual(set(first), {'id', 'image', 'image_srcset', 'uploaded_at'})
+        upload = ImageUpload.objects.get(pk=first['id'])
+        self.assertEqual(first['image'], f'http://testserver/media/{upload.image.name}')
+
+    def test_name_filter(self):
+        logo = ImageUpload.objects.create(image='image/site-Logo.png')
+        data = self.client.get('/get-all-images/?name=logo').json()
+        self.assertEqual([image['id'] for image in data['results']], [logo.id])
+        self.assertEqual(self.client.get('/get-all-images/?name=missing').json()['results'], [])
+
+    def test_ndjson_streams_whole_gallery(self):
+        for kwargs in ({'path': '/get-all-images/?format=ndjson'},
+                       {'path': '/get-all-images/', 'HTTP_ACCEPT': 'application/x-ndjson'}):
+            response = self.client.get(**kwargs)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            self.assertEqual([json.loads(line)['id'] for line in lines], self.newest_first)
+
+
+class FileServingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, STATIC_ROOT=self.static_root, IMAGE_VARIANT_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Teas')
+
+    def upload(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                category=self.category, name='Tea', description='', price=Decimal('3'), stock=1,
+                image=SimpleUploadedFile('tea.png', content, content_type='image/png'),
+            )
+
+    def png(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 20), color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_uploads_get_content_hashed_names_and_immutable_caching(self):
+        first = self.upload(self.png((1, 2, 3)))
+        self.assertRegex(first.image.name, r'^products/tea\.[0-9a-f]{12}\.png$')
+        self.assertEqual(self.upload(self.png((1, 2, 3))).image.name, first.image.name)
+        self.assertNotEqual(self.upload(self.png((9, 9, 9))).image.name, first.image.name)
+
+        response = self.client.get(f'/media/{first.image.name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(b''.join(response.streaming_content), self.png((1, 2, 3)))
+        again = self.client.get(f'/media/{first.image.name}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_unhashed_media_is_revalidated(self):
+        os.makedirs(os.path.join(self.media_root, 'image'))
+        with open(os.path.join(self.media_root, 'image', 'old.png'), 'wb') as f:
+            f.write(self.png((1, 2, 3)))
+        response = self.client.get('/media/image/old.png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertIn('ETag', response)
+        for path in ('/media/image/missing.png', '/media/image/', '/media/../manage.py', '/media/.hidden'):
+            self.assertEqual(self.client.get(path).status_code, 404, path)
+
+    def test_collected_static_files_are_hashed_and_precompressed(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with override_settings(DEBUG=False):
+            url = self.client.get('/').content.decode().split('<script type="module" crossorigin src="')[1].split('"')[0]
+        self.assertRegex(url, r'^/static/assets/index-BQZkPQG5\.[0-9a-f]{12}\.js$')
+        with open(os.path.join(self.static_root, url[len('/static/'):]), 'rb') as f:
+            original = f.read()
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_ACCEPT_ENCODING='gzip').status_code, 304)
+
+        identity = self.client.get(url)
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(b''.join(identity.streaming_content), original)
+        self.assertNotEqual(identity['ETag'], response['ETag'])
+
+    def test_index_shell_revalidates(self):
+        response = self.client.get('/')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('smtp down')
+
+
+@override_settings(
+    MAIL_WORKERS=0, EMAIL_BACKEND='app1.tests.CountingEmailBackend',
+    OTP_RATE_LIMITS={'email': (2, 600), 'ip': (3, 3600)},
+)
+class OTPOutboxTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        CountingEmailBackend.opened = 0
+        self.addCleanup(mailer.close_connection)
+
+    def request_otp(self, email, ip='10.0.0.1'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/send-otp/', {'email': email}, format='json', REMOTE_ADDR=ip)
+
+    def test_otp_is_queued_and_sent_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post('/send-otp/', {'email': 'a@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.Status.PENDING)
+
+        for callback in callbacks:
+            callback()
+        otp = EmailOTP.objects.get(email='a@example.com').otp
+        self.assertEqual([(m.to, m.body) for m in mail.outbox], [(['a@example.com'], f'Your OTP is: {otp}')])
+        row = OutboxEmail.objects.get()
+        self.assertEqual((row.status, row.attempts, row.body), (OutboxEmail.Status.SENT, 1, ''))
+
+    def test_batches_reuse_one_connection(self):
+        for n in range(5):
+            mailer.queue_email(f'user{n}@example.com', 'Hi', 'Body')
+        self.assertEqual(mailer.drain(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+
+    def test_rate_limits_per_email_and_ip(self):
+        self.assertEqual(self.request_otp('a@example.com').status_code, 200)
+        self.assertEqual(self.request_otp('A@example.com').status_code, 200)
+        limited = self.request_otp('a@example.com')
+        self.assertEqual(limited.status_code, 429)
+        self.assertGreater(int(limited['Retry-After']), 0)
+        # The rejected request above took no IP token either
+        self.assertEqual(self.request_otp('b@example.com').status_code, 200)
+        self.assertEqual(self.request_otp('c@example.com').status_code, 429)
+        self.assertEqual(self.request_otp('c@example.com', ip='10.0.0.2').status_code, 200)
+        self.assertEqual(len(mail.outbox), 4)
+
+    @override_settings(EMAIL_BACKEND='app1.tests.FailingEmailBackend', MAIL_MAX_ATTEMPTS=2, MAIL_RETRY_DELAY=30)
+    def test_failures_back_off_then_fail(self):
+        row = mailer.queue_email('a@example.com', 'Hi', 'Body')
+        mailer.drain()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (OutboxEmail.Status.PENDING, 1))
+        self.assertGreater(row.available_at, timezone.now() + timedelta(seconds=25))
+        self.assertIn('smtp down', row.last_error)
+
+        OutboxEmail.objects.filter(pk=row.pk).update(available_at=timezone.now())
+        mailer.drain()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.body), (OutboxEmail.Status.FAILED, 2, 'Body'))
+
+    def test_command_sends_leftovers_and_abandoned_claims(self):
+        pending = mailer.queue_email('a@example.com', 'Hi', 'One')
+        abandoned = mailer.queue_email('b@example.com', 'Hi', 'Two')
+        OutboxEmail.objects.filter(pk=abandoned.pk).update(
+            status=OutboxEmail.Status.SENDING, claim='dead', claimed_at=timezone.now() - timedelta(hours=1),
+        )
+        in_flight = mailer.queue_email('c@example.com', 'Hi', 'Three')
+        OutboxEmail.objects.filter(pk=in_flight.pk).update(
+            status=OutboxEmail.Status.SENDING, claim='alive', claimed_at=timezone.now(),
+        )
+        call_command('send_queued_mail', stdout=open(os.devnull, 'w'))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@example.com', 'b@example.com'])
+        self.assertEqual(OutboxEmail.objects.get(pk=pending.pk).status, OutboxEmail.Status.SENT)
+        self.assertEqual(OutboxEmail.objects.get(pk=in_flight.pk).status, OutboxEmail.Status.SENDING)
+
+
+@override_settings(MAIL_WORKERS=0, OTP_RATE_LIMITS={}, OTP_MAX_ATTEMPTS=3)
+class OTPExpiryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(mailer.close_connection)
+
+    def request_otp(self, email='a@example.com'):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/send-otp/', {'email': email}, format='json')
+        return EmailOTP.objects.get(email=email)
+
+    def verify(self, otp, email='a@example.com'):
+        return self.client.post('/verify-otp/', {'email': email, 'otp': otp}, format='json')
+
+    def register(self, email='a@example.com'):
+        return self.client.post('/register/', {'email': email, 'name': 'A', 'password': 'pw-123456'}, format='json')
+
+    def test_verify_is_one_conditional_update(self):
+        entry = self.request_otp()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.verify(entry.otp).status_code, 200)
+        entry.refresh_from_db()
+        self.assertTrue(entry.is_verified)
+        self.assertGreater(entry.expires_at, timezone.now() + timedelta(minutes=20))
+        # Already verified: the code cannot be replayed
+        self.assertEqual(self.verify(entry.otp).status_code, 400)
+
+    def test_expired_otp_is_rejected(self):
+        entry = self.request_otp()
+        EmailOTP.objects.filter(pk=entry.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.verify(entry.otp).status_code, 400)
+
+    def test_attempts_are_capped_until_a_new_otp(self):
+        entry = self.request_otp()
+        wrong = '000000' if entry.otp != '000000' else '111111'
+        for _ in range(5):
+            self.assertEqual(self.verify(wrong).status_code, 400)
+        # Wrong guesses past the cap are not counted any further
+        self.assertEqual(EmailOTP.objects.get(pk=entry.pk).attempts, 3)
+        self.assertEqual(self.verify(entry.otp).status_code, 400)
+
+        entry = self.request_otp()
+        self.assertEqual(entry.attempts, 0)
+        self.assertEqual(self.verify(entry.otp).status_code, 200)
+
+    def test_registration_needs_a_live_verified_otp_and_consumes_it(self):
+        entry = self.request_otp()
+        self.assertEqual(self.register().status_code, 400)
+        self.verify(entry.otp)
+        EmailOTP.objects.filter(pk=entry.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.register().status_code, 400)
+
+        EmailOTP.objects.filter(pk=entry.pk).update(expires_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(self.register().status_code, 201)
+        self.assertFalse(EmailOTP.objects.filter(email='a@example.com').exists())
+
+    def test_registration_and_user_counters_share_a_transaction(self):
+        self.verify(self.request_otp().otp)
+        with mock.patch('app1.counters.adjust', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.register()
+        self.assertFalse(User.objects.exists())
+        # The OTP was not spent either, so registering can be retried
+        self.assertEqual(self.register().status_code, 201)
+        self.assertEqual(self.client.get('/user-count/').json()['total_users'], 1)
+
+    def test_lookups_and_sweep_use_indexes(self):
+        now = timezone.now()
+        plans = {}
+        for name, queryset in (
+            ('register', EmailOTP.objects.filter(email='a@example.com', is_verified=True, expires_at__gt=now)),
+            ('sweep', EmailOTP.objects.filter(expires_at__lte=now).values('pk')),
+        ):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plans[name] = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('USING INDEX sqlite_autoindex_app1_emailotp_1 (email=?)', plans['register'])
+        self.assertIn('USING COVERING INDEX app1_emailo_expires', plans['sweep'])
+
+    def test_sweeper_deletes_expired_rows_in_batches(self):
+        now = timezone.now()
+        EmailOTP.objects.bulk_create(
+            [EmailOTP(email=f'old{n}@example.com', otp='123456', expires_at=now - timedelta(minutes=1)) for n in range(5)]
+            + [EmailOTP(email='legacy@example.com', otp='123456')]
+            + [EmailOTP(email='live@example.com', otp='123456', expires_at=now + timedelta(minutes=5))]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sweep_expired_otps', '--batch-size', '2', stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(EmailOTP.objects.values_list('email', flat=True)), ['live@example.com'])
+        self.assertGreaterEqual(sum('DELETE' in q['sql'] for q in queries.captured_queries), 3)
+
+
+class UserCountTests(CatalogTestCase):
+    def counts(self):
+        return self.client.get('/user-count/').json()
+
+    def make_user(self, name, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return User.objects.create_user(username=name, password='pw', **extra)
+
+    def test_counters_follow_user_changes(self):
+        self.assertEqual(self.counts(), {'total_users': 0, 'active_users': 0})
+        first = self.make_user('a')
+        self.make_user('b')
+        self.make_user('c', is_active=False)
+        self.assertEqual(self.counts(), {'total_users': 3, 'active_users': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.is_active = False
+            first.save()
+        self.assertEqual(self.counts(), {'total_users': 3, 'active_users': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(username='b').delete()
+        self.assertEqual(self.counts(), {'total_users': 2, 'active_users': 0})
+
+    def test_endpoint_reads_cache_then_counter_rows(self):
+        self.make_user('a')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.counts()['total_users'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts()['total_users'], 1)
+
+    def test_last_login_saves_skip_counters(self):
+        user = self.make_user('a')
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_reconcile_fixes_drift_and_missing_rows(self):
+        for name in 'abc':
+            self.make_user(name)
+        User.objects.filter(username='a').update(is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.counts(), {'total_users': 3, 'active_users': 2})
+
+        cache.clear()
+        Counter.objects.all().delete()
+        self.assertEqual(self.counts(), {'total_users': 3, 'active_users': 2})
+        self.make_user('d')
+        self.assertEqual(Counter.objects.get(name='users.total').value, 4)
+
+
+class StatelessJWTTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username='ann@example.com', email='ann@example.com', password='pw-123456', first_name='Ann',
+        )
+
+    def login(self):
+        return self.client.post('/login/', {'username': 'ann@example.com', 'password': 'pw-123456'}, format='json').json()
+
+    def test_requests_authenticate_from_claims_without_queries(self):
+        access = self.login()['access']
+        self.assertEqual(AccessToken(access)['email'], 'ann@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with self.assertNumQueries(0):
+            response = self.client.get('/user/')
+        self.assertEqual(response.json(), {'name': 'Ann', 'email': 'ann@example.com', 'username': 'ann@example.com'})
+        # Views filtering by the user's id work with the claims user
+        self.assertEqual(self.client.get('/cart/').json()['user'], self.user.pk)
+        self.assertEqual(self.client.get('/orders/').status_code, 200)
+
+    def test_tokens_without_claims_fall_back_to_the_user_row(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/user/').json()['email'], 'ann@example.com')
+
+    def test_refresh_reissues_claims_and_blacklists_the_old_token(self):
+        tokens = self.login()
+        User.objects.filter(pk=self.user.pk).update(email='new@example.com', is_staff=True)
+        refreshed = self.client.post('/token/refresh/', {'refresh': tokens['refresh']}, format='json').json()
+        claims = AccessToken(refreshed['access'])
+        self.assertEqual((claims['email'], claims['is_staff']), ('new@example.com', True))
+
+        replay = self.client.post('/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(replay.status_code, 401)
+        self.assertEqual(self.client.post('/logout/', {'refresh': refreshed['refresh']}, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/token/refresh/', {'refresh': refreshed['refresh']}, format='json').status_code, 401)
+
+    def test_blacklist_lookups_are_cached(self):
+        refresh = self.login()['refresh']
+        with self.assertNumQueries(1):
+            ClaimsRefreshToken(refresh)
+        with self.assertNumQueries(0):
+            ClaimsRefreshToken(refresh)
+
+
+class SQLiteTuningTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def pragma(self, alias, name):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_opened_with_the_pragmas(self):
+        for alias in ('default', 'read'):
+            self.assertEqual(self.pragma(alias, 'journal_mode'), 'wal')
+            # NORMAL
+            self.assertEqual(self.pragma(alias, 'synchronous'), 1)
+            self.assertEqual(self.pragma(alias, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma('default', 'query_only'), 0)
+        self.assertEqual(self.pragma('read', 'query_only'), 1)
+
+    def test_reads_leave_the_write_connection_outside_transactions(self):
+        category = Category.objects.create(name='Powders')
+        self.assertEqual(Category.objects.all().db, 'read')
+        self.assertEqual(Category.objects.get().name, 'Powders')
+        with transaction.atomic():
+            Category.objects.filter(pk=category.pk).update(name='Teas')
+            # Only the writer sees its uncommitted update
+            self.assertEqual(Category.objects.all().db, 'default')
+            self.assertEqual(Category.objects.get().name, 'Teas')
+        self.assertEqual(Category.objects.using('read').get().name, 'Teas')
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    No replicas are configured in the test settings: the query-only read
+    alias stands in for one, and the primary's own reads are sent to
+    default so the two can be told apart.
+    """
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        override = override_settings(DATABASE_REPLICAS=['read'])
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(PrimaryReplicaRouter, 'read_alias', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        category = Category.objects.create(name='Powders')
+        self.product = Product.objects.create(category=category, name='Leaf', description='', price=2, stock=5)
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+
+    def test_catalog_reads_go_to_replicas_until_the_context_writes(self):
+        with routing_scope():
+            self.assertEqual(Product.objects.all().db, 'read')
+            self.assertEqual(Category.objects.all().db, 'read')
+            # Not a catalog model: the primary
+            self.assertEqual(Cart.objects.all().db, 'default')
+            with transaction.atomic():
+                self.assertEqual(Product.objects.all().db, 'default')
+
+            Cart.objects.create(user=self.user)
+            self.assertEqual(Product.objects.all().db, 'default')
+        with routing_scope():
+            self.assertEqual(Product.objects.all().db, 'read')
+
+    def test_a_writing_request_pins_the_client_to_the_primary(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connections['read']) as replica:
+            self.assertEqual(client.get(f'/products/{self.product.id}/').status_code, 200)
+            per_read = len(replica)
+            self.assertGreater(per_read, 0)
+            self.assertNotIn(PIN_COOKIE, client.cookies)
+
+            response = client.post('/cart/', {'product': self.product.id, 'quantity': 1}, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertIn(PIN_COOKIE, response.cookies)
+            seen = len(replica)
+
+            # The next read sees the write; nothing more reaches a replica
+            self.assertEqual(client.get(f'/products/{self.product.id}/').status_code, 200)
+            self.assertEqual(len(replica), seen)
+
+            client.cookies.pop(PIN_COOKIE)
+            client.get(f'/products/{self.product.id}/')
+            self.assertEqual(len(replica), seen + per_read)
+
+    def test_replicas_come_from_configuration(self):
+        self.assertEqual(sqlite_replicas('', settings.BASE_DIR), {})
+        replicas = sqlite_replicas('a.sqlite3, b.sqlite3', settings.BASE_DIR)
+        self.assertEqual(list(replicas), ['replica1', 'replica2'])
+        self.assertEqual(replicas['replica2']['NAME'], settings.BASE_DIR / 'b.sqlite3')
+        self.assertNotIn('replica1', connections)
+
+
+class QueryPlanTests(CatalogTestCase):
+    """Every list endpoint reads through an index: no table scans, no sorts."""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Powders')
+        self.make_products(3)
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+
+    def assertIndexedPlans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                self.assertNotRegex(step, r'^SCAN \S+$', f'{url}: {sql}')
+                self.assertNotIn('TEMP B-TREE', step, f'{url}: {sql}')
+
+    def test_catalog_lists(self):
+        for url in [
+            '/products/',
+            '/products/?ordering=price',
+            '/products/?ordering=-price',
+            f'/products/?category={self.category.id}',
+            f'/products/?category={self.category.id}&ordering=-price',
+            '/products-by-category/POWDERS/',
+            '/products-by-category/powders/?ordering=price',
+            '/products-by-category/all/?ordering=-created_at',
+            '/recipes/',
+            '/about-videos/',
+            '/get-all-images/',
+        ]:
+            cache.clear()
+            self.assertIndexedPlans(url)
+
+    def test_orders(self):
+        self.client.force_authenticate(self.user)
+        self.assertIndexedPlans('/orders/')
+
+
+class CatalogFacetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.powders = Category.objects.create(name='Powders')
+        self.teas = Category.objects.create(name='Teas')
+
+    def add(self, category, price, **fields):
+        return Product.objects.create(category=category, name='Leaf', description='', price=price, stock=1, **fields)
+
+    def facets(self):
+        cache.clear()
+        with self.assertNumQueries(1):
+            data = self.client.get('/catalog-facets/').json()
+        return data, {c['name']: [r['count'] for r in c['price_ranges']] for c in data['categories']}
+
+    def test_counts_follow_product_saves_and_deletes(self):
+        leaf = self.add(self.powders, '5.00')
+        self.add(self.powders, '30.00')
+        self.add(self.teas, '300.00')
+        self.add(self.teas, '12.00', is_active=False)
+        data, counts = self.facets()
+        self.assertEqual(data['product_count'], 3)
+        self.assertEqual(counts, {'Powders': [1, 0, 1, 0, 0, 0], 'Teas': [0, 0, 0, 0, 0, 1]})
+        self.assertEqual(data['categories'][0]['product_count'], 2)
+        self.assertEqual(data['price_ranges'][0], {'min': None, 'max': '10', 'count': 1})
+        self.assertEqual(data['price_ranges'][-1], {'min': '250', 'max': None, 'count': 1})
+
+        leaf.price = Decimal('60.00')
+        leaf.category = self.teas
+        leaf.save()
+        self.assertEqual(self.facets()[1], {'Powders': [0, 0, 1, 0, 0, 0], 'Teas': [0, 0, 0, 1, 0, 1]})
+
+        leaf.is_active = False
+        leaf.save(update_fields=['is_active'])
+        self.assertEqual(self.facets()[1]['Teas'], [0, 0, 0, 0, 0, 1])
+        leaf.is_active = True
+        leaf.save()
+        Product.objects.get(pk=leaf.pk).delete()
+        self.assertEqual(self.facets()[1]['Teas'], [0, 0, 0, 0, 0, 1])
+
+        # Loaded without category or is_active: the stored values are read
+        # back instead of recounting every facet
+        partial = Product.objects.only('id', 'name').get(price=Decimal('30.00'))
+        partial.price = Decimal('8.00')
+        facet_ids = set(CategoryFacet.objects.values_list('id', flat=True))
+        partial.save()
+        self.assertEqual(self.facets()[1]['Powders'], [1, 0, 0, 0, 0, 0])
+        self.assertEqual(set(CategoryFacet.objects.values_list('id', flat=True)), facet_ids)
+
+        self.teas.delete()
+        data, counts = self.facets()
+        self.assertEqual((data['product_count'], counts), (1, {'Powders': [1, 0, 0, 0, 0, 0]}))
+        Product.objects.only('id').get(pk=partial.pk).delete()
+        self.assertEqual(self.facets()[0]['product_count'], 0)
+
+    def test_save_and_facet_update_share_a_transaction(self):
+        leaf = self.add(self.powders, '5.00')
+        leaf.price = Decimal('60.00')
+        with mock.patch('app1.facets.adjust', side_effect=[None, RuntimeError]), self.assertRaises(RuntimeError):
+            leaf.save()
+        self.assertEqual(Product.objects.get(pk=leaf.pk).price, Decimal('5.00'))
+        self.assertEqual(self.facets()[1]['Powders'], [1, 0, 0, 0, 0, 0])
+
+    def test_rebuild_recounts_after_bulk_writes(self):
+        self.category = self.powders
+        self.make_products(4, price='20.00')
+        Product.objects.filter(pk=self.add(self.teas, '1.00').pk).update(price=Decimal('99.00'))
+        self.assertEqual(self.facets()[1], {'Powders': [0, 0, 0, 0, 0, 0], 'Teas': [1, 0, 0, 0, 0, 0]})
+
+        call_command('rebuild_catalog_facets', stdout=io.StringIO())
+        data, counts = self.facets()
+        self.assertEqual(counts, {'Powders': [0, 4, 0, 0, 0, 0], 'Teas': [0, 0, 0, 1, 0, 0]})
+        self.assertEqual(CategoryFacet.objects.count(), 2)
+
+
+class CatalogImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_command(self, *args):
+        stderr = io.StringIO()
+        call_command('catalog_data', *args, stdout=io.StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_csv_import_upserts_by_natural_key_in_batches(self):
+        Category.objects.create(name='Teas', description='Loose leaf')
+        existing = Product.objects.create(
+            category=Category.objects.get(), name='Green', description='old', price=5, stock=1,
+        )
+        path = self.write('products.csv', (
+            'category,name,description,price,stock,is_active\n'
+            'Teas,Green,fresh,7.50,10,true\n'
+            'Teas,Black,,12.00,3,false\n'
+            'Powders,Moringa,leaf powder,30.00,8,1\n'
+        ))
+        output = self.run_command('import', 'products', path, '--batch-size', '2')
+        self.assertIn('batch 2: 3 rows, 2 created, 1 updated', output)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.description, existing.price, existing.stock), ('fresh', Decimal('7.50'), 10))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertFalse(Product.objects.get(name='Black').is_active)
+        self.assertEqual(Product.objects.get(name='Moringa').category.name, 'Powders')
+        # Bulk writes skip signals; the import recounts the facets itself
+        self.assertEqual(sum(CategoryFacet.objects.values_list('product_count', flat=True)), 2)
+        self.assertEqual(self.client.get('/products/?search=moringa').json()['results'][0]['name'], 'Moringa')
+
+        self.run_command('import', 'products', path)
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_jsonl_export_round_trips(self):
+        category = Category.objects.create(name='Teas')
+        Product.objects.create(category=category, name='Green', description='d', price='7.50', stock=2)
+        Recipe.objects.create(title='Tea latte', ingredients=['tea', 'milk'], instructions=['brew', 'pour'])
+        products = os.path.join(self.dir, 'products.jsonl')
+        recipes = os.path.join(self.dir, 'recipes.csv')
+        self.run_command('export', 'products', products)
+        self.run_command('export', 'recipes', recipes)
+        with open(products) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows, [{
+            'category': 'Teas', 'name': 'Green', 'description': 'd', 'price': '7.50',
+            'stock': 2, 'is_active': True, 'image': '',
+        }])
+
+        Product.objects.all().delete()
+        Recipe.objects.all().delete()
+        self.run_command('import', 'products', products)
+        self.run_command('import', 'recipes', recipes)
+        self.assertEqual(Product.objects.get().price, Decimal('7.50'))
+        self.assertEqual(Recipe.objects.get().ingredients, ['tea', 'milk'])
+
+    def test_invalid_rows_stop_the_import_with_their_line(self):
+        path = self.write('products.jsonl', (
+            '{"category": "Teas", "name": "Green", "description": "", "price": "7", "stock": 1}\n'
+            '{"category": "Teas", "name": "Black", "description": "", "price": "cheap", "stock": 1}\n'
+        ))
+        with self.assertRaisesMessage(CommandError, 'line 2: price'):
+            self.run_command('import', 'products', path)
+        self.assertFalse(Product.objects.exists())
+
+    def test_new_rows_missing_required_columns_report_their_line(self):
+        path = self.write('products.csv', 'category,name,price\nTeas,Green,5\n')
+        with self.assertRaisesMessage(CommandError, 'line 2: missing stock'):
+            self.run_command('import', 'products', path)
+        # The category the failed batch created is rolled back with it
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Category.objects.exists())
+
+        # Existing rows only need the columns being changed
+        Product.objects.create(category=Category.objects.create(name='Teas'), name='Green', description='', price=1, stock=3)
+        self.run_command('import', 'products', path)
+        self.assertEqual(Product.objects.get().price, Decimal('5'))
+
+    def test_product_import_refreshes_cached_categories(self):
+        self.assertEqual(self.client.get('/categories/').json(), [])
+        self.run_command('import', 'products', self.write('products.csv', 'category,name,description,price,stock\nTeas,Green,,5,1\n'))
+        self.assertEqual([c['name'] for c in self.client.get('/categories/').json()], ['Teas'])
+
+    def test_jsonl_lines_must_be_objects(self):
+        for line in ('[1, 2]', '5'):
+            path = self.write('products.jsonl', f'{line}\n')
+            with self.assertRaisesMessage(CommandError, 'line 1: expected a JSON object'):
+                self.run_command('import', 'products', path)
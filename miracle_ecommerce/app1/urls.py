@@ -1,9 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet, dojo_app ,CategoryViewSet, ProductViewSet, get_all_images, products_by_category_name, register_user, send_otp, verify_otp,current_user,user_count, RecipeViewSet, AboutVideoViewSet, stream_about_video
+from .views import CartViewSet, OrderViewSet, dojo_app ,CategoryViewSet, ProductViewSet, get_all_images, products_by_category_name, register_user, send_otp, verify_otp,current_user,user_count, catalog_facets_view, RecipeViewSet, AboutVideoViewSet, stream_about_video, stream_about_video_async, image_variant
 
-from django.conf import settings
-from django.conf.urls.static import static
+from .fileserve import file_urlpatterns
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -16,6 +15,7 @@ router.register('categories', CategoryViewSet)
 router.register('products', ProductViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('about-videos', AboutVideoViewSet)
+router.register('orders', OrderViewSet, basename='order')
 
 
 cart_list = CartViewSet.as_view({
@@ -23,6 +23,10 @@ cart_list = CartViewSet.as_view({
     'post': 'create'    # POST cart/ - Add item to cart
 })
 
+cart_batch = CartViewSet.as_view({
+    'post': 'batch'     # POST cart/batch/ - Apply several add/set/remove operations
+})
+
 cart_detail = CartViewSet.as_view({
     'put': 'update',    # PUT cart/<id>/ - Update item quantity
     'delete': 'destroy' # DELETE cart/<id>/ - Remove item from cart
@@ -49,13 +53,17 @@ urlpatterns = [
     path('logout/', TokenBlacklistView.as_view(), name='token_blacklist'),
     path('user/', current_user, name='current_user'),
     path('user-count/', user_count, name='user_count'),
+    path('catalog-facets/', catalog_facets_view, name='catalog_facets'),
 
     path('cart/', cart_list, name='cart'),
+    path('cart/batch/', cart_batch, name='cart-batch'),
     path('cart/<int:pk>/', cart_detail, name='cart-item-detail'),
 
     path('get-all-images/', get_all_images, name='get_all_images'),
+    path('image-variants/<str:model>/<int:pk>/<int:width>.<str:fmt>', image_variant, name='image_variant'),
     path('about-videos/<int:pk>/stream/', stream_about_video, name='about_video_stream'),
+    path('about-videos/<int:pk>/stream/async/', stream_about_video_async, name='about_video_stream_async'),
     path('', include(router.urls)),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Static and media files, with cache headers, when nothing in front serves them
+urlpatterns += file_urlpatterns()
@@ -1,11 +1,23 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 import random
 
 def generate_otp():
     return str(random.randint(100000, 999999))
 
-def send_otp_email(email, otp):
+def otp_expiry(verified=False):
+    ttl = getattr(settings, 'OTP_VERIFIED_TTL' if verified else 'OTP_TTL', 30 * 60 if verified else 10 * 60)
+    return timezone.now() + timedelta(seconds=ttl)
+
+def otp_email(otp):
     subject = 'Your OTP Verification Code'
     message = f'Your OTP is: {otp}'
     from_email = 'your@example.com'  # Update this with your email
-    send_mail(subject, message, from_email, [email])
+    return subject, message, from_email
+
+def queue_otp_email(email, otp):
+    # Sent by the app1.mailer workers once the request's transaction commits
+    from .mailer import queue_email
+    subject, message, from_email = otp_email(otp)
+    return queue_email(email, subject, message, from_email)
@@ -5,61 +5,93 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Product, Category, Recipe, AboutVideo
-from .serializers import ProductSerializer, CategorySerializer, RecipeSerializer, AboutVideoSerializer
+from .serializers import ProductSerializer, ProductListSerializer, CategorySerializer, RecipeSerializer, AboutVideoSerializer
+from .pagination import CatalogCursorPagination
+from .search import ProductSearchFilter, search_products
+from .caching import CachedListMixin, cached_response
+from .streaming import aserve_file, serve_file
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.shortcuts import render, get_object_or_404
-from django.http import StreamingHttpResponse, HttpResponse, FileResponse
-import os
-import mimetypes
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = ('category',)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all().order_by('-created_at')
     serializer_class = RecipeSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogCursorPagination
+    ordering_fields = ['created_at']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
 class AboutVideoViewSet(viewsets.ModelViewSet):
     queryset = AboutVideo.objects.all().order_by('-created_at')
     serializer_class = AboutVideoSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogCursorPagination
+    ordering_fields = ['created_at']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.filter(is_active=True).order_by('-created_at')
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category']
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at']
     permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogCursorPagination
+    cache_models = ('product', 'category')
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('category')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            # Flat rows with the category joined in: one query per page
+            return ProductListSerializer.rows(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ProductListSerializer
+        return ProductSerializer
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def products_by_category_name(request, category_name):
+    return cached_response(
+        request, ('product', 'category'), lambda: _products_by_category_name(request, category_name)
+    )
+
+
+def _products_by_category_name(request, category_name):
     try:
         if category_name.lower() == 'all':
             products = Product.objects.filter(is_active=True)
         else:
-            category = Category.objects.get(name__iexact=category_name)
+            # Lower() on both sides so the lookup uses the Lower(name) index
+            category = Category.objects.alias(lower_name=Lower('name')).get(lower_name=Lower(Value(category_name)))
             products = Product.objects.filter(category=category, is_active=True)
         
-        # Apply search if provided
+        # Apply search if provided (full-text, ranked by relevance)
         search_query = request.GET.get('search', '')
         if search_query:
-            products = products.filter(name__icontains=search_query) | products.filter(description__icontains=search_query)
+            products = search_products(products, search_query)
         
-        # Apply ordering if provided
-        ordering = request.GET.get('ordering', '')
-        if ordering in ['price', '-price', 'created_at', '-created_at']:
-            products = products.order_by(ordering)
-        
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        # Ordering (price / created_at, optionally '-') is applied by the paginator
+        paginator = CatalogCursorPagination()
+        page = paginator.paginate_queryset(ProductListSerializer.rows(products), request)
+        serializer = ProductListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     except Category.DoesNotExist:
         return Response({'detail': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -69,53 +101,31 @@ def stream_about_video(request, pk: int):
     if not video_obj.video:
         return HttpResponse(status=404)
 
-    file_path = video_obj.video.path
-    file_size = os.path.getsize(file_path)
-    content_type, _ = mimetypes.guess_type(file_path)
-    content_type = content_type or 'application/octet-stream'
+    # Range / If-Range / conditional handling and sendfile-friendly responses
+    # live in app1.streaming
+    try:
+        return serve_file(request, video_obj.video.path)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
 
-    range_header = request.headers.get('Range') or request.META.get('HTTP_RANGE', '')
-    if range_header:
-        # Example: 'bytes=0-1023'
-        bytes_unit, bytes_range = range_header.split('=')
-        start_str, end_str = bytes_range.split('-')
-        try:
-            start = int(start_str) if start_str else 0
-        except ValueError:
-            start = 0
-        try:
-            end = int(end_str) if end_str else file_size - 1
-        except ValueError:
-            end = file_size - 1
-        end = min(end, file_size - 1)
-        length = end - start + 1
-
-        def file_iterator(path, offset, length, chunk_size=8192):
-            with open(path, 'rb') as f:
-                f.seek(offset)
-                remaining = length
-                while remaining > 0:
-                    chunk = f.read(min(chunk_size, remaining))
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-
-        resp = StreamingHttpResponse(
-            file_iterator(file_path, start, length),
-            status=206,
-            content_type=content_type,
-        )
-        resp['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-        resp['Accept-Ranges'] = 'bytes'
-        resp['Content-Length'] = str(length)
-        return resp
-    else:
-        # Full file response
-        resp = FileResponse(open(file_path, 'rb'), content_type=content_type)
-        resp['Content-Length'] = str(file_size)
-        resp['Accept-Ranges'] = 'bytes'
-        return resp
+
+async def stream_about_video_async(request, pk: int):
+    """
+    stream_about_video for ASGI deployments: blocks are read as the client
+    drains them, so a slow viewer holds one block rather than a worker thread
+    or a fully buffered range, and a client disconnect stops the read.
+    """
+    try:
+        video_obj = await AboutVideo.objects.aget(pk=pk)
+    except AboutVideo.DoesNotExist:
+        return HttpResponse(status=404)
+    if not video_obj.video:
+        return HttpResponse(status=404)
+
+    try:
+        return await aserve_file(request, video_obj.video.path)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
 
 
 
@@ -127,7 +137,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import EmailOTP
 from .serializers import EmailSerializer, OTPVerifySerializer, RegisterSerializer
-from .utils import generate_otp, send_otp_email
+from .utils import generate_otp, otp_expiry, queue_otp_email
+from .ratelimit import check_limits, client_ip
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -135,9 +150,24 @@ def send_otp(request):
     serializer = EmailSerializer(data=request.data)
     if serializer.is_valid():
         email = serializer.validated_data['email']
+        limits = getattr(settings, 'OTP_RATE_LIMITS', {})
+        buckets = [
+            (f'otp:{scope}:{key}', *limits[scope])
+            for scope, key in (('ip', client_ip(request)), ('email', email.lower()))
+            if scope in limits
+        ]
+        wait = check_limits(buckets)
+        if wait:
+            response = Response({'error': 'Too many OTP requests. Try again later.'}, status=429)
+            response['Retry-After'] = str(wait)
+            return response
         otp = generate_otp()
-        EmailOTP.objects.update_or_create(email=email, defaults={'otp': otp, 'is_verified': False})
-        send_otp_email(email, otp)
+        with transaction.atomic():
+            EmailOTP.objects.update_or_create(email=email, defaults={
+                'otp': otp, 'is_verified': False, 'attempts': 0, 'expires_at': otp_expiry(),
+            })
+            # The outbox row commits with the OTP; workers send it afterwards
+            queue_otp_email(email, otp)
         return Response({'message': 'OTP sent to email.'}, status=200)
     return Response(serializer.errors, status=400)
 
@@ -148,13 +178,17 @@ def verify_otp(request):
     if serializer.is_valid():
         email = serializer.validated_data['email']
         otp = serializer.validated_data['otp']
-        try:
-            otp_entry = EmailOTP.objects.get(email=email, otp=otp)
-            otp_entry.is_verified = True
-            otp_entry.save()
+        # Unverified, unexpired and under the attempt cap, checked and
+        # flipped in one statement so two requests cannot both verify
+        max_attempts = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+        live = EmailOTP.objects.filter(
+            email=email, is_verified=False, expires_at__gt=timezone.now(), attempts__lt=max_attempts,
+        )
+        if live.filter(otp=otp).update(is_verified=True, expires_at=otp_expiry(verified=True)):
             return Response({'message': 'OTP verified.'}, status=200)
-        except EmailOTP.DoesNotExist:
-            return Response({'error': 'Invalid OTP'}, status=400)
+        # Stops counting at the cap; the code is dead from then on
+        live.update(attempts=F('attempts') + 1)
+        return Response({'error': 'Invalid OTP'}, status=400)
     return Response(serializer.errors, status=400)
 
 @api_view(['POST'])
@@ -172,181 +206,253 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from .models import Cart, CartItem, Product
-from .serializers import CartSerializer
+from .serializers import CartSerializer, CartItemSerializer, CartBatchSerializer, CartQuantitySerializer
+from .cart_storage import get_cart_storage
+from django.db import transaction
+from django.db.models import F
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def session_cart_data(cart):
+    """
+    Render an anonymous cart ({product_id: quantity}, see app1.cart_storage)
+    in the same shape as CartSerializer, with every product fetched in one
+    query. Items are unsaved CartItem instances keyed by product id, which
+    is what the anonymous cart's update/destroy routes expect as pk.
+    """
+    quantities = {int(product_id): quantity for product_id, quantity in cart.items()}
+    products = Product.objects.select_related('category').in_bulk(list(quantities))
+    items = [
+        CartItem(id=product_id, product=products[product_id], quantity=quantity)
+        for product_id, quantity in quantities.items()
+        if product_id in products
+    ]
+    if len(items) != len(quantities):
+        logger.debug("Session cart references %d missing products", len(quantities) - len(items))
+    return {
+        'items': CartItemSerializer(items, many=True).data,
+        'total_items': sum(item.quantity for item in items),
+        'total_price': float(sum(item.subtotal() for item in items)),
+    }
+
+def fold_cart_operations(operations):
+    """
+    Collapse an ordered list of add/set/remove operations into one net change
+    per product: ('add', n) to increment whatever is there, or ('set', n) for
+    an absolute quantity, where ('set', 0) means remove.
+    """
+    changes = {}
+    for operation in operations:
+        mode, quantity = changes.get(operation['product'], ('add', 0))
+        if operation['op'] == 'add':
+            changes[operation['product']] = (mode, quantity + operation['quantity'])
+        elif operation['op'] == 'set':
+            changes[operation['product']] = ('set', operation['quantity'])
+        else:
+            changes[operation['product']] = ('set', 0)
+    return changes
+
+
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny] 
 
     def list(self, request):
-        logger.info(f"Cart list called. User authenticated: {request.user.is_authenticated}")
-        
         if request.user.is_authenticated:
-            cart, _ = Cart.objects.get_or_create(user=request.user)
+            try:
+                cart = Cart.objects.with_items().get(user_id=request.user.pk)
+            except Cart.DoesNotExist:
+                cart = Cart.objects.create(user_id=request.user.pk)
             serializer = CartSerializer(cart)
             return Response(serializer.data)
         else:
-            # Debug session information
-            logger.info(f"Session key: {request.session.session_key}")
-            logger.info(f"Session data: {dict(request.session)}")
-            
-            cart = request.session.get('cart', {})
-            logger.info(f"Cart from session: {cart}")
-            
-            # Enhanced session cart with full product details
-            cart_items = []
-            total_items = 0
-            total_price = 0
-            
-            for product_id, cart_item in cart.items():
-                logger.info(f"Processing cart item: {product_id} -> {cart_item}")
-                try:
-                    product = Product.objects.get(id=int(product_id))
-                    item_data = {
-                        'id': product_id,
-                        'product_id': int(product_id),
-                        'product_name': product.name,
-                        'quantity': cart_item['quantity'],
-                        'price': str(product.price),
-                        'image': product.image.url if product.image else '',
-                        'description': product.description or ''
-                    }
-                    cart_items.append(item_data)
-                    total_items += cart_item['quantity']
-                    total_price += float(product.price) * cart_item['quantity']
-                    logger.info(f"Added item to cart_items: {item_data}")
-                except Product.DoesNotExist:
-                    logger.warning(f"Product {product_id} not found, skipping")
-                    continue
-            
-            response_data = {
-                'items': cart_items,
-                'total_items': total_items,
-                'total_price': total_price
-            }
-            logger.info(f"Returning response: {response_data}")
-            return Response(response_data)
+            return Response(session_cart_data(get_cart_storage().load(request)))
 
     def create(self, request):
+        serializer = CartQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
         product_id = request.data.get('product')
-        quantity = int(request.data.get('quantity', 1))
-        
-        logger.info(f"Adding to cart: product_id={product_id}, quantity={quantity}")
-        logger.info(f"User authenticated: {request.user.is_authenticated}")
+        quantity = serializer.validated_data['quantity']
 
         try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+            product = Product.objects.only('id').get(id=product_id)
+        except (Product.DoesNotExist, ValueError, TypeError):
             return Response({'error': 'Product not found'}, status=404)
 
         if request.user.is_authenticated:
-            cart, _ = Cart.objects.get_or_create(user=request.user)
-            cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-            if not created:
-                cart_item.quantity += quantity
-            else:
-                cart_item.quantity = quantity
-            cart_item.save()
-            logger.info(f"Added to authenticated user cart: {cart_item}")
-        else:
-            # Ensure session exists
-            if not request.session.session_key:
-                request.session.create()
-                logger.info(f"Created new session: {request.session.session_key}")
-            
-            logger.info(f"Session key before: {request.session.session_key}")
-            logger.info(f"Session data before: {dict(request.session)}")
-            
-            cart = request.session.get('cart', {})
-            logger.info(f"Current cart before update: {cart}")
-            
-            product_key = str(product_id)
-
-            if product_key in cart:
-                cart[product_key]['quantity'] += quantity
-                logger.info(f"Updated existing item: {cart[product_key]}")
-            else:
-                cart[product_key] = {
-                    'product_name': product.name,
-                    'quantity': quantity,
-                    'price': str(product.price)
-                }
-                logger.info(f"Added new item: {cart[product_key]}")
-            
-            request.session['cart'] = cart
-            request.session.modified = True
-            
-            # Force save the session
-            request.session.save()
-            
-            logger.info(f"Session data after: {dict(request.session)}")
-            logger.info(f"Cart after update: {request.session.get('cart', {})}")
-
-        return Response({'message': 'Item added to cart'}, status=201)
+            cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+            CartItem.objects.add_quantity(cart.id, product.id, quantity)
+            return Response({'message': 'Item added to cart'}, status=201)
+
+        storage = get_cart_storage()
+        cart = storage.load(request)
+        product_key = str(product.id)
+        cart[product_key] = cart.get(product_key, 0) + quantity
+        response = Response({'message': 'Item added to cart'}, status=201)
+        storage.save(request, response, cart)
+        return response
 
     def update(self, request, pk=None):
-        quantity = int(request.data.get('quantity', 1))
-        logger.info(f"Updating cart item: pk={pk}, quantity={quantity}")
-        
+        serializer = CartQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        quantity = serializer.validated_data['quantity']
+
         if request.user.is_authenticated:
             try:
-                item = CartItem.objects.get(id=pk, cart__user=request.user)
+                item = CartItem.objects.get(id=pk, cart__user_id=request.user.pk)
                 item.quantity = quantity
                 item.save()
                 return Response({'message': 'Item updated'})
             except CartItem.DoesNotExist:
                 return Response({'error': 'Cart item not found'}, status=404)
         else:
-            product_id = request.data.get('product', pk)
-            cart = request.session.get('cart', {})
-            product_key = str(product_id)
-            
-            logger.info(f"Updating session cart item: {product_key}, quantity={quantity}")
-            logger.info(f"Current cart: {cart}")
-            
-            if product_key in cart:
-                cart[product_key]['quantity'] = quantity
-                request.session['cart'] = cart
-                request.session.modified = True
-                request.session.save()
-                logger.info(f"Updated cart: {cart}")
-                return Response({'message': 'Item updated'})
-            else:
+            product_key = str(request.data.get('product', pk))
+            storage = get_cart_storage()
+            cart = storage.load(request)
+            if product_key not in cart:
                 return Response({'error': 'Item not found in session cart'}, status=404)
+            cart[product_key] = quantity
+            response = Response({'message': 'Item updated'})
+            storage.save(request, response, cart)
+            return response
 
     def destroy(self, request, pk=None):
-        logger.info(f"Removing cart item: pk={pk}")
-        
         if request.user.is_authenticated:
             try:
-                item = CartItem.objects.get(id=pk, cart__user=request.user)
+                item = CartItem.objects.get(id=pk, cart__user_id=request.user.pk)
                 item.delete()
                 return Response({'message': 'Item removed from cart'})
             except CartItem.DoesNotExist:
                 return Response({'error': 'Item not found'}, status=404)
         else:
-            if request.method == 'DELETE':
-                product_id = request.data.get('product', pk)
-            else:
-                product_id = pk
-                
-            cart = request.session.get('cart', {})
-            product_key = str(product_id)
-            
-            logger.info(f"Removing from session cart: {product_key}")
-            logger.info(f"Current cart: {cart}")
-            
-            if product_key in cart:
-                del cart[product_key]
-                request.session['cart'] = cart
-                request.session.modified = True
-                request.session.save()
-                logger.info(f"Cart after removal: {cart}")
-                return Response({'message': 'Item removed from cart'})
-            else:
+            product_key = str(request.data.get('product', pk))
+            storage = get_cart_storage()
+            cart = storage.load(request)
+            if product_key not in cart:
                 return Response({'error': 'Item not found in session cart'}, status=404)
+            del cart[product_key]
+            response = Response({'message': 'Item removed from cart'})
+            storage.save(request, response, cart)
+            return response
+
+    def batch(self, request):
+        """
+        Apply a list of {op: add|set|remove, product, quantity} operations in
+        one round trip and return the resulting cart. Products are checked in
+        one query; authenticated carts are then updated in one transaction
+        with bulk_create/bulk_update and F() increments.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        changes = fold_cart_operations(serializer.validated_data['operations'])
+
+        wanted = {product_id for product_id, change in changes.items() if change != ('set', 0)}
+        found = set(Product.objects.filter(id__in=wanted).values_list('id', flat=True))
+        if wanted - found:
+            return Response({'error': 'Product not found', 'products': sorted(wanted - found)}, status=404)
+
+        if not request.user.is_authenticated:
+            storage = get_cart_storage()
+            cart = storage.load(request)
+            for product_id, (mode, quantity) in changes.items():
+                key = str(product_id)
+                if mode == 'set' and quantity == 0:
+                    cart.pop(key, None)
+                elif mode == 'set':
+                    cart[key] = quantity
+                elif quantity:
+                    cart[key] = cart.get(key, 0) + quantity
+            response = Response(session_cart_data(cart))
+            storage.save(request, response, cart)
+            return response
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+            existing = {
+                item.product_id: item
+                for item in CartItem.objects.select_for_update().filter(cart=cart, product_id__in=changes)
+            }
+            to_create, to_update, to_delete = [], [], []
+            for product_id, (mode, quantity) in changes.items():
+                item = existing.get(product_id)
+                if mode == 'set' and quantity == 0:
+                    if item is not None:
+                        to_delete.append(item.id)
+                elif item is None:
+                    if quantity:
+                        to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+                elif mode == 'set':
+                    item.quantity = quantity
+                    to_update.append(item)
+                elif quantity:
+                    item.quantity = F('quantity') + quantity
+                    to_update.append(item)
+            if to_delete:
+                CartItem.objects.filter(id__in=to_delete).delete()
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+
+        return Response(CartSerializer(Cart.objects.with_items().get(pk=cart.pk)).data)
+
+
+
+
+
+
+
+
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from .models import InsufficientStock, Order
+from .serializers import OrderSerializer
+
+
+class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    A user's orders. ``checkout`` turns the cart into an order that holds
+    its stock for ORDER_RESERVATION_SECONDS; ``confirm`` makes it final and
+    ``cancel`` (or the release_expired_orders sweep) gives the stock back.
+    """
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    queryset = Order.objects.none()
+
+    def get_queryset(self):
+        return (Order.objects.filter(user_id=self.request.user.pk)
+                .prefetch_related('items__product').order_by('-created_at'))
+
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+        try:
+            order = Order.objects.place_from_cart(cart)
+        except InsufficientStock as exc:
+            return Response({'error': 'Insufficient stock', 'products': exc.product_ids}, status=409)
+        if order is None:
+            return Response({'error': 'Cart is empty'}, status=400)
+        return Response(OrderSerializer(self.get_queryset().get(pk=order.pk)).data, status=201)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        order = self.get_object()
+        if not order.confirm():
+            return Response({'error': 'Order is no longer reserved'}, status=409)
+        order.refresh_from_db()
+        return Response(OrderSerializer(order).data)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        order = self.get_object()
+        if not order.release(Order.Status.CANCELLED):
+            return Response({'error': 'Order is no longer reserved'}, status=409)
+        order.refresh_from_db()
+        return Response(OrderSerializer(order).data)
 
 
 
@@ -371,36 +477,123 @@ def current_user(request):
     })
 
 
-from django.contrib.auth import get_user_model
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from .counters import user_counts
+
 @api_view(['GET'])
 def user_count(request):
-    User = get_user_model()
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    return Response({
-        'total_users': total_users,
-        'active_users': active_users
-    })
+    # Maintained counters behind a short cache; no COUNT(*) per poll
+    return Response(user_counts())
+
+
+from .facets import catalog_facets
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def catalog_facets_view(request):
+    """
+    Category product counts and price-range histograms for the storefront
+    sidebar, read from the CategoryFacet summary table (app1.facets) and
+    cached with the other catalog responses.
+    """
+    return cached_response(request, ('product', 'category'), lambda: Response(catalog_facets()))
 
 
 def dojo_app(request):
-    return render (request,'index.html')
+    response = render (request,'index.html')
+    # The shell links hashed (immutable) assets; make browsers revalidate
+    # it on every visit so a deploy is picked up, usually with a 304
+    patch_cache_control(response, no_cache=True)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
 
 
 
-from rest_framework.decorators import api_view
+import json
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from .models import ImageUpload
-from .serializers import ImageUploadSerializer
+from .serializers import ImageUploadSerializer, ImageUploadListSerializer
+from .pagination import GalleryCursorPagination
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Selects the streamed gallery (``Accept: application/x-ndjson`` or ``?format=ndjson``)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for errors; the gallery itself streams
+        return json.dumps(data, cls=JSONEncoder).encode() + b'\n'
+
+
+def gallery_lines(rows, serializer, batch_size=200):
+    """One JSON document per image, yielded in batches of lines."""
+    encoder = JSONEncoder(separators=(',', ':'))
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(serializer.to_representation(row)))
+        if len(batch) >= batch_size:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
 
 @api_view(['GET'])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, NDJSONRenderer])
 def get_all_images(request):
-    images = ImageUpload.objects.all().order_by('-uploaded_at')
-    serializer = ImageUploadSerializer(images, many=True, context={'request': request})
-    return Response(serializer.data)
+    """
+    Gallery images, newest first, as cursor pages ({next, previous,
+    results}; ``?page_size=`` up to CATALOG_MAX_PAGE_SIZE). With NDJSON
+    negotiated the whole gallery is streamed instead, one image per line,
+    read from the database in chunks rather than materialised as a list.
+    ``?name=`` keeps the images whose file name contains it (e.g. ``logo``).
+    """
+    images = ImageUpload.objects.all()
+    name = request.query_params.get('name')
+    if name:
+        images = images.filter(image__icontains=name)
+    serializer = ImageUploadListSerializer(context={'request': request})
+    if request.accepted_renderer.format == 'ndjson':
+        rows = ImageUploadListSerializer.rows(images.order_by('-uploaded_at', '-id')).iterator(chunk_size=500)
+        return StreamingHttpResponse(gallery_lines(rows, serializer), content_type='application/x-ndjson')
+
+    paginator = GalleryCursorPagination()
+    page = paginator.paginate_queryset(ImageUploadListSerializer.rows(images), request)
+    return paginator.get_paginated_response([serializer.to_representation(row) for row in page])
+
+
+from django.http import Http404, HttpResponseRedirect
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control
+from . import images as image_variants
+
+
+def image_variant(request, model, pk, width, fmt):
+    """
+    Lazy variant URL used in srcsets of images uploaded before variants
+    existed: generates every variant of the image on first hit (stored on
+    the row, so later responses link the files directly) and redirects to
+    the closest one.
+    """
+    model_class = image_variants.IMAGE_MODELS.get(model)
+    if model_class is None:
+        raise Http404
+    obj = get_object_or_404(model_class, pk=pk)
+    if not obj.image:
+        raise Http404
+    variants = image_variants.refresh_variants(model, pk)
+    name = image_variants.pick_variant(variants, fmt, width)
+    response = HttpResponseRedirect(default_storage.url(name) if name else obj.image.url)
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
 
 # @api_view(['GET', 'POST'])
 # def get_all_images(request):
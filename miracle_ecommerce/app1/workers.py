@@ -0,0 +1,49 @@
+"""
+Small in-process worker pools for post-upload work (HLS packaging, image
+variants). Jobs are submitted after the surrounding transaction commits so
+a worker never reads a row before it is visible; the database rows carry
+the job state, so a management command can redo whatever a restart drops.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+from .routers import routing_scope
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _pool(name, workers):
+    with _lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return _pools[name]
+
+
+def _run(func, args):
+    close_old_connections()
+    try:
+        # Jobs read rows that were just written; replicas may not have them yet
+        with routing_scope(pinned=True):
+            func(*args)
+    except Exception:
+        logger.exception('%s%r failed', func.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def run_after_commit(name, workers, func, *args):
+    """
+    Run ``func(*args)`` on the ``name`` pool once the current transaction
+    commits; with ``workers`` = 0 it runs inline instead (tests, scripts).
+    """
+    if not workers:
+        transaction.on_commit(lambda: func(*args))
+        return
+    pool = _pool(name, workers)
+    transaction.on_commit(lambda: pool.submit(_run, func, args))
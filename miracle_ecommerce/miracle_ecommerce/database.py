@@ -0,0 +1,89 @@
+"""
+SQLite configuration for running the site on a single database file.
+
+Every connection is opened with PRAGMAS: WAL journaling (readers no longer
+block on a writer and a commit is one append to the log), NORMAL syncs
+(durable at checkpoints; a power cut can lose the last commits but never
+corrupts the file), a memory-mapped read path and a larger page cache.
+Connections are kept between requests (CONN_MAX_AGE) instead of being
+reopened each time.
+
+sqlite_databases() returns two aliases on the same file: ``default`` for
+writes and a query-only ``read`` alias that app1.routers sends reads to
+outside transactions, so long reads never hold the writer's connection.
+sqlite_replica() describes a local SQLite file standing in for a read
+replica (kept current by ``manage.py sync_sqlite_replicas``);
+sqlite_replicas() builds those aliases from a comma-separated list of
+files, such as the SQLITE_REPLICAS environment variable.
+"""
+
+# Seconds to wait on a locked database before raising "database is locked"
+BUSY_TIMEOUT = 20
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative means KiB: 64 MiB per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    # Checkpoint the WAL back into the database every ~4 MB of log
+    'wal_autocheckpoint': 1000,
+}
+
+
+def init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def sqlite_alias(name, extra_pragmas=None, conn_max_age=600, **options):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'init_command': init_command({**PRAGMAS, **(extra_pragmas or {})}),
+            # busy_timeout, via sqlite3.connect(timeout=...)
+            'timeout': BUSY_TIMEOUT,
+            **options,
+        },
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def sqlite_databases(name, test_name=None, conn_max_age=600):
+    """DATABASES entries for the SQLite file ``name``."""
+    default = sqlite_alias(
+        name,
+        conn_max_age=conn_max_age,
+        # Take the write lock when a transaction starts so concurrent
+        # checkouts/cart writes queue on the busy timeout instead of
+        # failing on a read->write lock upgrade.
+        transaction_mode='IMMEDIATE',
+    )
+    read = sqlite_alias(name, {'query_only': 'ON'}, conn_max_age)
+    if test_name:
+        # A file (not shared-cache memory) test DB so threaded tests get
+        # real SQLite locking semantics.
+        default['TEST'] = {'NAME': test_name}
+    read['TEST'] = {'MIRROR': 'default'}
+    return {'default': default, 'read': read}
+
+
+def sqlite_replica(name, conn_max_age=600):
+    """
+    A DATABASES entry for a query-only SQLite copy of the primary. Tests
+    mirror the primary test database, as a real replica would.
+    """
+    replica = sqlite_alias(name, {'query_only': 'ON'}, conn_max_age)
+    replica['TEST'] = {'MIRROR': 'default'}
+    return replica
+
+
+def sqlite_replicas(names, base_dir, conn_max_age=600):
+    """
+    ``replica1``, ``replica2``... DATABASES entries for the comma-separated
+    SQLite file ``names`` (relative to ``base_dir``); none for an empty string.
+    """
+    files = [name.strip() for name in names.split(',') if name.strip()]
+    return {f'replica{n}': sqlite_replica(base_dir / name, conn_max_age) for n, name in enumerate(files, 1)}
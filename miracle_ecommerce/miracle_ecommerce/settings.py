@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from .database import sqlite_databases, sqlite_replicas
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -28,7 +32,10 @@ DEBUG = True
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Use database backend
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True  # Save session on every request
+SESSION_SAVE_EVERY_REQUEST = False  # Only write sessions that changed
+# Where anonymous carts live (app1.cart_storage): a signed cookie needs no
+# server-side writes; SessionCartStorage keeps them in request.session.
+ANONYMOUS_CART_STORAGE = 'app1.cart_storage.CookieCartStorage'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 ALLOWED_HOSTS = []
@@ -58,6 +65,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
+    'app1.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,30 +99,45 @@ WSGI_APPLICATION = 'miracle_ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# WAL + connection pragmas, persistent connections and a query-only read
+# alias on the same file (see miracle_ecommerce.database / app1.routers).
+# The test database is a per-run file in the temp directory, so concurrent
+# test runs don't share (and clobber) one.
+DATABASES = sqlite_databases(
+    BASE_DIR / 'db.sqlite3',
+    test_name=Path(tempfile.gettempdir()) / f'miracle_test_{os.getpid()}.sqlite3',
+)
+DATABASE_ROUTERS = ['app1.routers.PrimaryReplicaRouter']
+
+# Local SQLite files standing in for read replicas, none by default:
+# SQLITE_REPLICAS=replica1.sqlite3,replica2.sqlite3 adds the aliases
+# replica1 and replica2. Refresh them with `manage.py sync_sqlite_replicas`.
+# A Postgres streaming replica (or any other engine) is added to DATABASES
+# and DATABASE_REPLICAS the same way.
+REPLICA_DATABASES = sqlite_replicas(os.environ.get('SQLITE_REPLICAS', ''), BASE_DIR)
+DATABASES.update(REPLICA_DATABASES)
+# Aliases that reads of REPLICA_MODELS are spread over
+DATABASE_REPLICAS = list(REPLICA_DATABASES)
+REPLICA_MODELS = [
+    'app1.Product',
+    'app1.Category',
+    'app1.Recipe',
+    'app1.AboutVideo',
+    'app1.ImageUpload',
+    'app1.CategoryFacet',
+]
+# After a request writes, the client reads from the primary for this long
+# (app1.middleware.ReplicaPinningMiddleware); keep it above replica lag.
+REPLICA_PIN_SECONDS = 5
 
 
 
 
-REST_FRAMEWORK = {
-    'DEFAULT_FILTER_BACKENDS': [
-        'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
-    ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10,
-}
-
-
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # request.user is built from token claims, no User query per request
+        # (see app1.authentication)
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ),
@@ -126,6 +149,29 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Catalog list endpoints use keyset pagination (see app1.pagination);
+# ?page_size= may raise the default up to the max.
+CATALOG_PAGE_SIZE = 10
+CATALOG_MAX_PAGE_SIZE = 100
+
+# Catalog list responses are cached until a Product/Category save bumps their
+# version (see app1.caching). Multi-process deployments need a shared cache
+# here (Redis/Memcached) so every worker sees the same version counters.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CATALOG_CACHE_TIMEOUT = 600
+
+# Upper bounds of the price ranges the catalog facets count products in
+# (app1.facets): <10, 10-25, ..., >=250. Run `manage.py rebuild_catalog_facets`
+# after changing them.
+CATALOG_FACET_PRICE_EDGES = [10, 25, 50, 100, 250]
+
+# How long a checkout holds stock before release_expired_orders returns it
+ORDER_RESERVATION_SECONDS = 15 * 60
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -134,7 +180,15 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_USER_CLASS': 'app1.authentication.ClaimsUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'app1.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'app1.authentication.ClaimsTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'app1.authentication.ClaimsTokenBlacklistSerializer',
 }
+# Seconds a refresh token's "not blacklisted" lookup is reused. Tokens are
+# cached as blacklisted at once by the process that blacklists them; other
+# processes only see it after this long unless the cache is shared.
+JWT_BLACKLIST_CACHE_TIMEOUT = 30
 
 
 
@@ -149,6 +203,41 @@ EMAIL_HOST_PASSWORD = 'xpwv lnhc yeow uull'  # App password or real one
 EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Mail outbox (app1.mailer). send_otp only writes an OutboxEmail row;
+# MAIL_WORKERS threads (0 = inline after commit) send it in batches over an
+# SMTP connection each keeps open. Failed sends are retried after
+# MAIL_RETRY_DELAY seconds, doubling per attempt; `manage.py
+# send_queued_mail` drains whatever a restart left behind.
+MAIL_WORKERS = 2
+MAIL_BATCH_SIZE = 20
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_DELAY = 30
+# A claimed row not sent within this many seconds is retried
+MAIL_SENDING_TIMEOUT = 300
+MAIL_CONNECTION_IDLE_TIMEOUT = 60
+
+# Token buckets for send_otp: (capacity, refill window in seconds) per
+# address and per client IP. Stored in the default cache, so use a shared
+# backend when running several processes.
+OTP_RATE_LIMITS = {
+    'email': (3, 10 * 60),
+    'ip': (20, 60 * 60),
+}
+
+# OTP lifetime (seconds) before verification, and of a verified OTP as
+# proof for register_user; wrong codes allowed per OTP. Expired rows are
+# deleted by `manage.py sweep_expired_otps` in batches of
+# OTP_SWEEP_BATCH_SIZE.
+OTP_TTL = 10 * 60
+OTP_VERIFIED_TTL = 30 * 60
+OTP_MAX_ATTEMPTS = 5
+OTP_SWEEP_BATCH_SIZE = 1000
+
+# user_count reads the users.* rows kept by app1.counters and caches them
+# this many seconds (dropped early when a user is added or removed);
+# `manage.py reconcile_counters` recounts from cron.
+USER_COUNT_CACHE_TIMEOUT = 30
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -187,6 +276,38 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Video streaming (app1.streaming). Block size is the read size when the
+# server has no sendfile-capable wsgi.file_wrapper. Set the offload mode to
+# 'x-accel-redirect' (nginx, internal location at VIDEO_STREAM_ACCEL_PREFIX
+# aliased to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd) to let the front
+# server send the bytes.
+VIDEO_STREAM_BLOCK_SIZE = 1024 * 1024
+# The async view reads one block per send, so this bounds memory per viewer
+VIDEO_STREAM_ASYNC_BLOCK_SIZE = 64 * 1024
+VIDEO_STREAM_OFFLOAD = None
+VIDEO_STREAM_ACCEL_PREFIX = '/protected-media/'
+
+# HLS packaging of AboutVideo uploads (app1.hls). Saves queue work on an
+# in-process pool of HLS_WORKERS threads (0 = inline after commit);
+# `manage.py package_about_videos` drains leftovers and backfills.
+HLS_FFMPEG_BINARY = 'ffmpeg'
+HLS_WORKERS = 1
+HLS_SEGMENT_SECONDS = 6
+HLS_ENCODE_TIMEOUT = 60 * 60
+HLS_RENDITIONS = [
+    {'name': '360p', 'height': 360, 'video_kbps': 800, 'audio_kbps': 96},
+    {'name': '720p', 'height': 720, 'video_kbps': 2800, 'audio_kbps': 128},
+    {'name': '1080p', 'height': 1080, 'video_kbps': 5000, 'audio_kbps': 128},
+]
+
+# Responsive image variants (app1.images), generated after upload on
+# IMAGE_VARIANT_WORKERS threads (0 = inline). Add 'avif' to the formats if
+# Pillow was built with AVIF support.
+IMAGE_VARIANT_WIDTHS = [320, 640, 1024]
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = {'webp': 80, 'jpeg': 82, 'avif': 60}
+IMAGE_VARIANT_WORKERS = 2
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -199,3 +320,16 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Content-addressed names: collectstatic writes name.<hash>.ext copies plus
+# .gz/.br siblings (app1.storage), and uploads are stored under their
+# content hash. app1.fileserve serves both with immutable caching.
+STORAGES = {
+    'default': {'BACKEND': 'app1.storage.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app1.storage.CompressedManifestStaticFilesStorage'},
+}
+# Cache lifetime (seconds) of hashed files, and of everything else before
+# the browser revalidates it with its ETag
+FILE_SERVE_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+FILE_SERVE_MAX_AGE = 60